@@ -0,0 +1,36 @@
+# =============================================================================
+# FILE: batch.py
+# DESCRIPTION: Shared id handling for the batch lookup endpoints
+# =============================================================================
+#
+# Batch endpoints take ids as repeated (?ids=a&ids=b) or comma-separated
+# (?ids=a,b) query parameters and answer with a map keyed by id plus the ids
+# that were not found, so a screen resolves all its items in one request.
+
+from typing import Any, Dict, List, Tuple
+from fastapi import HTTPException, status
+
+BATCH_MAX_IDS = 100
+
+def batch_ids(ids: List[str]) -> List[str]:
+    """Requested ids, de-duplicated in order - 400 when empty or over BATCH_MAX_IDS"""
+    unique = list(dict.fromkeys(
+        part.strip() for value in ids for part in value.split(",") if part.strip()
+    ))
+    if not unique:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one id is required"
+        )
+    if len(unique) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BATCH_MAX_IDS} ids per request"
+        )
+    return unique
+
+def split_found(requested: List[str], found: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """(found items keyed by id in request order, ids that were not found)"""
+    data = {item_id: found[item_id] for item_id in requested if item_id in found}
+    missing = [item_id for item_id in requested if item_id not in found]
+    return data, missing
@@ -0,0 +1,292 @@
+# =============================================================================
+# FILE: catalog.py
+# DESCRIPTION: Immutable in-process snapshot of the species catalog
+# =============================================================================
+#
+# The catalog (animal classes and species) changes only when a new species is
+# first scanned or the database is reseeded, yet every /api/wildlife read used
+# to query it. get_catalog() returns a CatalogSnapshot instead: validated
+# response models plus lookup indexes, built in one pass and never mutated.
+#
+# A committed ORM write to Species or AnimalClass marks the snapshot stale and
+# the next reader builds a replacement, swapped in atomically (async handlers
+# use get_catalog_async, which builds in the threadpool); readers holding
+# the old snapshot keep a consistent view. Writes from other instances or raw
+# SQL are picked up when CATALOG_SNAPSHOT_TTL expires.
+#
+# The ETag is a digest of the catalog content, so every instance serving the
+# same catalog hands out the same ETag and clients revalidate with a 304.
+
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing_extensions import TypedDict
+
+from compression import precompressed_response
+from database import SessionLocal
+from models.animal_class import AnimalClass, AnimalClassResponse
+from models.species import Species, SpeciesResponse
+from search import normalize
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SNAPSHOT_TTL = float(os.environ.get("CATALOG_SNAPSHOT_TTL", "300"))
+
+class AnimalClassWithSpecies(TypedDict):
+    animal_class: AnimalClassResponse
+    species: List[SpeciesResponse]
+    species_count: int
+
+# Serializers built once at import instead of per request
+SPECIES_LIST_ADAPTER = TypeAdapter(List[SpeciesResponse])
+ANIMAL_CLASS_LIST_ADAPTER = TypeAdapter(List[AnimalClassResponse])
+CLASSES_WITH_SPECIES_ADAPTER = TypeAdapter(List[AnimalClassWithSpecies])
+
+# The raw AI payload is the bulk of a catalog row and only the detail view needs it
+WITHOUT_API_RESPONSE = {"__all__": {"api_response"}}
+
+# =============================================================================
+# SNAPSHOT
+# =============================================================================
+
+class CatalogSnapshot:
+    """One consistent, read-only view of the catalog with its lookup indexes"""
+
+    def __init__(self, animal_classes: List[AnimalClassResponse], species: List[SpeciesResponse],
+                 generation: int):
+        self.generation = generation
+        self.built_at = time.time()
+        self.animal_classes: Tuple[AnimalClassResponse, ...] = tuple(animal_classes)
+        self.species: Tuple[SpeciesResponse, ...] = tuple(species)
+
+        self.classes_by_id = {c.id: c for c in self.animal_classes}
+        self.classes_by_name = {c.class_name.lower(): c for c in self.animal_classes}
+        self.species_by_id = {s.id: s for s in self.species}
+        self.species_by_scientific_name = {s.scientific_name.lower(): s for s in self.species}
+
+        by_class = defaultdict(list)
+        by_common_name = defaultdict(list)
+        for s in self.species:
+            by_class[s.animal_class_id].append(s)
+            by_common_name[normalize(s.common_name)].append(s)
+        self.species_by_class: Dict[str, Tuple[SpeciesResponse, ...]] = {
+            class_id: tuple(items) for class_id, items in by_class.items()
+        }
+        self.species_by_common_name: Dict[str, Tuple[SpeciesResponse, ...]] = {
+            name: tuple(items) for name, items in by_common_name.items()
+        }
+        # Id arrays for sampling - drawing from a tuple by index is O(1) per pick
+        self.species_ids: Tuple[str, ...] = tuple(s.id for s in self.species)
+        self.species_ids_by_class: Dict[str, Tuple[str, ...]] = {
+            class_id: tuple(s.id for s in items) for class_id, items in self.species_by_class.items()
+        }
+
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(ANIMAL_CLASS_LIST_ADAPTER.dump_json(list(self.animal_classes)))
+        digest.update(SPECIES_LIST_ADAPTER.dump_json(list(self.species)))
+        self.version = digest.hexdigest()
+
+        self._bodies: Dict[str, bytes] = {}
+        self._bodies_lock = threading.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.generation == _generation and time.time() - self.built_at < CATALOG_SNAPSHOT_TTL
+
+    def etag(self, view: str) -> str:
+        """Strong ETag for one view (URL + options) of this catalog version"""
+        return f'"{self.version}-{view}"'
+
+    def body(self, view: str, build: Callable[["CatalogSnapshot"], bytes]) -> bytes:
+        """JSON body for a view, serialized once per snapshot"""
+        cached = self._bodies.get(view)
+        if cached is None:
+            cached = build(self)
+            with self._bodies_lock:
+                self._bodies.setdefault(view, cached)
+        return cached
+
+    def species_named(self, name: str) -> List[SpeciesResponse]:
+        """Exact match on scientific name or (normalized) common name"""
+        exact = self.species_by_scientific_name.get(name.strip().lower())
+        matches = list(self.species_by_common_name.get(normalize(name), ()))
+        if exact is not None and exact not in matches:
+            matches.insert(0, exact)
+        return matches
+
+    def sample_species(self, count: int, animal_class_id: Optional[str] = None, seed: Optional[int] = None,
+                       exclude: Iterable[str] = (), only: Optional[Iterable[str]] = None) -> List[SpeciesResponse]:
+        """
+        Up to count distinct species drawn uniformly at random, optionally from
+        one class, never from exclude, and (with only) from those ids alone.
+        The same seed gives the same draw for the same catalog version.
+        """
+        if only is None:
+            population = self.species_ids if animal_class_id is None else self.species_ids_by_class.get(animal_class_id, ())
+        else:
+            population = tuple(
+                species_id for species_id in dict.fromkeys(only)
+                if species_id in self.species_by_id
+                and (animal_class_id is None or self.species_by_id[species_id].animal_class_id == animal_class_id)
+            )
+        exclude = set(exclude)
+        if only is None:
+            # Counted through the id index, without walking the population
+            excluded_here = sum(
+                1 for species_id in exclude
+                if species_id in self.species_by_id
+                and (animal_class_id is None or self.species_by_id[species_id].animal_class_id == animal_class_id)
+            )
+        else:
+            excluded_here = len(exclude.intersection(population))
+
+        rng = random.Random(seed) if seed is not None else random
+        ids = sample_ids(rng, population, count, exclude, excluded_here)
+        return [self.species_by_id[species_id] for species_id in ids]
+
+def sample_ids(rng, population: Tuple[str, ...], count: int, exclude: Set[str], excluded_here: int) -> List[str]:
+    """
+    Uniform sample without replacement of population minus exclude, where
+    excluded_here ids of exclude are in population.
+    Costs O(count) - not O(len(population)) - while most of the population is
+    eligible; only when more than half is excluded does it filter first.
+    """
+    if not excluded_here:
+        return rng.sample(population, min(count, len(population)))
+
+    count = min(count, len(population) - excluded_here)
+    if excluded_here * 2 > len(population):
+        return rng.sample([species_id for species_id in population if species_id not in exclude], count)
+
+    # Rejection sampling: each pick is accepted with probability >= 1/2
+    chosen: List[str] = []
+    taken: Set[str] = set()
+    while len(chosen) < count:
+        candidate = population[rng.randrange(len(population))]
+        if candidate in exclude or candidate in taken:
+            continue
+        taken.add(candidate)
+        chosen.append(candidate)
+    return chosen
+
+# =============================================================================
+# BUILD AND INVALIDATION
+# =============================================================================
+
+_snapshot: Optional[CatalogSnapshot] = None
+_generation = 0
+_build_lock = threading.Lock()
+
+def build_snapshot(generation: int) -> CatalogSnapshot:
+    db = SessionLocal()
+    try:
+        animal_classes = db.query(AnimalClass).order_by(AnimalClass.class_name).all()
+        species = db.query(Species).order_by(Species.common_name, Species.id).all()
+        snapshot = CatalogSnapshot(
+            ANIMAL_CLASS_LIST_ADAPTER.validate_python(animal_classes, from_attributes=True),
+            SPECIES_LIST_ADAPTER.validate_python(species, from_attributes=True),
+            generation
+        )
+    finally:
+        db.close()
+
+    logger.info(
+        f"Built catalog snapshot {snapshot.version}: "
+        f"{len(snapshot.animal_classes)} classes, {len(snapshot.species)} species"
+    )
+    return snapshot
+
+def get_catalog() -> CatalogSnapshot:
+    """The current snapshot, rebuilt first when it is stale or expired"""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.is_fresh:
+        return snapshot
+
+    with _build_lock:
+        # Another request may have rebuilt it while this one waited
+        if _snapshot is not None and _snapshot.is_fresh:
+            return _snapshot
+        # Read the generation before querying: a write committed during the
+        # build leaves this snapshot stale instead of silently missing it
+        _snapshot = build_snapshot(_generation)
+        return _snapshot
+
+async def get_catalog_async() -> CatalogSnapshot:
+    """
+    get_catalog for async handlers. A fresh snapshot is returned directly; a
+    rebuild queries through the sync session, so it runs in the threadpool
+    instead of blocking the event loop. Concurrent callers still share one
+    build - the rest wait on _build_lock and return its snapshot.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.is_fresh:
+        return snapshot
+    return await run_in_threadpool(get_catalog)
+
+def invalidate_catalog() -> None:
+    """Rebuild on next use - call after catalog writes that bypass the ORM"""
+    global _generation
+    _generation += 1
+
+def mark_catalog_changed(session: Session) -> None:
+    """Invalidate when session commits - for catalog writes made with Core statements"""
+    session.info["catalog_changed"] = True
+
+_CATALOG_MODELS = (Species, AnimalClass)
+
+@event.listens_for(Session, "after_flush")
+def _note_catalog_writes(session, flush_context):
+    if any(isinstance(obj, _CATALOG_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        mark_catalog_changed(session)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Only committed writes count - a rolled-back insert must not trigger a rebuild
+    if session.info.pop("catalog_changed", False):
+        invalidate_catalog()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("catalog_changed", None)
+
+# =============================================================================
+# CONDITIONAL RESPONSES
+# =============================================================================
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == bare:
+            return True
+    return False
+
+def catalog_response(request: Request, snapshot: CatalogSnapshot, view: str,
+                     build: Callable[[CatalogSnapshot], bytes]) -> Response:
+    """
+    A catalog view with an ETag: 304 when the client's copy is current,
+    otherwise the body, precompressed once per snapshot and encoding
+    """
+    etag = snapshot.etag(view)
+    # no-cache: clients may store it but must revalidate, which costs a 304
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return precompressed_response(request, snapshot.body(view, build), cache_key=etag, headers=headers)
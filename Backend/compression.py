@@ -0,0 +1,238 @@
+# =============================================================================
+# FILE: compression.py
+# DESCRIPTION: Content-negotiated gzip/brotli response compression
+# =============================================================================
+#
+# CompressionMiddleware compresses compressible responses (JSON, text) for
+# clients that send Accept-Encoding, preferring brotli when the `brotli`
+# package is installed and gzip otherwise:
+#   - bodies under COMPRESSION_MIN_SIZE bytes are sent as-is
+#   - streamed bodies are compressed chunk by chunk and flushed after every
+#     chunk, so the client can decode as data arrives
+#   - responses that already carry Content-Encoding pass through untouched
+#
+# Bodies that stay the same for many requests (the species catalog) go
+# through precompressed_response instead: each encoding is compressed once,
+# at a higher level, and served from a small in-process cache.
+
+import os
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Per-request levels favour speed; cached variants are compressed once and can afford more
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 9
+PRECOMPRESSED_CACHE_SIZE = 32
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+def supported_encodings():
+    """Encodings this server can produce, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Best supported encoding for an Accept-Encoding header, or None for identity.
+    Honours q-values (q=0 refuses an encoding) and the "*" wildcard.
+    """
+    preferences: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        preferences[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = preferences.get(encoding, preferences.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def is_compressible(headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type.split(";")[0]
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """One-shot compression of a complete body"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level)
+    compressor = zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+class StreamCompressor:
+    """Incremental compressor whose every chunk is independently decodable on arrival"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def _mark_encoded(headers: MutableHeaders, encoding: str) -> None:
+    headers["Content-Encoding"] = encoding
+    headers.add_vary_header("Accept-Encoding")
+    # A compressed body is a different representation, so a strong ETag must not be reused
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+class CompressionMiddleware:
+    """ASGI middleware applying choose_encoding to every compressible response"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compression pays off
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if (
+                    start_message["status"] in (204, 304)
+                    or not is_compressible(headers)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                _mark_encoded(headers, encoding)
+                if not more_body:
+                    # Whole body in one message - compress it in one go
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                # Streaming - the final length is unknown
+                del headers["Content-Length"]
+                compressor = StreamCompressor(encoding)
+                await send(start_message)
+
+            chunk = compressor.chunk(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+class PrecompressedCache:
+    """Small LRU of compressed bodies keyed by (cache key, encoding)"""
+
+    def __init__(self, max_entries: int = PRECOMPRESSED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, key: str, encoding: str, compressor: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            cached = self._entries.get((key, encoding))
+            if cached is not None:
+                self._entries.move_to_end((key, encoding))
+                return cached
+        body = compressor()
+        with self._lock:
+            self._entries[(key, encoding)] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+precompressed_cache = PrecompressedCache()
+
+def precompressed_response(request: Request, body: bytes, cache_key: Optional[str] = None,
+                           media_type: str = "application/json", headers: Optional[dict] = None) -> Response:
+    """
+    Response for a body that many requests share, compressed once per encoding.
+    cache_key identifies the body (e.g. a catalog version); without one the
+    body's digest is used.
+    """
+    response_headers = dict(headers or {})
+    response_headers["Vary"] = "Accept-Encoding"
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None or len(body) < COMPRESSION_MIN_SIZE:
+        return Response(content=body, media_type=media_type, headers=response_headers)
+
+    key = cache_key or hashlib.blake2b(body, digest_size=16).hexdigest()
+    level = PRECOMPRESSED_BROTLI_QUALITY if encoding == "br" else PRECOMPRESSED_GZIP_LEVEL
+    compressed = precompressed_cache.get_or_compress(key, encoding, lambda: compress(body, encoding, level))
+
+    response_headers["Content-Encoding"] = encoding
+    etag = response_headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response_headers["ETag"] = f"W/{etag}"
+    return Response(content=compressed, media_type=media_type, headers=response_headers)
@@ -0,0 +1,166 @@
+# =============================================================================
+# FILE: friend_graph.py
+# DESCRIPTION: Cached accepted friends and pending-request counts, kept in step with friendship writes
+# =============================================================================
+#
+# Friend leaderboards need the set of a user's accepted friends on every
+# request, while friendships change rarely. friend_ids() keeps that set per
+# user in a small LRU, loaded with one query over the two friendships indexes
+# (the user can be either side of the row).
+#
+# A committed ORM write to a Friendship drops the cached sets of both users
+# on the row - accepting a request from update_friendship_status is what
+# makes two users friends. Friendships written with Core statements call
+# mark_friends_changed(); writes from other instances are picked up when
+# FRIEND_GRAPH_TTL expires.
+#
+# users.pending_friend_requests counts each user's incoming pending requests
+# for the nav badge. The same flush that inserts, answers or deletes a
+# request adjusts the recipient's count, so it commits or rolls back with
+# the friendship itself.
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select, update, union_all, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.friendships import Friendship
+from models.user import User
+
+FRIEND_GRAPH_TTL = float(os.environ.get("FRIEND_GRAPH_TTL", "300"))
+FRIEND_GRAPH_CACHE_SIZE = int(os.environ.get("FRIEND_GRAPH_CACHE_SIZE", "10000"))
+
+class FriendGraphCache:
+    """LRU of user id -> frozenset of accepted friend ids, each entry expiring after FRIEND_GRAPH_TTL"""
+
+    def __init__(self, max_entries: int = FRIEND_GRAPH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, FrozenSet[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that overlapped one is not stored
+        self.generation = 0
+
+    def get(self, user_id: str) -> Optional[FrozenSet[str]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            loaded_at, friends = entry
+            if time.time() - loaded_at >= FRIEND_GRAPH_TTL:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return friends
+
+    def put(self, user_id: str, friends: FrozenSet[str], generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[user_id] = (time.time(), friends)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+friend_graph_cache = FriendGraphCache()
+
+def _friends_query(user_id: str):
+    accepted = Friendship.status == "accepted"
+    return union_all(
+        select(Friendship.friend_id.label("id")).where(Friendship.user_id == user_id, accepted),
+        select(Friendship.user_id.label("id")).where(Friendship.friend_id == user_id, accepted)
+    )
+
+async def friend_ids(db: AsyncSession, user_id: str) -> FrozenSet[str]:
+    """Ids of the user's accepted friends (cached)"""
+    friends = friend_graph_cache.get(user_id)
+    if friends is None:
+        generation = friend_graph_cache.generation
+        friends = frozenset((await db.scalars(_friends_query(user_id))).all())
+        friend_graph_cache.put(user_id, friends, generation)
+    return friends
+
+# =============================================================================
+# INVALIDATION
+# =============================================================================
+
+def mark_friends_changed(session: Session, user_ids: Iterable[str]) -> None:
+    """Invalidate these users' friends when session commits - for Core writes to friendships"""
+    session.info.setdefault("friends_changed", set()).update(user_ids)
+
+@event.listens_for(Session, "after_flush")
+def _note_friendship_writes(session, flush_context):
+    changed = [
+        (obj.user_id, obj.friend_id)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, Friendship)
+    ]
+    if changed:
+        mark_friends_changed(session, (user_id for pair in changed for user_id in pair))
+        adjust_pending_counts(session.connection(), _pending_changes(session))
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Only committed writes count
+    changed = session.info.pop("friends_changed", None)
+    if changed:
+        friend_graph_cache.invalidate(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("friends_changed", None)
+
+# =============================================================================
+# PENDING REQUEST COUNTS
+# =============================================================================
+
+def _was_pending(friendship: Friendship) -> bool:
+    history = inspect(friendship).attrs.status.history
+    previous = history.deleted[0] if history.deleted else friendship.status
+    return previous in (None, "pending")
+
+def _pending_changes(session) -> Dict[str, int]:
+    """Change in each recipient's pending count from the friendships in this flush"""
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, Friendship) and obj.status in (None, "pending"):
+            deltas[obj.friend_id] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Friendship) and inspect(obj).attrs.status.history.has_changes():
+            deltas[obj.friend_id] += (obj.status == "pending") - _was_pending(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Friendship) and _was_pending(obj):
+            deltas[obj.friend_id] -= 1
+    return deltas
+
+def adjust_pending_counts(connection, deltas: Dict[str, int]) -> None:
+    """
+    Apply {user_id: change} to users.pending_friend_requests - for Core writes
+    to friendships. One UPDATE per distinct change, so a bulk send is one statement.
+    """
+    by_delta: Dict[int, List[str]] = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        connection.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(pending_friend_requests=User.pending_friend_requests + delta)
+        )
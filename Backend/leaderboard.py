@@ -0,0 +1,202 @@
+# =============================================================================
+# FILE: leaderboard.py
+# DESCRIPTION: Lifetime and weekly/monthly points leaderboards served from indexes
+# =============================================================================
+#
+# The lifetime board orders players by users.points, highest first, ties going
+# to whoever joined first - the (points DESC, created_at, id) index. Weekly and
+# monthly boards order leaderboard_scores rows for one window by the points
+# earned in it, ties going to whoever reached the score first - the
+# (period, period_start, points DESC, reached_at, user_id) index. The ledger
+# keeps those scores current (ledger.py). Both reads stay off full tables:
+#   - one page of at most MAX_PAGE_SIZE rows, seeking past an opaque cursor
+#     that also carries the rank of the last row shown, so deep pages cost the
+#     same as the first
+#   - a player's rank: COUNT(*) of players ahead - an index range scan that
+#     never materializes user rows
+# A friends board ranks a user among their accepted friends (cached in
+# friend_graph.py) with one primary-key lookup of those few rows.
+
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user import User
+from models.points_transactions import LeaderboardScore
+from ledger import leaderboard_window
+from friend_graph import friend_ids
+from pagination import encode_cursor, decode_cursor, cursor_datetime, comparable_timestamp
+
+LEADERBOARD_ORDER = (User.points.desc(), User.created_at.asc(), User.id.asc())
+WINDOW_ORDER = (LeaderboardScore.points.desc(), LeaderboardScore.reached_at.asc(), LeaderboardScore.user_id.asc())
+
+def leaderboard_entry(rank: Optional[int], user, points: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "rank": rank,
+        "id": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "points": user.points if points is None else points,
+        "currency": user.currency,
+    }
+
+def _ahead_of(dialect_name: str, columns, points, reached_at, row_id):
+    """Rows ranked above a (points, timestamp, id) position, by (points, timestamp, id) columns"""
+    points_column, timestamp_column, id_column = columns
+    column = comparable_timestamp(dialect_name, timestamp_column)
+    at = comparable_timestamp(dialect_name, reached_at)
+    # The leading points >= bound gives the planner an index range to scan
+    return and_(
+        points_column >= points,
+        or_(points_column > points, column < at, and_(column == at, id_column < row_id))
+    )
+
+def _behind(dialect_name: str, columns, points, reached_at, row_id):
+    """Rows ranked below a (points, timestamp, id) position"""
+    points_column, timestamp_column, id_column = columns
+    column = comparable_timestamp(dialect_name, timestamp_column)
+    at = comparable_timestamp(dialect_name, reached_at)
+    return and_(
+        points_column <= points,
+        or_(points_column < points, column > at, and_(column == at, id_column > row_id))
+    )
+
+def _decode_position(cursor: str) -> Tuple[int, Any, str, int]:
+    points, created_at, user_id, rank = decode_cursor(cursor, 4)
+    if not isinstance(points, int) or not isinstance(rank, int) or not isinstance(user_id, str):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return points, cursor_datetime(created_at), user_id, rank
+
+async def _page(db: AsyncSession, query, columns, order, limit: int,
+                cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of a board query selecting the user's fields plus its sort key
+    as points, reached_at and id
+    """
+    rank = 0
+    if cursor:
+        points, reached_at, row_id, rank = _decode_position(cursor)
+        query = query.where(_behind(db.bind.dialect.name, columns, points, reached_at, row_id))
+    rows = (await db.execute(query.order_by(*order).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.points, last.reached_at, last.id, rank + limit)
+    return [leaderboard_entry(rank + n, row) for n, row in enumerate(rows, start=1)], next_cursor
+
+# =============================================================================
+# LIFETIME
+# =============================================================================
+
+LIFETIME_KEY = (User.points, User.created_at, User.id)
+
+async def top_players(db: AsyncSession, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of the leaderboard and the cursor for the next (None on the last page)"""
+    query = select(User.id, User.first_name, User.last_name, User.points, User.currency,
+                   User.created_at.label("reached_at"))
+    return await _page(db, query, LIFETIME_KEY, LEADERBOARD_ORDER, limit, cursor)
+
+async def player_rank(db: AsyncSession, user_id: str) -> Optional[Dict[str, Any]]:
+    """The user's leaderboard entry, or None when there is no such user"""
+    user = await db.get(User, user_id)
+    if user is None:
+        return None
+    # Compared against the user's stored row rather than bound values, so the
+    # timestamps on both sides have the database's own representation
+    me = aliased(User)
+    ahead = await db.scalar(
+        select(func.count())
+        .select_from(User)
+        .join(me, me.id == user_id)
+        .where(_ahead_of(db.bind.dialect.name, LIFETIME_KEY, me.points, me.created_at, me.id))
+    )
+    return leaderboard_entry(ahead + 1, user)
+
+# =============================================================================
+# WEEKLY / MONTHLY
+# =============================================================================
+
+WINDOW_KEY = (LeaderboardScore.points, LeaderboardScore.reached_at, LeaderboardScore.user_id)
+
+def window_start(period: str, day: Optional[date] = None) -> date:
+    """Start of the period window containing day (today in UTC by default)"""
+    moment = datetime.combine(day, datetime.min.time()) if day else datetime.now(timezone.utc)
+    return leaderboard_window(period, moment)
+
+async def top_players_in_window(db: AsyncSession, period: str, period_start: date, limit: int,
+                                cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of a weekly or monthly leaderboard - points are those earned in the window"""
+    query = (
+        select(User.id, User.first_name, User.last_name, User.currency,
+               LeaderboardScore.points, LeaderboardScore.reached_at)
+        .join(User, User.id == LeaderboardScore.user_id)
+        .where(LeaderboardScore.period == period, LeaderboardScore.period_start == period_start)
+    )
+    return await _page(db, query, WINDOW_KEY, WINDOW_ORDER, limit, cursor)
+
+async def player_window_rank(db: AsyncSession, user_id: str, period: str,
+                             period_start: date) -> Optional[Dict[str, Any]]:
+    """
+    The user's entry on a weekly or monthly leaderboard, or None when there
+    is no such user. Players who earned nothing in the window are unranked
+    (rank None, 0 points).
+    """
+    user = await db.get(User, user_id)
+    if user is None:
+        return None
+    in_window = (LeaderboardScore.period == period, LeaderboardScore.period_start == period_start)
+    score = await db.scalar(select(LeaderboardScore.points).where(*in_window, LeaderboardScore.user_id == user_id))
+    if score is None:
+        return leaderboard_entry(None, user, points=0)
+
+    me = aliased(LeaderboardScore)
+    ahead = await db.scalar(
+        select(func.count())
+        .select_from(LeaderboardScore)
+        .join(me, and_(me.period == period, me.period_start == period_start, me.user_id == user_id))
+        .where(*in_window, _ahead_of(db.bind.dialect.name, WINDOW_KEY, me.points, me.reached_at, me.user_id))
+    )
+    return leaderboard_entry(ahead + 1, user, points=score)
+
+# =============================================================================
+# FRIENDS
+# =============================================================================
+
+async def friends_leaderboard(db: AsyncSession, user_id: str, period: Optional[str] = None,
+                              period_start: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    The user and their accepted friends in leaderboard order, by lifetime
+    points or by the points earned in a weekly/monthly window - None when
+    there is no such user. Friends with nothing in the window rank last.
+    """
+    players = {user_id, *(await friend_ids(db, user_id))}
+    if period:
+        query = (
+            select(User.id, User.first_name, User.last_name, User.currency,
+                   func.coalesce(LeaderboardScore.points, 0).label("points"))
+            .outerjoin(LeaderboardScore, and_(
+                LeaderboardScore.user_id == User.id,
+                LeaderboardScore.period == period,
+                LeaderboardScore.period_start == period_start
+            ))
+            .order_by(func.coalesce(LeaderboardScore.points, 0).desc(),
+                      LeaderboardScore.reached_at.asc().nulls_last(), User.id)
+        )
+    else:
+        query = select(User.id, User.first_name, User.last_name, User.currency, User.points).order_by(*LEADERBOARD_ORDER)
+    rows = (await db.execute(query.where(User.id.in_(players)))).all()
+
+    rankings = [leaderboard_entry(rank, row) for rank, row in enumerate(rows, start=1)]
+    me = next((entry for entry in rankings if entry["id"] == user_id), None)
+    if me is None:
+        return None
+    return {"user": me, "rankings": rankings, "total": len(rankings)}
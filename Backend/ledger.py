@@ -0,0 +1,307 @@
+# =============================================================================
+# FILE: ledger.py
+# DESCRIPTION: Atomic points/currency changes recorded in an append-only ledger
+# =============================================================================
+#
+# Every change to a user's points or currency goes through
+# apply_balance_change(): it appends a PointsTransaction carrying the exact
+# deltas and applies them with one
+#   UPDATE users SET points = points + :p, currency = currency + :c ... RETURNING
+# in the caller's transaction. The database does the arithmetic, so
+# concurrent requests for one user can't overwrite each other's increments,
+# and the row lock is only held from that statement to the caller's commit.
+#
+# users.points and users.currency are a cache of the ledger sums;
+# reconcile_balances() reports (and optionally repairs) any drift.
+#
+# Per-day, per-week and lifetime totals by transaction type are kept in
+# points_rollups, updated in the same flush as every new ledger entry, so the
+# wallet summary reads a few rollup rows instead of the whole history. The
+# same flush adds points to the user's weekly and monthly leaderboard_scores.
+# Balance corrections (opening balances, reconciliation entries) count in the
+# rollups but not on the leaderboards - they were not earned in that window.
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, select, update, func, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user import User
+from models.points_transactions import PointsTransaction, PointsRollup, LeaderboardScore
+
+logger = logging.getLogger(__name__)
+
+def _balance_update(user_id: str, points: int, currency: int, require_funds: bool):
+    statement = (
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            points=func.coalesce(User.points, 0) + points,
+            currency=func.coalesce(User.currency, 0) + currency
+        )
+        .returning(User.points, User.currency)
+        .execution_options(synchronize_session=False)
+    )
+    if require_funds:
+        # Checked by the same statement that deducts, so two redemptions
+        # racing for the last coins can't both succeed
+        statement = statement.where(func.coalesce(User.currency, 0) + currency >= 0)
+    return statement
+
+def _ledger_entry(user_id: str, points: int, currency: int, transaction_type: str, description: str,
+                  amount: Optional[int], reference_id: Optional[str]) -> PointsTransaction:
+    return PointsTransaction(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        # The amount shown in the transaction history
+        points=amount if amount is not None else (points or currency),
+        points_change=points,
+        currency_change=currency,
+        description=description,
+        reference_id=reference_id
+    )
+
+def _applied(user: User, row) -> Dict[str, int]:
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Not enough currency"
+        )
+    # Keep the loaded user current without marking it dirty or re-selecting it
+    set_committed_value(user, "points", row.points)
+    set_committed_value(user, "currency", row.currency)
+    return {"points": row.points, "currency": row.currency}
+
+def apply_balance_change(db: Session, user: User, *, transaction_type: str, description: str,
+                         points: int = 0, currency: int = 0, amount: Optional[int] = None,
+                         reference_id: Optional[str] = None, require_funds: bool = False) -> Dict[str, int]:
+    """
+    Append a ledger entry and apply its deltas atomically; returns the new
+    {"points", "currency"}. Nothing is committed - the change is part of the
+    caller's transaction. With require_funds a deduction that would take
+    currency below zero is refused with a 400.
+    """
+    row = db.execute(_balance_update(user.id, points, currency, require_funds)).first()
+    balance = _applied(user, row)
+    db.add(_ledger_entry(user.id, points, currency, transaction_type, description, amount, reference_id))
+    return balance
+
+async def apply_balance_change_async(db: AsyncSession, user: User, *, transaction_type: str, description: str,
+                                     points: int = 0, currency: int = 0, amount: Optional[int] = None,
+                                     reference_id: Optional[str] = None,
+                                     require_funds: bool = False) -> Dict[str, int]:
+    """apply_balance_change for an AsyncSession"""
+    row = (await db.execute(_balance_update(user.id, points, currency, require_funds))).first()
+    balance = _applied(user, row)
+    db.add(_ledger_entry(user.id, points, currency, transaction_type, description, amount, reference_id))
+    return balance
+
+# =============================================================================
+# RECONCILIATION
+# =============================================================================
+
+def reconcile_balances(db: Session, repair: bool = False) -> List[Dict[str, Any]]:
+    """
+    Users whose cached points/currency differ from their ledger sums.
+    With repair=True each difference is booked as a "reconciliation" ledger
+    entry, so the balance shown to the user is kept and the ledger catches up.
+    """
+    ledger = (
+        select(
+            PointsTransaction.user_id,
+            func.sum(PointsTransaction.points_change).label("points"),
+            func.sum(PointsTransaction.currency_change).label("currency")
+        )
+        .group_by(PointsTransaction.user_id)
+        .subquery()
+    )
+    ledger_points = func.coalesce(ledger.c.points, 0)
+    ledger_currency = func.coalesce(ledger.c.currency, 0)
+    rows = db.execute(
+        select(
+            User.id,
+            func.coalesce(User.points, 0).label("points"),
+            func.coalesce(User.currency, 0).label("currency"),
+            ledger_points.label("ledger_points"),
+            ledger_currency.label("ledger_currency")
+        )
+        .outerjoin(ledger, ledger.c.user_id == User.id)
+        .where((func.coalesce(User.points, 0) != ledger_points)
+               | (func.coalesce(User.currency, 0) != ledger_currency))
+    ).all()
+
+    drift = [
+        {
+            "user_id": row.id,
+            "points": row.points,
+            "currency": row.currency,
+            "ledger_points": row.ledger_points,
+            "ledger_currency": row.ledger_currency
+        }
+        for row in rows
+    ]
+    for entry in drift:
+        logger.warning(
+            f"Balance drift for user {entry['user_id']}: points {entry['points']} vs ledger "
+            f"{entry['ledger_points']}, currency {entry['currency']} vs ledger {entry['ledger_currency']}"
+        )
+
+    if repair and drift:
+        db.add_all(
+            _ledger_entry(
+                entry["user_id"],
+                entry["points"] - entry["ledger_points"],
+                entry["currency"] - entry["ledger_currency"],
+                "reconciliation",
+                "Balance adjustment from ledger reconciliation",
+                None,
+                None
+            )
+            for entry in drift
+        )
+        db.commit()
+    return drift
+
+# =============================================================================
+# ROLLUPS
+# =============================================================================
+
+# period_start of the lifetime ("all") rollup rows
+LIFETIME_START = date(1970, 1, 1)
+
+def rollup_buckets(moment: datetime) -> List[Tuple[str, date]]:
+    """(period, period_start) rollup rows a ledger entry made at moment counts towards"""
+    day = (moment.astimezone(timezone.utc) if moment.tzinfo else moment).date()
+    return [("day", day), ("week", day - timedelta(days=day.weekday())), ("all", LIFETIME_START)]
+
+def _upsert(connection):
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def add_to_rollups(connection, entries: Iterable[Tuple[str, str, datetime, int, int]]) -> None:
+    """
+    Fold (user_id, transaction_type, created_at, points_change, currency_change)
+    entries into points_rollups with one INSERT ... ON CONFLICT DO UPDATE
+    """
+    totals: Dict[Tuple[str, str, date, str], List[int]] = {}
+    for user_id, transaction_type, created_at, points_change, currency_change in entries:
+        for period, period_start in rollup_buckets(created_at):
+            total = totals.setdefault((user_id, period, period_start, transaction_type), [0, 0, 0])
+            total[0] += 1
+            total[1] += points_change or 0
+            total[2] += currency_change or 0
+    if not totals:
+        return
+
+    statement = _upsert(connection)(PointsRollup).values([
+        {
+            "user_id": user_id, "period": period, "period_start": period_start,
+            "transaction_type": transaction_type, "transactions": count,
+            "points_change": points_change, "currency_change": currency_change
+        }
+        for (user_id, period, period_start, transaction_type), (count, points_change, currency_change)
+        in totals.items()
+    ])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "period", "period_start", "transaction_type"],
+        set_={
+            "transactions": PointsRollup.transactions + statement.excluded.transactions,
+            "points_change": PointsRollup.points_change + statement.excluded.points_change,
+            "currency_change": PointsRollup.currency_change + statement.excluded.currency_change
+        }
+    ))
+
+# Leaderboard windows and the date each one containing a moment starts on
+LEADERBOARD_PERIODS = ("week", "month")
+
+# Ledger entries that correct a balance rather than earn points
+UNRANKED_TRANSACTION_TYPES = ("opening_balance", "reconciliation")
+
+def leaderboard_window(period: str, moment: datetime) -> date:
+    day = (moment.astimezone(timezone.utc) if moment.tzinfo else moment).date()
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def add_to_leaderboards(connection, entries: Iterable[Tuple[str, datetime, int]]) -> None:
+    """
+    Fold (user_id, created_at, points_change) entries into leaderboard_scores
+    with one INSERT ... ON CONFLICT DO UPDATE. reached_at becomes the time of
+    the user's latest change in the window.
+    """
+    scores: Dict[Tuple[str, date, str], List[Any]] = {}
+    for user_id, created_at, points_change in entries:
+        if not points_change:
+            continue
+        for period in LEADERBOARD_PERIODS:
+            score = scores.setdefault((period, leaderboard_window(period, created_at), user_id), [0, created_at])
+            score[0] += points_change
+            score[1] = max(score[1], created_at)
+    if not scores:
+        return
+
+    statement = _upsert(connection)(LeaderboardScore).values([
+        {"period": period, "period_start": period_start, "user_id": user_id, "points": points, "reached_at": reached_at}
+        for (period, period_start, user_id), (points, reached_at) in scores.items()
+    ])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=["period", "period_start", "user_id"],
+        set_={
+            "points": LeaderboardScore.points + statement.excluded.points,
+            "reached_at": statement.excluded.reached_at
+        }
+    ))
+
+@event.listens_for(Session, "after_flush")
+def _roll_up_new_entries(session, flush_context):
+    entries = [obj for obj in session.new if isinstance(obj, PointsTransaction)]
+    if not entries:
+        return
+    now = datetime.now(timezone.utc)
+    # Read the loaded values only - created_at is a server default, and
+    # touching an unloaded attribute here would re-select the row
+    values = [inspect(entry).dict for entry in entries]
+    connection = session.connection()
+    add_to_rollups(connection, (
+        (value["user_id"], value["transaction_type"], value.get("created_at") or now,
+         value.get("points_change", 0), value.get("currency_change", 0))
+        for value in values
+    ))
+    add_to_leaderboards(connection, (
+        (value["user_id"], value.get("created_at") or now, value.get("points_change", 0))
+        for value in values if value["transaction_type"] not in UNRANKED_TRANSACTION_TYPES
+    ))
+
+def transaction_summary(db: Session, user_id: str, period: str, periods: int) -> Dict[str, Any]:
+    """Lifetime totals by transaction type and the latest periods' totals, from the rollups"""
+    by_type = db.execute(
+        select(PointsRollup.transaction_type, PointsRollup.transactions,
+               PointsRollup.points_change, PointsRollup.currency_change)
+        .where(PointsRollup.user_id == user_id, PointsRollup.period == "all")
+        .order_by(PointsRollup.transaction_type)
+    ).all()
+    by_period = db.execute(
+        select(
+            PointsRollup.period_start,
+            func.sum(PointsRollup.transactions).label("transactions"),
+            func.sum(PointsRollup.points_change).label("points_change"),
+            func.sum(PointsRollup.currency_change).label("currency_change")
+        )
+        .where(PointsRollup.user_id == user_id, PointsRollup.period == period)
+        .group_by(PointsRollup.period_start)
+        .order_by(PointsRollup.period_start.desc())
+        .limit(periods)
+    ).all()
+    return {
+        "period": period,
+        "by_type": [row._asdict() for row in by_type],
+        "by_period": [row._asdict() for row in by_period]
+    }
@@ -3,25 +3,44 @@
 # DESCRIPTION: FastAPI application entry point with auto-seeding
 # =============================================================================
 
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from database import engine
+from compression import CompressionMiddleware
+from migrations import run_migrations
 from relationships import setup_relationships
+import query_metrics
+import slow_query_log  # registers the slow-query recorder on all engines
 
 # Import routers
-from routes import auth, users, species, friendships, reports, scanned_species, vouchers, points, badges, quiz
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from routes import auth, users, species, friendships, reports, scanned_species, vouchers, points, badges, quiz, admin, me
 
 # Setup relationships after all models are defined
 setup_relationships()
 
+# Set to "false" when migrations are applied by a separate deploy step
+# (python -m migrations) so instances start without touching the schema
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup work that needs the database runs here rather than at import,
+    keeping `import main` cheap. Heavy SDK clients are created on first use.
+    """
+    if RUN_MIGRATIONS_ON_STARTUP:
+        # Bring the schema up to date (creates tables on a fresh database)
+        run_migrations(engine)
+    yield
+
 # Create FastAPI application instance
 app = FastAPI(
     title="Semai - Malaysia Wildlife Conservation API",
     description="A comprehensive API for wildlife conservation, species identification, and educational content",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS middleware - FIXED VERSION
@@ -34,6 +53,28 @@ app.add_middleware(
     expose_headers=["*"]  # Important for cookies/auth
 )
 
+# gzip/brotli for JSON responses over COMPRESSION_MIN_SIZE bytes
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def track_db_queries(request: Request, call_next):
+    """
+    Count SQL queries and DB time per request, flagging repeated statements (N+1).
+    Numbers go to response headers in development and to /admin/db-metrics always.
+    """
+    token = query_metrics.start_request_tracking()
+    try:
+        response = await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", request.url.path)
+        stats = query_metrics.finish_request_tracking(token, f"{request.method} {route_path}")
+    
+    if query_metrics.ENVIRONMENT == "development":
+        response.headers.update(query_metrics.response_headers(stats))
+    
+    return response
+
 # Include all API routers
 app.include_router(auth.router)           # Authentication endpoints
 app.include_router(users.router)          # User management endpoints  
@@ -45,6 +86,8 @@ app.include_router(vouchers.router)       # Reward system endpoints
 app.include_router(points.router)         # Points system endpoints
 app.include_router(badges.router)         # Badges system endpoints
 app.include_router(quiz.router)           # Educational quiz endpoints
+app.include_router(admin.router)          # Operational metrics endpoints
+app.include_router(me.router)             # Current user's dashboard
 
 # =============================================================================
 # ROOT ENDPOINTS
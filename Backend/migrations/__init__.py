@@ -0,0 +1,87 @@
+# =============================================================================
+# FILE: migrations/__init__.py
+# DESCRIPTION: Versioned schema migrations (replaces Base.metadata.create_all)
+# =============================================================================
+#
+# Each migration is a module in this package named vNNNN_<description>.py with
+# an upgrade(conn) function. Applied versions are recorded in schema_migrations;
+# pending ones run in version order, each in its own transaction.
+#
+# Adding a migration: create the next vNNNN_ module, write upgrade(conn) with
+# the helpers in migrations.helpers, and mirror the change on the model.
+# Migrations spell out their DDL instead of creating tables from the models,
+# so fresh and existing databases go through the same steps.
+
+import re
+import pkgutil
+import logging
+import importlib
+from typing import List, Tuple
+from types import ModuleType
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, text
+from sqlalchemy.sql import func
+
+logger = logging.getLogger(__name__)
+
+_MODULE_NAME = re.compile(r"^v(\d{4})_(\w+)$")
+
+# Arbitrary constant - serializes migration runs from concurrently starting instances
+_ADVISORY_LOCK_KEY = 72_000_029
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now())
+)
+
+def discover_migrations() -> List[Tuple[int, str, ModuleType]]:
+    """All migration modules in this package as (version, name, module), in version order"""
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(info.name)
+        if match:
+            module = importlib.import_module(f"{__name__}.{info.name}")
+            found.append((int(match.group(1)), match.group(2), module))
+    return sorted(found, key=lambda item: item[0])
+
+def _lock(conn) -> None:
+    """Hold a transaction-scoped lock on PostgreSQL; SQLite already serializes writers"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+def applied_versions(conn) -> set:
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def run_migrations(engine) -> List[int]:
+    """
+    Apply every pending migration. Safe to call on each startup and from
+    several processes at once. Returns the versions applied by this call.
+    """
+    with engine.begin() as conn:
+        _lock(conn)
+        schema_migrations.create(conn, checkfirst=True)
+
+    applied_now = []
+    for version, name, module in discover_migrations():
+        with engine.begin() as conn:
+            _lock(conn)
+            if version in applied_versions(conn):
+                continue
+
+            logger.info(f"Applying migration {version:04d}_{name}")
+            module.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+            applied_now.append(version)
+
+    if applied_now:
+        print(f"✅ Applied {len(applied_now)} migration(s): {', '.join(f'{v:04d}' for v in applied_now)}")
+    return applied_now
+
+def drop_migration_history(engine) -> None:
+    """Forget applied migrations - used together with drop_all when resetting the database"""
+    schema_migrations.drop(engine, checkfirst=True)
@@ -0,0 +1,15 @@
+# =============================================================================
+# FILE: migrations/__main__.py
+# DESCRIPTION: Apply pending migrations from the command line
+# =============================================================================
+#
+# Usage (from Backend/):
+#   python -m migrations
+
+from database import engine
+from migrations import run_migrations
+
+if __name__ == "__main__":
+    applied = run_migrations(engine)
+    if not applied:
+        print("✅ Schema is up to date")
@@ -0,0 +1,37 @@
+# =============================================================================
+# FILE: migrations/helpers.py
+# DESCRIPTION: Idempotent DDL helpers shared by the migration scripts
+# =============================================================================
+#
+# Databases built by the old create_all startup call already have some of the
+# objects later migrations add, so every helper here is a no-op when the
+# object already exists.
+
+from typing import List
+from sqlalchemy import inspect, text
+
+def has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+def create_index(conn, name: str, table: str, columns: List[str], unique: bool = False) -> None:
+    """
+    CREATE [UNIQUE] INDEX IF NOT EXISTS - supported by both PostgreSQL and SQLite
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    conn.execute(text(
+        f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+def drop_index(conn, name: str) -> None:
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def add_column(conn, table: str, column: str, ddl: str) -> None:
+    """
+    Add a column unless it is already there.
+    ddl is the column definition after the name, e.g. "TIMESTAMP WITH TIME ZONE"
+    """
+    if not has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
@@ -0,0 +1,171 @@
+# =============================================================================
+# FILE: migrations/v0001_baseline.py
+# DESCRIPTION: Baseline schema - the tables as the models defined them before migrations
+# =============================================================================
+#
+# Frozen DDL rather than Base.metadata.create_all: the models keep changing,
+# and a fresh database must go through the same steps as an old one instead
+# of starting from whatever the models look like today. Every statement is
+# IF NOT EXISTS, so this is a no-op on databases that were built by the old
+# create_all startup call.
+#
+# The DDL is valid on PostgreSQL and SQLite alike; SQLite only uses the
+# declared types for affinity, and the models convert values client-side.
+
+from sqlalchemy import text
+from migrations.helpers import create_index
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS animal_class (
+        id VARCHAR NOT NULL,
+        class_name TEXT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id),
+        UNIQUE (class_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id VARCHAR NOT NULL,
+        email VARCHAR NOT NULL,
+        password VARCHAR NOT NULL,
+        first_name VARCHAR NOT NULL,
+        last_name VARCHAR NOT NULL,
+        phone_number VARCHAR,
+        birthday DATE,
+        points INTEGER,
+        currency INTEGER,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        is_active BOOLEAN,
+        profile_picture VARCHAR,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS vouchers (
+        id VARCHAR NOT NULL,
+        title VARCHAR NOT NULL,
+        description TEXT,
+        points_required INTEGER NOT NULL,
+        expiry_date DATE NOT NULL,
+        merchant_name VARCHAR NOT NULL,
+        is_active BOOLEAN,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS friendships (
+        id VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL,
+        friend_id VARCHAR NOT NULL,
+        status VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        accepted_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (friend_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS points_transactions (
+        id VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL,
+        transaction_type VARCHAR NOT NULL,
+        points INTEGER NOT NULL,
+        description VARCHAR NOT NULL,
+        reference_id VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS species (
+        id VARCHAR NOT NULL,
+        animal_class_id VARCHAR NOT NULL,
+        common_name TEXT NOT NULL,
+        scientific_name TEXT NOT NULL,
+        description TEXT,
+        habitat TEXT,
+        threats TEXT,
+        conservation TEXT,
+        endangered_status VARCHAR,
+        api_response JSON,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id),
+        FOREIGN KEY (animal_class_id) REFERENCES animal_class (id),
+        UNIQUE (scientific_name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_vouchers (
+        id VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL,
+        voucher_id VARCHAR NOT NULL,
+        redemption_code VARCHAR NOT NULL,
+        redeemed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        expires_at DATE NOT NULL,
+        is_used BOOLEAN,
+        used_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (voucher_id) REFERENCES vouchers (id),
+        UNIQUE (redemption_code)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS scanned_species (
+        id VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL,
+        species_id VARCHAR,
+        location VARCHAR NOT NULL,
+        image_url VARCHAR,
+        date_spotted TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        verified BOOLEAN,
+        PRIMARY KEY (id),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (species_id) REFERENCES species (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS reports (
+        id VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL,
+        scanned_species_id VARCHAR NOT NULL,
+        image_url VARCHAR,
+        species VARCHAR NOT NULL,
+        location VARCHAR NOT NULL,
+        endangered_status VARCHAR NOT NULL,
+        remarks VARCHAR,
+        status VARCHAR,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id),
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (scanned_species_id) REFERENCES scanned_species (id)
+    )
+    """,
+]
+
+# (name, table, columns, unique) - the index=True columns of the original models
+INDEXES = [
+    ("ix_animal_class_id", "animal_class", ["id"], False),
+    ("ix_users_id", "users", ["id"], False),
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_vouchers_id", "vouchers", ["id"], False),
+    ("ix_friendships_id", "friendships", ["id"], False),
+    ("ix_points_transactions_id", "points_transactions", ["id"], False),
+    ("ix_species_id", "species", ["id"], False),
+    ("ix_user_vouchers_id", "user_vouchers", ["id"], False),
+    ("ix_scanned_species_id", "scanned_species", ["id"], False),
+    ("ix_reports_id", "reports", ["id"], False),
+]
+
+def upgrade(conn):
+    for ddl in TABLES:
+        conn.execute(text(ddl))
+    for name, table, columns, unique in INDEXES:
+        create_index(conn, name, table, columns, unique=unique)
@@ -0,0 +1,28 @@
+# =============================================================================
+# FILE: migrations/v0002_hot_path_indexes.py
+# DESCRIPTION: Indexes for the per-user filters that previously scanned
+# =============================================================================
+
+from migrations.helpers import create_index
+
+def upgrade(conn):
+    # Duplicate-scan check (user, species, location) and the user's scan list
+    create_index(conn, "ix_scanned_species_user_species_location", "scanned_species",
+                 ["user_id", "species_id", "location"])
+
+    # Catalog browsing by animal class
+    create_index(conn, "ix_species_animal_class_id", "species", ["animal_class_id"])
+
+    # Transaction history, newest first
+    create_index(conn, "ix_points_transactions_user_created", "points_transactions",
+                 ["user_id", "created_at"])
+
+    # Outgoing / incoming requests and friend lists by status
+    create_index(conn, "ix_friendships_user_status", "friendships", ["user_id", "status"])
+    create_index(conn, "ix_friendships_friend_status", "friendships", ["friend_id", "status"])
+
+    # "My vouchers" filtered by usage and expiry
+    create_index(conn, "ix_user_vouchers_user_used_expires", "user_vouchers",
+                 ["user_id", "is_used", "expires_at"])
+
+    create_index(conn, "ix_reports_user_id", "reports", ["user_id"])
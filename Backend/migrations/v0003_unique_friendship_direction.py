@@ -0,0 +1,29 @@
+# =============================================================================
+# FILE: migrations/v0003_unique_friendship_direction.py
+# DESCRIPTION: One friendship row per (user_id, friend_id)
+# =============================================================================
+#
+# send_friend_request only checks for an existing row before inserting, so
+# concurrent requests could store duplicates. Duplicates are removed first,
+# keeping accepted over pending over rejected, then the oldest row.
+
+from sqlalchemy import text
+from migrations.helpers import create_index
+
+def upgrade(conn):
+    conn.execute(text("""
+        DELETE FROM friendships WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, friend_id
+                    ORDER BY CASE status WHEN 'accepted' THEN 0 WHEN 'pending' THEN 1 ELSE 2 END,
+                             created_at, id
+                ) AS duplicate_rank
+                FROM friendships
+            ) ranked
+            WHERE duplicate_rank > 1
+        )
+    """))
+
+    create_index(conn, "uq_friendships_user_friend", "friendships",
+                 ["user_id", "friend_id"], unique=True)
@@ -0,0 +1,38 @@
+# =============================================================================
+# FILE: migrations/v0004_search_trigram_indexes.py
+# DESCRIPTION: pg_trgm GIN indexes for species and user search
+# =============================================================================
+#
+# GIN trigram indexes serve both ILIKE '%term%' and the fuzzy "<%" operator.
+# When the extension cannot be installed (SQLite, or a PostgreSQL build without
+# contrib) this is a no-op and search.py uses its in-process n-gram index.
+
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_INDEXES = [
+    ("ix_species_common_name_trgm", "species", "common_name"),
+    ("ix_species_scientific_name_trgm", "species", "scientific_name"),
+    ("ix_users_first_name_trgm", "users", "first_name"),
+    ("ix_users_last_name_trgm", "users", "last_name"),
+    ("ix_users_email_trgm", "users", "email"),
+]
+
+def upgrade(conn):
+    if conn.dialect.name != "postgresql":
+        return
+
+    try:
+        # Savepoint so a missing extension doesn't abort the migration transaction
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        logger.warning(f"pg_trgm unavailable, search will use the in-process index: {str(e)}")
+        return
+
+    for name, table, column in TRIGRAM_INDEXES:
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+        ))
@@ -0,0 +1,11 @@
+# =============================================================================
+# FILE: migrations/v0005_scan_history_index.py
+# DESCRIPTION: Index for the newest-first scan history and its keyset pages
+# =============================================================================
+
+from migrations.helpers import create_index
+
+def upgrade(conn):
+    # WHERE user_id = ? ORDER BY date_spotted DESC, id DESC, seeking past a cursor
+    create_index(conn, "ix_scanned_species_user_date", "scanned_species",
+                 ["user_id", "date_spotted", "id"])
@@ -0,0 +1,36 @@
+# =============================================================================
+# FILE: migrations/v0006_scan_sync.py
+# DESCRIPTION: updated_at and delete tombstones for scan history delta sync
+# =============================================================================
+
+from sqlalchemy import text
+from migrations.helpers import add_column, create_index
+
+def upgrade(conn):
+    add_column(conn, "scanned_species", "updated_at", "TIMESTAMP WITH TIME ZONE")
+    if conn.dialect.name == "postgresql":
+        # SQLite cannot give an added column a non-constant default; the model's
+        # client-side default fills it there
+        conn.execute(text("ALTER TABLE scanned_species ALTER COLUMN updated_at SET DEFAULT now()"))
+
+    # Existing sightings were last changed when they were spotted, as far as we know
+    conn.execute(text(
+        "UPDATE scanned_species SET updated_at = COALESCE(date_spotted, CURRENT_TIMESTAMP) "
+        "WHERE updated_at IS NULL"
+    ))
+
+    # WHERE user_id = ? AND (updated_at, id) > cursor ORDER BY updated_at, id
+    create_index(conn, "ix_scanned_species_user_updated", "scanned_species",
+                 ["user_id", "updated_at", "id"])
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS scanned_species_tombstones (
+            scanned_species_id VARCHAR NOT NULL,
+            user_id VARCHAR NOT NULL,
+            deleted_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (scanned_species_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """))
+    create_index(conn, "ix_scanned_species_tombstones_user_deleted", "scanned_species_tombstones",
+                 ["user_id", "deleted_at", "scanned_species_id"])
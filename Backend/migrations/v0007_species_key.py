@@ -0,0 +1,35 @@
+# =============================================================================
+# FILE: migrations/v0007_species_key.py
+# DESCRIPTION: Normalized, unique species_key for race-free species creation
+# =============================================================================
+#
+# species_key is the scientific name folded by search.normalize, so
+# "Panthera tigris" and "panthera  tigris" are one species. Where existing rows
+# already collide, the oldest keeps the key and the others are left NULL
+# (unique indexes allow any number of NULLs) rather than deleted, since scans
+# reference them.
+
+from sqlalchemy import text
+from migrations.helpers import add_column, create_index
+
+def upgrade(conn):
+    from models.species import species_key
+
+    add_column(conn, "species", "species_key", "TEXT")
+
+    rows = conn.execute(text(
+        "SELECT id, scientific_name FROM species WHERE species_key IS NULL "
+        "ORDER BY created_at, id"
+    )).all()
+    taken = set(conn.execute(text(
+        "SELECT species_key FROM species WHERE species_key IS NOT NULL"
+    )).scalars())
+    for species_id, scientific_name in rows:
+        key = species_key(scientific_name)
+        if key in taken:
+            continue
+        taken.add(key)
+        conn.execute(text("UPDATE species SET species_key = :key WHERE id = :id"),
+                     {"key": key, "id": species_id})
+
+    create_index(conn, "uq_species_species_key", "species", ["species_key"], unique=True)
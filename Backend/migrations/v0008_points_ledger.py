@@ -0,0 +1,51 @@
+# =============================================================================
+# FILE: migrations/v0008_points_ledger.py
+# DESCRIPTION: Per-entry balance changes so points_transactions is a full ledger
+# =============================================================================
+#
+# Existing entries only carried one display amount, so their changes are
+# derived from the transaction type:
+#   species_scan - points as shown, currency half of that (the reward tiers)
+#   earn, redeem - currency as shown
+# Balances that never had entries (quiz rewards) are then booked as one
+# opening_balance entry per user, so every balance equals its ledger sum.
+
+import uuid
+from sqlalchemy import text
+from migrations.helpers import add_column
+
+def upgrade(conn):
+    add_column(conn, "points_transactions", "points_change", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "points_transactions", "currency_change", "INTEGER NOT NULL DEFAULT 0")
+
+    conn.execute(text(
+        "UPDATE points_transactions SET points_change = points, currency_change = points / 2 "
+        "WHERE transaction_type = 'species_scan'"
+    ))
+    conn.execute(text(
+        "UPDATE points_transactions SET currency_change = points "
+        "WHERE transaction_type IN ('earn', 'redeem')"
+    ))
+
+    drift = conn.execute(text("""
+        SELECT u.id,
+               COALESCE(u.points, 0) - COALESCE(l.points, 0) AS points_change,
+               COALESCE(u.currency, 0) - COALESCE(l.currency, 0) AS currency_change
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id, SUM(points_change) AS points, SUM(currency_change) AS currency
+            FROM points_transactions GROUP BY user_id
+        ) l ON l.user_id = u.id
+        WHERE COALESCE(u.points, 0) <> COALESCE(l.points, 0)
+           OR COALESCE(u.currency, 0) <> COALESCE(l.currency, 0)
+    """)).all()
+    for user_id, points_change, currency_change in drift:
+        conn.execute(text("""
+            INSERT INTO points_transactions
+                (id, user_id, transaction_type, points, points_change, currency_change, description, created_at)
+            VALUES (:id, :user_id, 'opening_balance', :points, :points_change, :currency_change,
+                    'Balance carried over from before the ledger', CURRENT_TIMESTAMP)
+        """), {
+            "id": str(uuid.uuid4()), "user_id": user_id, "points": points_change,
+            "points_change": points_change, "currency_change": currency_change
+        })
@@ -0,0 +1,33 @@
+# =============================================================================
+# FILE: migrations/v0009_points_rollups.py
+# DESCRIPTION: points_rollups table, backfilled from the existing ledger
+# =============================================================================
+
+from sqlalchemy import select, text
+
+def upgrade(conn):
+    from models.points_transactions import PointsTransaction, PointsRollup
+    from ledger import add_to_rollups
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS points_rollups (
+            user_id VARCHAR NOT NULL,
+            period VARCHAR NOT NULL,
+            period_start DATE NOT NULL,
+            transaction_type VARCHAR NOT NULL,
+            transactions INTEGER NOT NULL,
+            points_change INTEGER NOT NULL,
+            currency_change INTEGER NOT NULL,
+            PRIMARY KEY (user_id, period, period_start, transaction_type),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """))
+
+    # Only when the table is new - a rerun must not count entries twice
+    if conn.execute(select(PointsRollup.__table__.c.user_id).limit(1)).first() is not None:
+        return
+    ledger = PointsTransaction.__table__.c
+    rows = conn.execute(select(
+        ledger.user_id, ledger.transaction_type, ledger.created_at, ledger.points_change, ledger.currency_change
+    ).where(ledger.created_at.isnot(None)))
+    add_to_rollups(conn, rows)
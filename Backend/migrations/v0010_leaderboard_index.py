@@ -0,0 +1,15 @@
+# =============================================================================
+# FILE: migrations/v0010_leaderboard_index.py
+# DESCRIPTION: Index in leaderboard order for paged top-N and COUNT(*) ranks
+# =============================================================================
+
+from sqlalchemy import text
+from migrations.helpers import create_index
+
+def upgrade(conn):
+    # NULL would sort first under DESC on PostgreSQL; the columns default to 0
+    conn.execute(text("UPDATE users SET points = 0 WHERE points IS NULL"))
+    conn.execute(text("UPDATE users SET currency = 0 WHERE currency IS NULL"))
+
+    # ORDER BY points DESC, created_at, id
+    create_index(conn, "ix_users_points_created", "users", ["points DESC", "created_at", "id"])
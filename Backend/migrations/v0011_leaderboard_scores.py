@@ -0,0 +1,39 @@
+# =============================================================================
+# FILE: migrations/v0011_leaderboard_scores.py
+# DESCRIPTION: leaderboard_scores table, backfilled from the existing ledger
+# =============================================================================
+
+from sqlalchemy import select, text
+from migrations.helpers import create_index
+
+def upgrade(conn):
+    from models.points_transactions import PointsTransaction, LeaderboardScore
+    from ledger import add_to_leaderboards, UNRANKED_TRANSACTION_TYPES
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS leaderboard_scores (
+            period VARCHAR NOT NULL,
+            period_start DATE NOT NULL,
+            user_id VARCHAR NOT NULL,
+            points INTEGER NOT NULL,
+            reached_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (period, period_start, user_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """))
+    create_index(conn, "ix_leaderboard_scores_rank", "leaderboard_scores",
+                 ["period", "period_start", "points DESC", "reached_at", "user_id"])
+
+    scores = LeaderboardScore.__table__
+
+    # Only when the table is new - a rerun must not count entries twice
+    if conn.execute(select(scores.c.user_id).limit(1)).first() is not None:
+        return
+    ledger = PointsTransaction.__table__.c
+    rows = conn.execute(select(
+        ledger.user_id, ledger.created_at, ledger.points_change
+    ).where(
+        ledger.created_at.isnot(None), ledger.points_change != 0,
+        ledger.transaction_type.notin_(UNRANKED_TRANSACTION_TYPES)
+    ))
+    add_to_leaderboards(conn, rows)
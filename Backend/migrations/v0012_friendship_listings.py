@@ -0,0 +1,26 @@
+# =============================================================================
+# FILE: migrations/v0012_friendship_listings.py
+# DESCRIPTION: Ordered friendship listing indexes and the pending-request counter
+# =============================================================================
+
+from sqlalchemy import text
+from migrations.helpers import add_column, create_index, drop_index
+
+def upgrade(conn):
+    # WHERE user_id|friend_id = ? AND status = ? ORDER BY created_at DESC, id DESC;
+    # the (side, status) indexes they replace are prefixes of these
+    create_index(conn, "ix_friendships_user_status_created", "friendships",
+                 ["user_id", "status", "created_at", "id"])
+    create_index(conn, "ix_friendships_friend_status_created", "friendships",
+                 ["friend_id", "status", "created_at", "id"])
+    drop_index(conn, "ix_friendships_user_status")
+    drop_index(conn, "ix_friendships_friend_status")
+
+    add_column(conn, "users", "pending_friend_requests", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute(text("""
+        UPDATE users SET pending_friend_requests = (
+            SELECT COUNT(*) FROM friendships
+            WHERE friendships.friend_id = users.id AND friendships.status = 'pending'
+        )
+        WHERE id IN (SELECT friend_id FROM friendships WHERE status = 'pending')
+    """))
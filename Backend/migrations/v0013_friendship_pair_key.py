@@ -0,0 +1,50 @@
+# =============================================================================
+# FILE: migrations/v0013_friendship_pair_key.py
+# DESCRIPTION: One friendship row per pair of users, whichever direction
+# =============================================================================
+#
+# uq_friendships_user_friend only stopped duplicates in one direction; A->B
+# and B->A could both be stored. pair_key is the same for both, so its
+# unique index covers either direction and gives the bulk endpoints an
+# ON CONFLICT target. Reverse duplicates are removed first, keeping accepted
+# over pending over rejected, then the oldest row, and the pending-request
+# counters are recounted.
+
+from sqlalchemy import text
+from migrations.helpers import add_column, create_index, drop_index
+
+def upgrade(conn):
+    add_column(conn, "friendships", "pair_key", "TEXT")
+    conn.execute(text("""
+        UPDATE friendships SET pair_key = CASE WHEN user_id < friend_id
+            THEN user_id || ':' || friend_id ELSE friend_id || ':' || user_id END
+        WHERE pair_key IS NULL
+    """))
+
+    conn.execute(text("""
+        DELETE FROM friendships WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY pair_key
+                    ORDER BY CASE status WHEN 'accepted' THEN 0 WHEN 'pending' THEN 1 ELSE 2 END,
+                             created_at, id
+                ) AS duplicate_rank
+                FROM friendships
+            ) ranked
+            WHERE duplicate_rank > 1
+        )
+    """))
+    conn.execute(text("""
+        UPDATE users SET pending_friend_requests = (
+            SELECT COUNT(*) FROM friendships
+            WHERE friendships.friend_id = users.id AND friendships.status = 'pending'
+        )
+        WHERE pending_friend_requests <> (
+            SELECT COUNT(*) FROM friendships
+            WHERE friendships.friend_id = users.id AND friendships.status = 'pending'
+        )
+    """))
+
+    create_index(conn, "uq_friendships_pair_key", "friendships", ["pair_key"], unique=True)
+    # Implied by the pair key
+    drop_index(conn, "uq_friendships_user_friend")
@@ -0,0 +1,24 @@
+# =============================================================================
+# FILE: migrations/v0014_sync_version.py
+# DESCRIPTION: Commit-ordered sync_version replaces updated_at as the delta sync key
+# =============================================================================
+
+from sqlalchemy import text
+from migrations.helpers import add_column, create_index, drop_index
+
+def upgrade(conn):
+    for table in ("scanned_species", "scanned_species_tombstones"):
+        # Existing rows sort before every later change
+        add_column(conn, table, "sync_version", "BIGINT NOT NULL DEFAULT 0")
+        if conn.dialect.name == "postgresql":
+            # Stamps writes that bypass the model too; on SQLite the model's
+            # client-side default does it (see next_sync_version)
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN sync_version SET DEFAULT txid_current()"))
+
+    # WHERE user_id = ? AND (sync_version, id) > cursor ORDER BY sync_version, id
+    create_index(conn, "ix_scanned_species_user_sync", "scanned_species",
+                 ["user_id", "sync_version", "id"])
+    create_index(conn, "ix_scanned_species_tombstones_user_sync", "scanned_species_tombstones",
+                 ["user_id", "sync_version", "scanned_species_id"])
+    drop_index(conn, "ix_scanned_species_user_updated")
+    drop_index(conn, "ix_scanned_species_tombstones_user_deleted")
@@ -2,21 +2,24 @@
 from .animal_class import AnimalClass
 from .user import User
 from .species import Species
-from .scanned_species import ScannedSpecies
+from .scanned_species import ScannedSpecies, ScannedSpeciesTombstone
 from .reports import Report
 from .friendships import Friendship
 from .vouchers import Voucher
 from .user_vouchers import UserVoucher
-from .points_transactions import PointsTransaction
+from .points_transactions import PointsTransaction, PointsRollup, LeaderboardScore
 
 __all__ = [
     "AnimalClass",
     "User", 
     "Species",
     "ScannedSpecies", 
+    "ScannedSpeciesTombstone",
     "Report",
     "Friendship",
     "Voucher",
     "UserVoucher", 
-    "PointsTransaction"
+    "PointsTransaction",
+    "PointsRollup",
+    "LeaderboardScore"
 ]
\ No newline at end of file
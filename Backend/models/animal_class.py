@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import datetime
 from sqlalchemy import Column, String, Text, DateTime
 from sqlalchemy.sql import func
@@ -36,4 +36,8 @@ class AnimalClassResponse(AnimalClassBase):
     id: str
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class AnimalClassBatchResponse(BaseModel):
+    data: Dict[str, AnimalClassResponse]
+    missing: List[str]
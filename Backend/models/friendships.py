@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -16,9 +16,26 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
+def friendship_pair_key(user_id: str, friend_id: str) -> str:
+    """The same key for both directions of a pair - one friendship row per pair of users"""
+    return ":".join(sorted((user_id, friend_id)))
+
+
+def _default_pair_key(context):
+    parameters = context.get_current_parameters()
+    return friendship_pair_key(parameters["user_id"], parameters["friend_id"])
+
+
 # SQLAlchemy Model
 class Friendship(Base):
     __tablename__ = "friendships"
+    __table_args__ = (
+        # Each side's listing by status, newest first, seeking past a cursor
+        Index("ix_friendships_user_status_created", "user_id", "status", "created_at", "id"),
+        Index("ix_friendships_friend_status_created", "friend_id", "status", "created_at", "id"),
+        # Either direction - lets the bulk endpoints insert with ON CONFLICT DO NOTHING
+        Index("uq_friendships_pair_key", "pair_key", unique=True),
+    )
 
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
@@ -27,6 +44,7 @@ class Friendship(Base):
     status = Column(String, default='pending')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     accepted_at = Column(DateTime(timezone=True))
+    pair_key = Column(String, default=_default_pair_key)
    
     # Relationships
     user = relationship("User", foreign_keys=[user_id], back_populates="friendships_initiated")
@@ -110,4 +128,40 @@ class FriendSummary(BaseModel):
     friend_id: str
     # Optionally include friend user details
     friend: Optional[dict] = None
-    accepted_at: Optional[datetime] = None
\ No newline at end of file
+    accepted_at: Optional[datetime] = None
+
+
+# A suggested friend and why they were suggested
+class FriendSuggestion(BaseModel):
+    user_id: str
+    first_name: str
+    last_name: str
+    points: Optional[int] = None
+    profile_picture: Optional[str] = None
+    mutual_friends: int
+    shared_species: int
+
+
+# Bulk requests: send up to FRIENDSHIP_BULK_MAX requests, or answer up to that many
+class BulkFriendRequestCreate(BaseModel):
+    friend_ids: List[str]
+
+
+class BulkFriendshipUpdate(BaseModel):
+    friendship_ids: List[str]
+    status: FriendshipStatus
+
+
+# One item of a bulk request: result is what happened to it
+# (sent, exists, not_found, self / accepted, rejected, not_found, forbidden, not_pending)
+class BulkFriendshipResult(BaseModel):
+    id: str
+    result: str
+    friendship_id: Optional[str] = None
+    status: Optional[FriendshipStatus] = None
+
+
+class BulkFriendshipResponse(BaseModel):
+    results: List[BulkFriendshipResult]
+    succeeded: int
+    failed: int
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
-from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from typing import List, Optional
+from datetime import date, datetime
+from sqlalchemy import Column, String, Integer, Date, DateTime, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -13,11 +13,18 @@ def generate_uuid():
 # SQLAlchemy Model
 class PointsTransaction(Base):
     __tablename__ = "points_transactions"
+    __table_args__ = (
+        Index("ix_points_transactions_user_created", "user_id", "created_at"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     transaction_type = Column(String, nullable=False)
+    # points is the amount shown in the history (currency for earn/redeem);
+    # the changes below are what the entry did to each balance (see ledger.py)
     points = Column(Integer, nullable=False)
+    points_change = Column(Integer, nullable=False, default=0, server_default="0")
+    currency_change = Column(Integer, nullable=False, default=0, server_default="0")
     description = Column(String, nullable=False)
     reference_id = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -25,6 +32,42 @@ class PointsTransaction(Base):
     # Relationships
     user = relationship("User", back_populates="points_transactions")
 
+class PointsRollup(Base):
+    """
+    Per-user totals of the ledger by period and transaction_type, kept
+    current on every insert (ledger.py) so wallet summaries never scan the
+    user's whole history. period is "day" or "week" (buckets in UTC, weeks
+    starting Monday) or "all" for lifetime totals.
+    """
+    __tablename__ = "points_rollups"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    period = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    transaction_type = Column(String, primary_key=True)
+    transactions = Column(Integer, nullable=False, default=0)
+    points_change = Column(Integer, nullable=False, default=0)
+    currency_change = Column(Integer, nullable=False, default=0)
+
+class LeaderboardScore(Base):
+    """
+    Points each user earned in one leaderboard window - period "week"
+    (starting Monday) or "month", both in UTC - kept current on every ledger
+    insert (ledger.py). A new window is just a new period_start, so rollover
+    never recomputes anything; the index is the windowed leaderboard order,
+    ties going to whoever reached the score first.
+    """
+    __tablename__ = "leaderboard_scores"
+    __table_args__ = (
+        Index("ix_leaderboard_scores_rank", "period", "period_start", text("points DESC"), "reached_at", "user_id"),
+    )
+
+    period = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    points = Column(Integer, nullable=False, default=0)
+    reached_at = Column(DateTime(timezone=True), nullable=False)
+
 # Pydantic Schemas
 class PointsTransactionBase(BaseModel):
     transaction_type: str
@@ -38,6 +81,24 @@ class PointsTransactionCreate(PointsTransactionBase):
 class PointsTransactionResponse(PointsTransactionBase):
     id: str
     user_id: str
+    points_change: int = 0
+    currency_change: int = 0
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class PointsTotals(BaseModel):
+    transactions: int
+    points_change: int
+    currency_change: int
+
+class PointsTypeTotals(PointsTotals):
+    transaction_type: str
+
+class PointsPeriodTotals(PointsTotals):
+    period_start: date
+
+class PointsSummaryResponse(BaseModel):
+    period: str
+    by_type: List[PointsTypeTotals]
+    by_period: List[PointsPeriodTotals]
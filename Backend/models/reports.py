@@ -15,7 +15,7 @@ class Report(Base):
     __tablename__ = "reports"
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     scanned_species_id = Column(String, ForeignKey("scanned_species.id"), nullable=False)
     image_url = Column(String)
     species = Column(String, nullable=False)
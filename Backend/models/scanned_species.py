@@ -1,8 +1,10 @@
 from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index, BigInteger
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from database import Base
 import uuid
@@ -10,9 +12,53 @@ import uuid
 def generate_uuid():
     return str(uuid.uuid4())
 
+class next_sync_version(FunctionElement):
+    """
+    Commit-ordered version stamped on every sighting change and tombstone,
+    the sort key of delta sync.
+
+    PostgreSQL: the writing transaction's id. Ids are handed out in start
+    order, not commit order, so readers only serve versions below
+    sync_horizon() - every transaction below it has finished, and nothing
+    can commit behind a cursor taken from those rows.
+    SQLite: one past the highest version in either table. SQLite runs one
+    writer at a time, so that is already commit order.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(next_sync_version)
+def _next_sync_version(element, compiler, **kw):
+    return (
+        "(SELECT COALESCE(MAX(version), 0) + 1 FROM ("
+        "SELECT MAX(sync_version) AS version FROM scanned_species "
+        "UNION ALL SELECT MAX(sync_version) FROM scanned_species_tombstones))"
+    )
+
+@compiles(next_sync_version, "postgresql")
+def _next_sync_version_postgresql(element, compiler, **kw):
+    return "txid_current()"
+
+class sync_horizon(FunctionElement):
+    """
+    PostgreSQL only: the oldest transaction id still running. Versions below
+    it are final; anything at or above it may still commit.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(sync_horizon, "postgresql")
+def _sync_horizon_postgresql(element, compiler, **kw):
+    return "txid_snapshot_xmin(txid_current_snapshot())"
+
 # SQLAlchemy Model
 class ScannedSpecies(Base):
     __tablename__ = "scanned_species"
+    __table_args__ = (
+        Index("ix_scanned_species_user_species_location", "user_id", "species_id", "location"),
+        Index("ix_scanned_species_user_date", "user_id", "date_spotted", "id"),
+        Index("ix_scanned_species_user_sync", "user_id", "sync_version", "id"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -21,11 +67,30 @@ class ScannedSpecies(Base):
     image_url = Column(String)
     date_spotted = Column(DateTime(timezone=True), server_default=func.now())
     verified = Column(Boolean, default=False)
+    # The client-side default also covers databases where the column was
+    # added by migration without a server default (SQLite)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now(), onupdate=func.now())
+    # Drives delta sync - see next_sync_version
+    sync_version = Column(BigInteger, nullable=False, default=next_sync_version(), onupdate=next_sync_version())
     
     # Relationships
     user = relationship("User", back_populates="scanned_species")
     species = relationship("Species", back_populates="scanned_species")
 
+class ScannedSpeciesTombstone(Base):
+    """
+    Marker left behind by a deleted scan so syncing clients learn about the delete
+    """
+    __tablename__ = "scanned_species_tombstones"
+    __table_args__ = (
+        Index("ix_scanned_species_tombstones_user_sync", "user_id", "sync_version", "scanned_species_id"),
+    )
+
+    scanned_species_id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), default=func.now())
+    sync_version = Column(BigInteger, nullable=False, default=next_sync_version())
+
 # Pydantic Schemas
 class ScannedSpeciesBase(BaseModel):
     location: str
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from sqlalchemy import Column, String, Text, ForeignKey, JSON, DateTime
+from sqlalchemy import Column, String, Text, ForeignKey, JSON, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -10,14 +10,27 @@ import uuid
 def generate_uuid():
     return str(uuid.uuid4())
 
+def species_key(scientific_name: Optional[str]) -> str:
+    """Identity of a species: its scientific name case, accent and spacing folded"""
+    from search import normalize
+    return normalize(scientific_name)
+
+def _default_species_key(context):
+    return species_key(context.get_current_parameters().get("scientific_name"))
+
 # SQLAlchemy Model
 class Species(Base):
     __tablename__ = "species"
+    __table_args__ = (
+        # Lets get_or_create_species insert with ON CONFLICT DO NOTHING
+        Index("uq_species_species_key", "species_key", unique=True),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
-    animal_class_id = Column(String, ForeignKey("animal_class.id"), nullable=False)
+    animal_class_id = Column(String, ForeignKey("animal_class.id"), nullable=False, index=True)
     common_name = Column(Text, nullable=False)
     scientific_name = Column(Text, unique=True, nullable=False)
+    species_key = Column(Text, default=_default_species_key)
     description = Column(Text)
     habitat = Column(Text)
     threats = Column(Text)
@@ -48,4 +61,8 @@ class SpeciesResponse(SpeciesBase):
     animal_class_id: str
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class SpeciesBatchResponse(BaseModel):
+    data: Dict[str, SpeciesResponse]
+    missing: List[str]
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import datetime, date
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Date
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Date, Index, text
 from sqlalchemy.sql import func
 from database import Base
 import uuid
@@ -12,6 +12,10 @@ def generate_uuid():
 # SQLAlchemy Model
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Leaderboard order - top pages and COUNT(*)-based ranks (leaderboard.py)
+        Index("ix_users_points_created", text("points DESC"), "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -26,6 +30,8 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
     profile_picture = Column(String, nullable=True)
+    # Incoming friend requests still pending - kept current by friend_graph.py
+    pending_friend_requests = Column(Integer, nullable=False, default=0, server_default="0")
 
 # Pydantic Schemas
 class UserCreate(BaseModel):
@@ -69,6 +75,10 @@ class UserResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class UserBatchResponse(BaseModel):
+    data: Dict[str, UserResponse]
+    missing: List[str]
+
 class LoginResponse(BaseModel):
     access_token: str
     token_type: str
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime, date
-from sqlalchemy import Column, String, Boolean, DateTime, Date, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, Date, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -13,6 +13,9 @@ def generate_uuid():
 # SQLAlchemy Model
 class UserVoucher(Base):
     __tablename__ = "user_vouchers"
+    __table_args__ = (
+        Index("ix_user_vouchers_user_used_expires", "user_id", "is_used", "expires_at"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,80 @@
+# =============================================================================
+# FILE: pagination.py
+# DESCRIPTION: Opaque cursors for keyset (seek) pagination
+# =============================================================================
+#
+# A cursor carries the sort key of the last row of a page. The next page is
+# "rows after this key" - an index seek, so page N costs the same as page 1
+# no matter how deep the client has scrolled.
+
+import json
+import base64
+from datetime import datetime
+from typing import Any, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import func, tuple_
+
+MAX_PAGE_SIZE = 200
+# Page size for list endpoints when the client does not pass limit
+DEFAULT_PAGE_SIZE = 50
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque, URL-safe cursor for a sort key (datetimes are stored as ISO strings)"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Sort key from a cursor made by encode_cursor - 400 when it is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("unexpected cursor shape")
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def cursor_datetime(value: str) -> datetime:
+    """Datetime component of a decoded cursor - 400 when it is not a valid timestamp"""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def seek_condition(dialect_name: str, timestamp_column, id_column, cursor_values: List[Any],
+                   descending: bool = True):
+    """
+    WHERE clause for rows after a (timestamp, id) cursor in the given sort direction.
+    SQLite keeps timestamps as text in mixed formats (CURRENT_TIMESTAMP has no
+    microseconds), so there both sides are compared as julianday() numbers.
+    """
+    timestamp = cursor_datetime(cursor_values[0])
+    row_id = cursor_values[1]
+
+    row_key = tuple_(comparable_timestamp(dialect_name, timestamp_column), id_column)
+    cursor_key = tuple_(comparable_timestamp(dialect_name, timestamp), row_id)
+
+    return row_key < cursor_key if descending else row_key > cursor_key
+
+def comparable_timestamp(dialect_name: str, value):
+    """A timestamp column or value in a form that compares correctly on this dialect"""
+    return func.julianday(value) if dialect_name == "sqlite" else value
+
+def page_size(limit: Optional[int]) -> Optional[int]:
+    """Clamp a client-supplied page size; None means unpaginated"""
+    if limit is None:
+        return None
+    if limit < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be a positive integer"
+        )
+    return min(limit, MAX_PAGE_SIZE)
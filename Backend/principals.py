@@ -0,0 +1,147 @@
+# =============================================================================
+# FILE: principals.py
+# DESCRIPTION: Short-lived in-process cache of authenticated principals
+# =============================================================================
+#
+# get_current_user used to load the whole users row on every authenticated
+# request, although most handlers only need the caller's id. It now returns
+# a Principal - id, active flag and the name/email shown on screens - from
+# this cache, so a hot user's request authenticates with a dict lookup.
+# Handlers that read or change the balance depend on get_current_user_record
+# instead, which still loads the row.
+#
+# A committed ORM change to a user's email, name or active flag, or deleting
+# the user, drops the cached principal. Core writes to those columns call
+# invalidate_principals(). Other instances pick changes up within
+# PRINCIPAL_CACHE_TTL seconds, which bounds how long a deactivated account
+# can keep using a cached principal elsewhere.
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.user import User
+
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# Changing any of these on a user makes the cached principal stale
+PRINCIPAL_FIELDS = ("email", "first_name", "last_name", "is_active")
+
+class Principal:
+    """The authenticated caller: who they are, not their balances"""
+    __slots__ = ("id",) + PRINCIPAL_FIELDS
+
+    def __init__(self, id: str, email: str, first_name: str, last_name: str, is_active: Optional[bool]):
+        self.id = id
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.email, user.first_name, user.last_name, user.is_active)
+
+class PrincipalCache:
+    """LRU of user id -> Principal, each entry expiring after PRINCIPAL_CACHE_TTL"""
+
+    def __init__(self, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a load that overlapped one is not stored
+        self.generation = 0
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, user_id: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            stored_at, principal = entry
+            if time.time() - stored_at >= PRINCIPAL_CACHE_TTL:
+                del self._entries[user_id]
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._counters["hits"] += 1
+            return principal
+
+    def put(self, principal: Principal, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[principal.id] = (time.time(), principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, user_ids: Iterable[str]) -> None:
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else None,
+                "ttl_seconds": PRINCIPAL_CACHE_TTL,
+            }
+
+principal_cache = PrincipalCache()
+
+def remember_principal(user: Optional[User], generation: int) -> Optional[Principal]:
+    """Cache the principal of a freshly loaded user row (generation read before the load)"""
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.put(principal, generation)
+    return principal
+
+# =============================================================================
+# INVALIDATION
+# =============================================================================
+
+def invalidate_principals(user_ids: Iterable[str]) -> None:
+    """Drop cached principals now - for Core writes to users' email, name or active flag"""
+    principal_cache.invalidate(user_ids)
+
+@event.listens_for(Session, "after_flush")
+def _note_principal_writes(session, flush_context):
+    changed = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    changed.update(
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and any(inspect(obj).attrs[field].history.has_changes() for field in PRINCIPAL_FIELDS)
+    )
+    if changed:
+        session.info.setdefault("principals_changed", set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # Only committed writes count
+    changed = session.info.pop("principals_changed", None)
+    if changed:
+        principal_cache.invalidate(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("principals_changed", None)
@@ -0,0 +1,163 @@
+# =============================================================================
+# FILE: query_metrics.py
+# DESCRIPTION: Per-request SQL query counting, DB time and N+1 detection
+# =============================================================================
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# "development" adds the per-request numbers as response headers;
+# anything else only aggregates them for the admin metrics endpoint
+ENVIRONMENT = os.environ.get("ENVIRONMENT", "production")
+# Same statement executed this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5"))
+
+class QueryStats:
+    """
+    Queries executed within one request (or one query_budget block)
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    @property
+    def repeated_statements(self) -> Dict[str, int]:
+        """Statements executed more than once - the N+1 suspects"""
+        return {statement: n for statement, n in self.statements.items() if n > 1}
+
+    @property
+    def has_n_plus_one(self) -> bool:
+        return any(n >= N_PLUS_ONE_THRESHOLD for n in self.statements.values())
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+_budget_stats: List[QueryStats] = []
+
+# Aggregated per-route numbers (route path template -> counters)
+_route_metrics: Dict[str, Dict[str, Any]] = {}
+_route_metrics_lock = threading.Lock()
+
+# =============================================================================
+# SQLALCHEMY INSTRUMENTATION
+# =============================================================================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    for budget in _budget_stats:
+        budget.record(statement, elapsed)
+
+# =============================================================================
+# REQUEST TRACKING
+# =============================================================================
+
+def start_request_tracking():
+    """Begin counting queries for the current request, returns a reset token"""
+    return _current_stats.set(QueryStats())
+
+def finish_request_tracking(token, route: str) -> QueryStats:
+    """Stop counting for the current request and fold the numbers into the route metrics"""
+    stats = _current_stats.get()
+    _current_stats.reset(token)
+
+    if stats.has_n_plus_one:
+        worst = max(stats.statements.items(), key=lambda item: item[1])
+        logger.warning(
+            f"⚠️ Possible N+1 on {route}: statement executed {worst[1]} times "
+            f"({stats.count} queries, {stats.duration_ms:.1f}ms) - {worst[0][:200]}"
+        )
+
+    with _route_metrics_lock:
+        metrics = _route_metrics.setdefault(route, {
+            "requests": 0,
+            "queries": 0,
+            "db_time_ms": 0.0,
+            "max_queries": 0,
+            "n_plus_one_requests": 0
+        })
+        metrics["requests"] += 1
+        metrics["queries"] += stats.count
+        metrics["db_time_ms"] += stats.duration_ms
+        metrics["max_queries"] = max(metrics["max_queries"], stats.count)
+        if stats.has_n_plus_one:
+            metrics["n_plus_one_requests"] += 1
+
+    return stats
+
+def response_headers(stats: QueryStats) -> Dict[str, str]:
+    """Development-only response headers describing the request's DB usage"""
+    return {
+        "X-DB-Query-Count": str(stats.count),
+        "X-DB-Time-Ms": f"{stats.duration_ms:.2f}",
+        "X-DB-Repeated-Statements": str(len(stats.repeated_statements))
+    }
+
+def get_route_metrics() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of the aggregated per-route query metrics"""
+    with _route_metrics_lock:
+        snapshot = {}
+        for route, metrics in _route_metrics.items():
+            snapshot[route] = {
+                **metrics,
+                "avg_queries": metrics["queries"] / metrics["requests"],
+                "avg_db_time_ms": metrics["db_time_ms"] / metrics["requests"]
+            }
+        return snapshot
+
+# =============================================================================
+# TEST HELPER
+# =============================================================================
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    Fail when the wrapped block runs more than max_queries statements.
+    Counts on every engine regardless of thread, so it also works around
+    TestClient calls:
+
+        with query_budget(3):
+            client.get("/scanned-species/", headers=auth_headers)
+    """
+    stats = QueryStats()
+    _budget_stats.append(stats)
+    try:
+        yield stats
+    finally:
+        _budget_stats.remove(stats)
+
+    if stats.count > max_queries:
+        statements = "\n".join(
+            f"  {n}x {statement[:200]}" for statement, n in stats.statements.most_common()
+        )
+        raise AssertionError(
+            f"Query budget exceeded: {stats.count} queries (budget {max_queries})\n{statements}"
+        )
@@ -12,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from sqlalchemy.orm import Session
 from database import engine, Base, SessionLocal
 from relationships import setup_relationships
+from migrations import run_migrations, drop_migration_history
 
 # Import all models
 from models.user import User
@@ -212,10 +213,11 @@ def reset_database() -> None:
     # Drop all tables and recreate them
     print("\n🗑️ DROPPING EXISTING TABLES...")
     Base.metadata.drop_all(bind=engine)
+    drop_migration_history(engine)
     print("✅ Tables dropped successfully")
     
     print("\n🏗️ CREATING NEW TABLES...")
-    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     print("✅ Tables created successfully")
     
     print("\n🔗 SETTING UP RELATIONSHIPS...")
@@ -0,0 +1,55 @@
+# =============================================================================
+# FILE: responses.py
+# DESCRIPTION: Fast JSON responses for hot endpoints
+# =============================================================================
+#
+# FastAPI already serializes straight to JSON bytes when a route declares a
+# response_model and returns something that must be validated against it. Two
+# cases are still slow, and this module covers them:
+#   - plain dicts of primitives (scan history, sync): FastJSONResponse renders
+#     them with orjson, skipping a validation pass over Dict[str, Any]
+#   - ORM rows for a pydantic list (catalog): a TypeAdapter built once at
+#     import validates and dumps the whole list in pydantic-core
+# Returning either Response bypasses FastAPI's own serialization, so routes
+# keep their response_model for the OpenAPI docs only.
+
+import json
+from typing import Any
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _fallback_default(value: Any) -> Any:
+    """Anything orjson can't encode natively (pydantic models, Decimal, ...)"""
+    return jsonable_encoder(value)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return json.dumps(
+                jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+        return orjson.dumps(content, default=_fallback_default, option=orjson.OPT_NON_STR_KEYS)
+
+def adapter_json(adapter: TypeAdapter, value: Any, **dump_options) -> bytes:
+    """
+    JSON bytes for value (ORM objects or rows are read by attribute), validated
+    with a precompiled TypeAdapter. dump_options go to adapter.dump_json,
+    e.g. exclude={"__all__": {"api_response"}} for a list.
+    """
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True), **dump_options)
+
+def adapter_response(adapter: TypeAdapter, value: Any, status_code: int = 200, **dump_options) -> Response:
+    """adapter_json sent as an application/json response"""
+    return Response(
+        content=adapter_json(adapter, value, **dump_options),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -1,5 +1,5 @@
 # routes/__init__.py
-from . import auth, users, species, friendships, reports, scanned_species, vouchers, points, badges, quiz
+from . import auth, users, species, friendships, reports, scanned_species, vouchers, points, badges, quiz, admin, me
 
 __all__ = [
     "auth",
@@ -11,5 +11,7 @@ __all__ = [
     "vouchers",
     "points",
     "badges",
-    "quiz"
+    "quiz",
+    "admin",
+    "me"
 ]
\ No newline at end of file
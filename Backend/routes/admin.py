@@ -0,0 +1,111 @@
+# routes/admin.py
+from fastapi import APIRouter, Depends, HTTPException, Header, status
+from typing import Optional
+import os
+from datetime import datetime
+from sqlalchemy.orm import Session
+from database import get_db
+from ledger import reconcile_balances
+from query_metrics import get_route_metrics
+from slow_query_log import get_slow_queries, clear_slow_queries, SLOW_QUERY_MS
+from principals import principal_cache, invalidate_principals
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Guard for operational endpoints - requires the X-Admin-Token header
+    to match ADMIN_API_TOKEN. Disabled entirely when no token is configured.
+    """
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Admin endpoints are not enabled"
+        )
+
+    if x_admin_token != ADMIN_API_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+
+@router.get("/db-metrics", dependencies=[Depends(require_admin)])
+async def get_db_metrics():
+    """
+    Per-route SQL query counts and DB time aggregated since process start
+    Routes with the highest average query count are listed first
+    """
+    metrics = get_route_metrics()
+    routes = sorted(metrics.items(), key=lambda item: item[1]["avg_queries"], reverse=True)
+
+    return {
+        "routes": [{"route": route, **data} for route, data in routes],
+        "retrieved_at": datetime.now().isoformat()
+    }
+
+@router.get("/slow-queries", dependencies=[Depends(require_admin)])
+async def list_slow_queries(limit: Optional[int] = 50):
+    """
+    Most recent statements slower than SLOW_QUERY_MS, with their
+    EXPLAIN (ANALYZE, BUFFERS) plan when one was captured
+    """
+    entries = get_slow_queries(limit)
+    return {
+        "threshold_ms": SLOW_QUERY_MS,
+        "count": len(entries),
+        "slow_queries": entries,
+        "retrieved_at": datetime.now().isoformat()
+    }
+
+@router.delete("/slow-queries", dependencies=[Depends(require_admin)])
+async def reset_slow_queries():
+    """Empty the slow-query buffer"""
+    clear_slow_queries()
+    return {"message": "Slow query log cleared"}
+
+@router.get("/ledger/reconcile", dependencies=[Depends(require_admin)])
+async def reconcile_ledger(db: Session = Depends(get_db)):
+    """
+    Users whose points/currency differ from their points_transactions ledger
+    Read-only - POST to the same path books the differences
+    """
+    drift = reconcile_balances(db)
+    return {
+        "drifted_users": len(drift),
+        "repaired": False,
+        "drift": drift,
+        "checked_at": datetime.now().isoformat()
+    }
+
+@router.post("/ledger/reconcile", dependencies=[Depends(require_admin)])
+async def repair_ledger(db: Session = Depends(get_db)):
+    """
+    Book each user's points/currency difference from the ledger as a
+    reconciliation entry, and report what was repaired
+    """
+    drift = reconcile_balances(db, repair=True)
+    return {
+        "drifted_users": len(drift),
+        "repaired": bool(drift),
+        "drift": drift,
+        "checked_at": datetime.now().isoformat()
+    }
+
+@router.get("/auth-cache", dependencies=[Depends(require_admin)])
+async def get_auth_cache_stats():
+    """Principal cache hits, misses and size since process start"""
+    return {**principal_cache.stats(), "retrieved_at": datetime.now().isoformat()}
+
+@router.delete("/auth-cache", dependencies=[Depends(require_admin)])
+async def reset_auth_cache(user_id: Optional[str] = None):
+    """
+    Drop one user's cached principal, or all of them - after deactivating
+    accounts outside the API
+    """
+    if user_id:
+        invalidate_principals([user_id])
+    else:
+        principal_cache.clear()
+    return {"message": "Principal cache cleared", "user_id": user_id}
@@ -3,10 +3,14 @@ from typing import Optional
 import json
 import base64
 import logging
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 from models.user import User
 from models.user import UserCreate, UserResponse, UserLogin, LoginResponse
+from principals import Principal, principal_cache, remember_principal
 from passlib.context import CryptContext
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -25,6 +29,14 @@ def find_user_by_email(db: Session, email: str):
 def find_user_by_id(db: Session, user_id: str):
     return db.query(User).filter(User.id == user_id).first()
 
+async def find_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def find_user_by_id_async(db: AsyncSession, user_id: str):
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalars().first()
+
 def create_token(user_id: str) -> str:
     """Create a proper token with user ID"""
     token_data = {"user_id": user_id, "type": "access"}
@@ -45,12 +57,12 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Registration attempt for email: {user_data.email}")
     
     try:
         # Check if user already exists
-        existing_user = find_user_by_email(db, user_data.email)
+        existing_user = await find_user_by_email_async(db, user_data.email)
         if existing_user:
             logger.warning(f"Email already registered: {user_data.email}")
             raise HTTPException(
@@ -60,8 +72,8 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         
         logger.info("Email is available, creating user...")
         
-        # Hash password
-        hashed_password = hash_password(user_data.password)
+        # Hash password (CPU-bound, keep it off the event loop)
+        hashed_password = await run_in_threadpool(hash_password, user_data.password)
         
         # Create new user
         new_user = User(
@@ -78,8 +90,8 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         
         # Save to database
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         logger.info(f"User created successfully with ID: {new_user.id}")
         
@@ -101,17 +113,17 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         raise
     except Exception as e:
         logger.error(f"Error during registration: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
         )
 
 @router.post("/login", response_model=LoginResponse)
-async def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
-    user = find_user_by_email(db, login_data.email)
+async def login_user(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await find_user_by_email_async(db, login_data.email)
     
-    if not user or not verify_password(login_data.password, user.password):
+    if not user or not await run_in_threadpool(verify_password, login_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -140,12 +152,8 @@ async def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
         user=user_response
     )
 
-async def get_current_user(
-    authorization: Optional[str] = Header(None),
-    token: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
-) -> User:
-    # Try to get token from Authorization header first
+def extract_auth_token(authorization: Optional[str], token: Optional[str]) -> Optional[str]:
+    """Pick the token from the Authorization header, falling back to the query parameter"""
     auth_token = None
     if authorization:
         if authorization.startswith("Bearer "):
@@ -157,47 +165,125 @@ async def get_current_user(
     if not auth_token and token:
         auth_token = token
     
+    return auth_token
+
+def get_user_id_from_token(auth_token: Optional[str]) -> str:
+    """Validate the token and return the user ID it was issued for"""
     if not auth_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication token required"
         )
     
-    try:
-        # Decode token to get user ID
-        token_data = decode_token(auth_token)
-        if not token_data or "user_id" not in token_data:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token format"
-            )
-        
-        user_id = token_data["user_id"]
-        user = find_user_by_id(db, user_id)
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
-        
-        if not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User account is inactive"
-            )
-        
-        logger.info(f"Authenticated user: {user.email} (ID: {user.id})")
-        return user
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Token validation error: {str(e)}")
+    # Decode token to get user ID
+    token_data = decode_token(auth_token)
+    if not token_data or "user_id" not in token_data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token format"
+        )
+    
+    return token_data["user_id"]
+
+def ensure_active_user(user):
+    """Reject missing or deactivated accounts (a User row or a cached Principal)"""
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token"
+            detail="User account is inactive"
         )
+    
+    return user
+
+def lookup_failed(e: Exception) -> HTTPException:
+    logger.error(f"Token validation error: {str(e)}")
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication token"
+    )
+
+async def get_current_user(
+    authorization: Optional[str] = Header(None),
+    token: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    The caller as a Principal - served from the principal cache, so hot
+    users authenticate without touching the database. Handlers that need
+    the user's balances depend on get_current_user_record instead.
+    """
+    user_id = get_user_id_from_token(extract_auth_token(authorization, token))
+    
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        generation = principal_cache.generation
+        try:
+            principal = remember_principal(find_user_by_id(db, user_id), generation)
+        except Exception as e:
+            raise lookup_failed(e)
+    
+    return ensure_active_user(principal)
+
+async def get_current_user_async(
+    authorization: Optional[str] = Header(None),
+    token: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """
+    Same as get_current_user, but a cache miss loads the user through the
+    async session so async route handlers never block the event loop
+    """
+    user_id = get_user_id_from_token(extract_auth_token(authorization, token))
+    
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        generation = principal_cache.generation
+        try:
+            principal = remember_principal(await find_user_by_id_async(db, user_id), generation)
+        except Exception as e:
+            raise lookup_failed(e)
+    
+    return ensure_active_user(principal)
+
+async def get_current_user_record(
+    authorization: Optional[str] = Header(None),
+    token: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+) -> User:
+    """The caller's full users row, loaded in the request's session - for balance reads and changes"""
+    user_id = get_user_id_from_token(extract_auth_token(authorization, token))
+    
+    generation = principal_cache.generation
+    try:
+        user = find_user_by_id(db, user_id)
+    except Exception as e:
+        raise lookup_failed(e)
+    remember_principal(user, generation)
+    
+    return ensure_active_user(user)
+
+async def get_current_user_record_async(
+    authorization: Optional[str] = Header(None),
+    token: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Same as get_current_user_record, through the async session"""
+    user_id = get_user_id_from_token(extract_auth_token(authorization, token))
+    
+    generation = principal_cache.generation
+    try:
+        user = await find_user_by_id_async(db, user_id)
+    except Exception as e:
+        raise lookup_failed(e)
+    remember_principal(user, generation)
+    
+    return ensure_active_user(user)
 
 @router.post("/logout")
 async def logout_user(
@@ -210,17 +296,7 @@ async def logout_user(
     Since we're using stateless tokens, the actual invalidation happens on the client.
     """
     
-    # Try to get token from Authorization header first
-    auth_token = None
-    if authorization:
-        if authorization.startswith("Bearer "):
-            auth_token = authorization.replace("Bearer ", "")
-        else:
-            auth_token = authorization
-    
-    # If no Authorization header, try query parameter
-    if not auth_token and token:
-        auth_token = token
+    auth_token = extract_auth_token(authorization, token)
     
     if not auth_token:
         # Even without a token, we can consider it a successful logout
@@ -254,7 +330,7 @@ async def logout_user(
 
 
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user_record_async)):
     return {
         "user_id": current_user.id,
         "email": current_user.email,
@@ -266,7 +342,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # In your auth.py router, add:
 @router.get("/debug-token")
-async def debug_token(current_user: User = Depends(get_current_user)):
+async def debug_token(current_user: Principal = Depends(get_current_user_async)):
     """Debug endpoint to check token validity"""
     return {
         "status": "success", 
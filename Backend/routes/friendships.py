@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, update, union_all
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import datetime
 
 
 from database import get_db
-from models.friendships import Friendship
+from models.friendships import Friendship, friendship_pair_key, generate_uuid
 from models.user import User
+from routes.auth import get_current_user
+from principals import Principal
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor, seek_condition, page_size
+from suggestions import suggest_friends, record_social_changes
+from friend_graph import adjust_pending_counts, mark_friends_changed
+from batch import batch_ids
 # Adjust these imports to point to the actual location of your Pydantic schemas
 from models.friendships import (
     FriendshipCreate as FriendshipCreateSchema,
@@ -14,6 +21,10 @@ from models.friendships import (
     FriendshipListResponse as FriendshipListResponseSchema,
     FriendshipUpdate as FriendshipUpdateSchema,
     FriendSummary as FriendSummarySchema,
+    FriendSuggestion as FriendSuggestionSchema,
+    BulkFriendRequestCreate as BulkFriendRequestCreateSchema,
+    BulkFriendshipUpdate as BulkFriendshipUpdateSchema,
+    BulkFriendshipResponse as BulkFriendshipResponseSchema,
 )
 from models.user import UserResponse as UserResponseSchema
 
@@ -46,7 +57,7 @@ def friendship_to_response(f: Friendship, include_users: bool = False) -> dict:
 
 
     if include_users:
-        # Lazy access to related objects (requires they are available/queried)
+        # Load user and friend with joinedload - otherwise each one is a query per row
         data["user"] = (
             {
                 "id": f.user.id,
@@ -94,15 +105,21 @@ def friendship_to_response(f: Friendship, include_users: bool = False) -> dict:
 @router.get("/requests/{user_id}", response_model=FriendshipListResponseSchema)
 def view_friendship_requests(
     user_id: str,
+    response: Response,
     direction: Optional[str] = "incoming",  # "incoming" or "outgoing"
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
    
 ):
     """
-    View friendship requests for the current user.
+    View friendship requests for the current user, newest first.
     direction:
       - incoming: requests where friend_id == current_user.id and status == "pending"
       - outgoing: requests where user_id == current_user.id and status == "pending"
+    One page of limit requests (DEFAULT_PAGE_SIZE by default, at most
+    MAX_PAGE_SIZE): the X-Next-Cursor response header is sent back as cursor
+    for the following page, and total still counts every request.
     """
     if direction not in ("incoming", "outgoing"):
         raise HTTPException(
@@ -111,75 +128,133 @@ def view_friendship_requests(
         )
 
 
-    if direction == "incoming":
-        query = db.query(Friendship).filter(
-            Friendship.friend_id == user_id, Friendship.status == "pending"
-        )
-    else:
-        query = db.query(Friendship).filter(
-            Friendship.user_id == user_id, Friendship.status == "pending"
-        )
+    page_limit = page_size(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
 
+    # Both users' summaries come from the same query
+    side = Friendship.friend_id if direction == "incoming" else Friendship.user_id
+    query = (
+        db.query(Friendship)
+        .options(joinedload(Friendship.user), joinedload(Friendship.friend))
+        .filter(side == user_id, Friendship.status == "pending")
+    )
+    if after:
+        # Seek past the last row of the previous page (ix_friendships_*_status_created)
+        query = query.filter(seek_condition(db.bind.dialect.name, Friendship.created_at, Friendship.id, after))
+    query = query.order_by(Friendship.created_at.desc(), Friendship.id.desc())
+    friendships = query.limit(page_limit + 1).all()
+
+    if len(friendships) > page_limit:
+        friendships = friendships[:page_limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(friendships[-1].created_at, friendships[-1].id)
+    if not after and len(friendships) < page_limit:
+        # The whole list fit on the first page
+        total = len(friendships)
+    elif direction == "incoming":
+        total = pending_request_count(db, user_id)
+    else:
+        total = db.query(Friendship).filter(side == user_id, Friendship.status == "pending").count()
 
-    friendships = query.all()
     items = [friendship_to_response(f, include_users=True) for f in friendships]
-    return {"friendships": items, "total": len(items)}
+    return {"friendships": items, "total": total}
 
 
 
 
-@router.get("/friends/{user_id}", response_model=List[FriendSummarySchema])
-def view_friends(user_id: str, db: Session = Depends(get_db),):
-    """
-    Return all accepted friendships for the current user as a list of FriendSummary.
-    This returns the other user's id (friend_id or user_id depending on the stored row).
-    """
-    # Case A: current_user as requester
-    q1 = db.query(Friendship).filter(
-        Friendship.user_id == user_id, Friendship.status == "accepted"
-    )
+def pending_request_count(db: Session, user_id: str) -> int:
+    """Incoming pending requests, from the counter kept on the user row (friend_graph.py)"""
+    return db.scalar(select(User.pending_friend_requests).where(User.id == user_id)) or 0
 
 
-    # Case B: current_user as recipient
-    q2 = db.query(Friendship).filter(
-        Friendship.friend_id == user_id, Friendship.status == "accepted"
-    )
 
 
-    results = q1.union_all(q2).all()
+@router.get("/pending-count")
+def get_pending_request_count(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Number of incoming friend requests awaiting the current user's answer - one primary-key read"""
+    return {"user_id": current_user.id, "pending": pending_request_count(db, current_user.id)}
 
 
-    friends_list = []
-    for f in results:
-        # determine the id of the other user
-        other_id = f.friend_id if f.user_id == user_id else f.user_id
 
 
-        # If relationship objects are loaded, include minimal user info
-        friend_obj = None
-        if getattr(f, "friend", None) is not None and f.friend.id == other_id:
-            friend_obj = {
-                "id": f.friend.id,
-                "email": f.friend.email,
-                "first_name": f.friend.first_name,
-                "last_name": f.friend.last_name,
-                "points": f.friend.points,
-               
-            }
-        elif getattr(f, "user", None) is not None and f.user.id == other_id:
-            friend_obj = {
-                "id": f.user.id,
-                "email": f.user.email,
-                "first_name": f.user.first_name,
-                "last_name": f.user.last_name,
-                "points": f.user.points,
-            }
+def _friends_side(user_id: str, mine, theirs, after, dialect_name: str):
+    """Accepted friendships where the user is the mine column, joined to the user in theirs"""
+    query = (
+        select(
+            Friendship.id.label("friendship_id"), Friendship.created_at, Friendship.accepted_at,
+            User.id, User.email, User.first_name, User.last_name, User.points
+        )
+        .join(User, User.id == theirs)
+        .where(mine == user_id, Friendship.status == "accepted")
+    )
+    if after:
+        query = query.where(seek_condition(dialect_name, Friendship.created_at, Friendship.id, after))
+    return query
 
 
-        friends_list.append({"friend_id": other_id, "friend": friend_obj, "accepted_at": f.accepted_at})
 
 
-    return friends_list
+@router.get("/friends/{user_id}", response_model=List[FriendSummarySchema])
+def view_friends(
+    user_id: str,
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Return accepted friendships for the current user as a list of FriendSummary,
+    newest friendship first.
+    This returns the other user's id (friend_id or user_id depending on the stored row).
+    One page of limit friends (DEFAULT_PAGE_SIZE by default, at most
+    MAX_PAGE_SIZE): the X-Next-Cursor response header is sent back as cursor
+    for the following page.
+    """
+    page_limit = page_size(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
+    dialect_name = db.bind.dialect.name
+
+    # One query: each side of the row is a range of its (side, status, created_at, id)
+    # index, joined to the other user by primary key
+    friends = union_all(
+        _friends_side(user_id, Friendship.user_id, Friendship.friend_id, after, dialect_name),
+        _friends_side(user_id, Friendship.friend_id, Friendship.user_id, after, dialect_name)
+    ).subquery()
+    query = select(friends).order_by(friends.c.created_at.desc(), friends.c.friendship_id.desc())
+    rows = db.execute(query.limit(page_limit + 1)).all()
+
+    if len(rows) > page_limit:
+        rows = rows[:page_limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].friendship_id)
+
+    return [
+        {
+            "friend_id": row.id,
+            "friend": {
+                "id": row.id,
+                "email": row.email,
+                "first_name": row.first_name,
+                "last_name": row.last_name,
+                "points": row.points,
+            },
+            "accepted_at": row.accepted_at,
+        }
+        for row in rows
+    ]
+
+
+
+
+@router.get("/suggestions/{user_id}", response_model=List[FriendSuggestionSchema])
+def view_friend_suggestions(user_id: str, limit: int = 20, db: Session = Depends(get_db)):
+    """
+    People the user may know, best first: ranked by mutual accepted friends,
+    then by species both have scanned. Users they already have a friendship
+    record with (in any status) are left out. limit is capped at 50.
+    """
+    return suggest_friends(db, user_id, limit)
 
 
 
@@ -212,10 +287,7 @@ def send_friend_request(
     # Check existing relationship in either direction
     existing = (
         db.query(Friendship)
-        .filter(
-            ((Friendship.user_id == user_id) & (Friendship.friend_id == payload.friend_id))
-            | ((Friendship.user_id == payload.friend_id) & (Friendship.friend_id == user_id))
-        )
+        .filter(Friendship.pair_key == friendship_pair_key(user_id, payload.friend_id))
         .first()
     )
 
@@ -298,3 +370,153 @@ def update_friendship_status(
 
 
     return friendship_to_response(f, include_users=True)
+
+
+
+
+# ---------------------------
+# Bulk endpoints
+# ---------------------------
+def _insert_for(db: Session):
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _bulk_response(results: List[dict], succeeded: int) -> dict:
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+
+@router.post("/bulk", response_model=BulkFriendshipResponseSchema)
+def send_friend_requests_bulk(
+    payload: BulkFriendRequestCreateSchema,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Send friendship requests from the current user to up to 100 users in one call
+    (e.g. a contacts import).
+    All requests are inserted with one INSERT ... ON CONFLICT (pair_key) DO NOTHING;
+    each id gets its own result: sent, exists (a friendship in either direction
+    already exists - its id and status are returned), not_found or self.
+    """
+    user_id = current_user.id
+    requested = batch_ids(payload.friend_ids)
+    targets = [friend_id for friend_id in requested if friend_id != user_id]
+    known = set(db.scalars(select(User.id).where(User.id.in_(targets)))) if targets else set()
+    new_ids = [friend_id for friend_id in targets if friend_id in known]
+
+    sent = {}
+    if new_ids:
+        now = datetime.utcnow()
+        statement = _insert_for(db)(Friendship).values([
+            {
+                "id": generate_uuid(),
+                "user_id": user_id,
+                "friend_id": friend_id,
+                "status": "pending",
+                "created_at": now,
+                "pair_key": friendship_pair_key(user_id, friend_id),
+            }
+            for friend_id in new_ids
+        ])
+        sent = dict(db.execute(
+            statement.on_conflict_do_nothing(index_elements=["pair_key"])
+            .returning(Friendship.friend_id, Friendship.id)
+        ).all())
+
+    # Rows that already existed, in either direction
+    conflicted = {friendship_pair_key(user_id, friend_id): friend_id for friend_id in new_ids if friend_id not in sent}
+    existing = {}
+    if conflicted:
+        rows = db.execute(
+            select(Friendship.pair_key, Friendship.id, Friendship.status)
+            .where(Friendship.pair_key.in_(conflicted))
+        )
+        existing = {conflicted[row.pair_key]: row for row in rows}
+
+    # A Core insert skips the flush hooks, so the recipients' counters are adjusted here
+    adjust_pending_counts(db.connection(), {friend_id: 1 for friend_id in sent})
+    record_social_changes(db, [("link", user_id, friend_id, "pending") for friend_id in sent])
+    db.commit()
+
+    results = []
+    for friend_id in requested:
+        if friend_id == user_id:
+            results.append({"id": friend_id, "result": "self"})
+        elif friend_id not in known:
+            results.append({"id": friend_id, "result": "not_found"})
+        elif friend_id in sent:
+            results.append({"id": friend_id, "result": "sent", "friendship_id": sent[friend_id], "status": "pending"})
+        else:
+            row = existing.get(friend_id)
+            results.append({
+                "id": friend_id,
+                "result": "exists",
+                "friendship_id": row.id if row else None,
+                "status": row.status if row else None,
+            })
+    return _bulk_response(results, len(sent))
+
+
+@router.patch("/bulk-update", response_model=BulkFriendshipResponseSchema)
+def update_friendship_status_bulk(
+    payload: BulkFriendshipUpdateSchema,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Accept or reject up to 100 of the current user's incoming requests in one call with one UPDATE.
+    The same rules as /update apply to every id; each gets its own result:
+    the new status, not_found, forbidden (not the recipient) or not_pending.
+    """
+    user_id = current_user.id
+    requested = batch_ids(payload.friendship_ids)
+    new_status = payload.status.value if hasattr(payload.status, "value") else payload.status
+    if new_status not in ("accepted", "rejected"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="status must be 'accepted' or 'rejected'.",
+        )
+
+    values = {"status": new_status}
+    if new_status == "accepted":
+        values["accepted_at"] = datetime.utcnow()
+    answered = dict(db.execute(
+        update(Friendship)
+        .where(Friendship.id.in_(requested), Friendship.friend_id == user_id, Friendship.status == "pending")
+        .values(**values)
+        .returning(Friendship.id, Friendship.user_id)
+        .execution_options(synchronize_session=False)
+    ).all())
+
+    # Why the rest were left alone
+    others = [friendship_id for friendship_id in requested if friendship_id not in answered]
+    found = {}
+    if others:
+        rows = db.execute(
+            select(Friendship.id, Friendship.friend_id, Friendship.status).where(Friendship.id.in_(others))
+        )
+        found = {row.id: row for row in rows}
+
+    if answered:
+        adjust_pending_counts(db.connection(), {user_id: -len(answered)})
+        if new_status == "accepted":
+            mark_friends_changed(db, [user_id, *answered.values()])
+        record_social_changes(db, [("link", requester_id, user_id, new_status) for requester_id in answered.values()])
+    db.commit()
+
+    results = []
+    for friendship_id in requested:
+        row = found.get(friendship_id)
+        if friendship_id in answered:
+            results.append({"id": friendship_id, "result": new_status, "friendship_id": friendship_id, "status": new_status})
+        elif row is None:
+            results.append({"id": friendship_id, "result": "not_found"})
+        elif row.friend_id != user_id:
+            results.append({"id": friendship_id, "result": "forbidden"})
+        else:
+            results.append({"id": friendship_id, "result": "not_pending", "friendship_id": friendship_id, "status": row.status})
+    return _bulk_response(results, len(answered))
@@ -0,0 +1,116 @@
+# routes/me.py
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Awaitable, Callable, Dict, Optional
+from database import get_async_db, AsyncSessionLocal
+from models.user import User, UserResponse
+from routes.auth import get_current_user_record_async
+from leaderboard import player_rank
+from routes.badges import load_discoveries, build_badges, build_badge_summary
+from catalog import get_catalog_async
+from responses import FastJSONResponse
+import asyncio
+import logging
+import time
+
+router = APIRouter(prefix="/me", tags=["me"])
+logger = logging.getLogger(__name__)
+
+# Sections of the dashboard document, in response order
+DASHBOARD_SECTIONS = ("profile", "rank", "balance", "badges", "badge_summary")
+
+def dashboard_fields(fields: Optional[str]) -> set:
+    """Requested sections from a comma-separated mask - all of them when omitted"""
+    if not fields:
+        return set(DASHBOARD_SECTIONS)
+    requested = {part.strip() for part in fields.split(",") if part.strip()}
+    unknown = requested - set(DASHBOARD_SECTIONS)
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields must be a comma-separated subset of: {', '.join(DASHBOARD_SECTIONS)}"
+        )
+    return requested
+
+async def timed(timings: Dict[str, float], name: str, work: Awaitable[Any]) -> Any:
+    start = time.perf_counter()
+    try:
+        return await work
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+@router.get("/dashboard")
+async def get_dashboard(
+    fields: Optional[str] = Query(None, description="Comma-separated sections: " + ",".join(DASHBOARD_SECTIONS)),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_record_async)
+):
+    """
+    Everything the dashboard screen shows in one request: profile, rank,
+    balance, badges and badge summary, with one authentication.
+    Sections needing the database run concurrently; a failing section is
+    reported under errors instead of failing the whole document.
+    """
+    requested = dashboard_fields(fields)
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    # Profile and balance come from the authenticated user already loaded
+    sections: Dict[str, Any] = {}
+    if "profile" in requested:
+        sections["profile"] = UserResponse.model_validate(current_user).model_dump()
+    if "balance" in requested:
+        sections["balance"] = {"currency": current_user.currency}
+
+    async def rank():
+        # An AsyncSession runs one statement at a time, so the rank query gets
+        # its own pooled session to overlap with the discoveries query
+        async with AsyncSessionLocal() as rank_db:
+            return await player_rank(rank_db, current_user.id)
+
+    async def discoveries():
+        return await load_discoveries(db, current_user.id)
+
+    jobs: Dict[str, Callable[[], Awaitable[Any]]] = {}
+    if "rank" in requested:
+        jobs["rank"] = rank
+    if requested & {"badges", "badge_summary"}:
+        jobs["discoveries"] = discoveries
+
+    results = await asyncio.gather(
+        *(timed(timings, name, job()) for name, job in jobs.items()), return_exceptions=True
+    )
+    loaded = dict(zip(jobs, results))
+
+    errors: Dict[str, str] = {}
+    if "rank" in loaded:
+        if isinstance(loaded["rank"], Exception):
+            errors["rank"] = str(loaded["rank"])
+        else:
+            sections["rank"] = loaded["rank"]
+
+    if "discoveries" in loaded:
+        discovered = loaded.pop("discoveries")
+        for name, build in (("badges", build_badges), ("badge_summary", build_badge_summary)):
+            if name not in requested:
+                continue
+            if isinstance(discovered, Exception):
+                errors[name] = str(discovered)
+                continue
+            start = time.perf_counter()
+            try:
+                sections[name] = build(discovered, await get_catalog_async())
+            except Exception as e:
+                errors[name] = str(e)
+            timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    for name, message in errors.items():
+        logger.error(f"Dashboard section {name} failed for user {current_user.id}: {message}")
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    document: Dict[str, Any] = {"status": "success" if not errors else "partial", "user_id": current_user.id}
+    document.update((name, sections[name]) for name in DASHBOARD_SECTIONS if name in sections)
+    if errors:
+        document["errors"] = errors
+    document["timings_ms"] = timings
+    return FastJSONResponse(document)
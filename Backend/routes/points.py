@@ -1,29 +1,71 @@
 # routes/points.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
+from typing import Optional
 from database import get_db
 from models import PointsTransaction, User
-from models.points_transactions import PointsTransactionResponse
-from routes.auth import get_current_user
+from models.points_transactions import PointsTransactionResponse, PointsSummaryResponse
+from routes.auth import get_current_user, get_current_user_record
+from principals import Principal
+from ledger import apply_balance_change, transaction_summary
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor, seek_condition, page_size
 
 router = APIRouter(prefix="/api/points", tags=["points"])
 
 # Get user's currency transactions history
 @router.get("/transactions", response_model=list[PointsTransactionResponse])
 async def get_currency_transactions(
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    transactions = db.query(PointsTransaction).filter(
+    """
+    Ledger entries for the current user, newest first
+    One page of limit entries (DEFAULT_PAGE_SIZE by default, at most
+    MAX_PAGE_SIZE): the X-Next-Cursor response header is sent back as
+    cursor for the following page (absent on the last page).
+    """
+    page_limit = page_size(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
+
+    query = db.query(PointsTransaction).filter(
         PointsTransaction.user_id == current_user.id
-    ).order_by(PointsTransaction.created_at.desc()).all()
+    )
+    if after:
+        # Seek past the last row of the previous page (ix_points_transactions_user_created)
+        query = query.filter(seek_condition(
+            db.bind.dialect.name, PointsTransaction.created_at, PointsTransaction.id, after
+        ))
+    query = query.order_by(PointsTransaction.created_at.desc(), PointsTransaction.id.desc())
+    transactions = query.limit(page_limit + 1).all()
+
+    if len(transactions) > page_limit:
+        transactions = transactions[:page_limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(transactions[-1].created_at, transactions[-1].id)
     
     return transactions
 
+# Totals by transaction type and by day or week
+@router.get("/transactions/summary", response_model=PointsSummaryResponse)
+async def get_transactions_summary(
+    period: str = Query("day", pattern="^(day|week)$"),
+    periods: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Lifetime totals per transaction type plus totals for the latest periods
+    (UTC days, or weeks starting Monday), newest first - read from the
+    rollups, so the cost doesn't grow with the length of the history
+    """
+    return transaction_summary(db, current_user.id, period, periods)
+
 # Get user's current currency balance
 @router.get("/balance")
 async def get_currency_balance(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_record)
 ):
     return {"currency": current_user.currency}
 
@@ -33,28 +75,22 @@ async def add_currency(
     currency: int,
     description: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_record)
 ):
     if currency <= 0:
         raise HTTPException(status_code=400, detail="Currency must be positive")
     
-    # Add currency to user
-    current_user.currency += currency
-    
-    # Create transaction record
-    transaction = PointsTransaction(
-        user_id=current_user.id,
+    # Add currency to user with a ledger entry, atomically
+    balance = apply_balance_change(
+        db, current_user,
         transaction_type="earn",
-        points=currency,  # Still using 'points' field but storing currency value
         description=description,
-        reference_id=None
+        currency=currency
     )
-    
-    db.add(transaction)
     db.commit()
     
     return {
         "success": True,
         "message": f"Added {currency} currency",
-        "new_balance": current_user.currency
-    }
\ No newline at end of file
+        "new_balance": balance["currency"]
+    }
@@ -1,20 +1,21 @@
 import os,json
+from functools import lru_cache
 from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from models.scanned_species import ScannedSpecies
-from models.species import Species
+from models.species import SpeciesResponse
+from catalog import get_catalog_async
 from models.user import User
 from database import get_db
-from routes.auth import get_current_user
-
-# LangChain imports
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from routes.auth import get_current_user, get_current_user_record
+from principals import Principal
+from ledger import apply_balance_change
 
+# LangChain is imported on the first quiz request - it roughly doubles
+# the API's import time and most instances never serve a quiz
 
 from pydantic import BaseModel, Field
 
@@ -36,19 +37,25 @@ class PointsRequest(BaseModel):
     currency: int
     
 # -------------------------
-# Initialize LLM
+# LLM (created on first use)
 # -------------------------
-llm = ChatGoogleGenerativeAI(
-    # Fill in your parameters as required
-    model="gemini-2.5-flash",
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0.2
-)
+@lru_cache(maxsize=1)
+def get_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        # Fill in your parameters as required
+        model="gemini-2.5-flash",
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+        temperature=0.2
+    )
 
 # -------------------------
 # Output parser
 # -------------------------
-output_parser = JsonOutputParser(pydantic_object=QuizResponse)
+@lru_cache(maxsize=1)
+def get_output_parser():
+    from langchain_core.output_parsers import JsonOutputParser
+    return JsonOutputParser(pydantic_object=QuizResponse)
 
 
 
@@ -57,19 +64,23 @@ output_parser = JsonOutputParser(pydantic_object=QuizResponse)
 # -------------------------
 router = APIRouter(prefix="/quiz", tags=["quiz"])
 
+# Species described to the LLM per quiz
+QUIZ_SPECIES_LIMIT = 10
+
 # -------------------------
 # Route: Get user species + generate quiz
 # -------------------------
 @router.get("/generate-specific-quiz", response_model=QuizResponse)
 async def generate_quiz_for_user(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Generate wildlife quiz questions based on species scanned by the current user.
-    Location is fixed to 'Malaysia' and species data is read from the Species table.
+    Location is fixed to 'Malaysia' and species data is read from the species catalog.
     """
     try:
+        from langchain_core.prompts import ChatPromptTemplate
 
         # -------------------------
         # Prompt template
@@ -111,14 +122,20 @@ async def generate_quiz_for_user(
                     ]
                 )
 
-        chain = chat_prompt | llm | output_parser
+        output_parser = get_output_parser()
+        chain = chat_prompt | get_llm() | output_parser
        
-        # 1) Query Species joined from scanned_species for this user 
-        species_rows: List[Species] = (
-            db.query(Species)
-            .join(ScannedSpecies, Species.id == ScannedSpecies.species_id)
-            .filter(ScannedSpecies.user_id == current_user.id)
-            .all()
+        # 1) Distinct species this user has scanned, details from the catalog snapshot
+        discovered_ids = [
+            species_id for (species_id,) in db.query(ScannedSpecies.species_id)
+            .filter(ScannedSpecies.user_id == current_user.id, ScannedSpecies.species_id.isnot(None))
+            .distinct()
+        ]
+        # Limit the number of species passed to avoid overly long prompts - a
+        # random pick of 10 so repeat quizzes cover different discoveries
+        catalog = await get_catalog_async()
+        species_rows: List[SpeciesResponse] = (
+            catalog.sample_species(QUIZ_SPECIES_LIMIT, only=discovered_ids) if discovered_ids else []
         )
 
         if not species_rows:
@@ -128,8 +145,6 @@ async def generate_quiz_for_user(
             )
 
         # 2) Build descriptive snippet for the LLM prompt.
-        # Limit the number of species passed to avoid overly long prompts (e.g. first 10)
-        species_rows = species_rows[:10]
         species_summaries = []
         species_names = []
         for s in species_rows:
@@ -175,13 +190,14 @@ async def generate_quiz_for_user(
 @router.get("/generate-general-quiz", response_model=QuizResponse)
 async def generate_general_quiz(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Generate wildlife quiz questions based on species scanned by the current user.
     Location is fixed to 'Malaysia' and species data is read from the Species table.
     """
     try:
+        from langchain_core.prompts import ChatPromptTemplate
 
         # -------------------------
         # Prompt template
@@ -222,7 +238,8 @@ async def generate_general_quiz(
                     ]
                 )
 
-        chain = chat_prompt | llm | output_parser
+        output_parser = get_output_parser()
+        chain = chat_prompt | get_llm() | output_parser
        
        
 
@@ -255,21 +272,25 @@ async def generate_general_quiz(
 async def add_user_points(
     points_data: PointsRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_record)
 ):
     """Add points and currency to user's total"""
     try:
         points = points_data.points
         currency = points_data.currency
         
-        current_user.points = (current_user.points or 0) + points
-        current_user.currency = (current_user.currency or 0) + currency
-        
+        balance = apply_balance_change(
+            db, current_user,
+            transaction_type="quiz",
+            description=f"Quiz reward - {points} points, {currency} currency",
+            points=points,
+            currency=currency
+        )
         db.commit()
         return {
             "message": f"Added {points} points and {currency} currency", 
-            "total_points": current_user.points,
-            "total_currency": current_user.currency
+            "total_points": balance["points"],
+            "total_currency": balance["currency"]
         }
     except Exception as e:
         db.rollback()
@@ -3,15 +3,15 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models.reports import Report, ReportCreate, ReportResponse
 from models.scanned_species import ScannedSpecies
-from models.user import User
 from routes.auth import get_current_user  # Fixed import
+from principals import Principal
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 @router.get("/", response_model=list[ReportResponse])
 async def get_reports(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get all reports for the current user"""
     reports = db.query(Report).filter(Report.user_id == current_user.id).all()
@@ -21,7 +21,7 @@ async def get_reports(
 async def get_report(
     report_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get a specific report by ID"""
     report = db.query(Report).filter(Report.id == report_id).first()
@@ -44,7 +44,7 @@ async def get_report(
 async def create_report(
     report_data: ReportCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Create a new report"""
     # Check if scanned_species exists and belongs to user
@@ -76,7 +76,7 @@ async def update_report(
     report_id: str,
     report_data: ReportCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Update a report"""
     report = db.query(Report).filter(Report.id == report_id).first()
@@ -118,7 +118,7 @@ async def update_report(
 async def delete_report(
     report_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Delete a report"""
     report = db.query(Report).filter(Report.id == report_id).first()
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, or_, tuple_
 from sqlalchemy.orm import Session
-from models.species import Species  # ← Add this at the top
-from database import get_db
-from models.scanned_species import ScannedSpecies, ScannedSpeciesCreate, ScannedSpeciesResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.species import Species, species_key, generate_uuid  # ← Add this at the top
+from database import get_db, get_async_db
+from models.scanned_species import ScannedSpecies, ScannedSpeciesTombstone, ScannedSpeciesCreate, ScannedSpeciesResponse, sync_horizon
 from models.user import User
-from routes.auth import get_current_user
+from routes.auth import get_current_user, get_current_user_async, get_current_user_record
+from principals import Principal
 from typing import Optional, Dict, Any
 import logging
 import sys
@@ -12,13 +16,18 @@ import os
 from datetime import datetime
 from models.species import SpeciesResponse  # Add this import
 from pydantic import BaseModel, ConfigDict  # If using Pydantic v2
-from google.cloud import storage
-from google.oauth2 import service_account
 
 # Add the root directory to Python path to import species_scanner
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from species_scanner import scan_species_from_image, get_species_scan_capabilities, classify_species_by_name as classify_species_ai
 from location_service import get_current_location, get_demo_location
+from responses import FastJSONResponse
+from catalog import CatalogSnapshot, get_catalog_async, mark_catalog_changed
+from search import normalize, record_search_changes, SPECIES
+from ledger import apply_balance_change
+from pagination import (
+    MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor, seek_condition, page_size
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -29,7 +38,7 @@ router = APIRouter(prefix="/scanned-species", tags=["scanned-species"])
 @router.get("/test-gcp-connection")
 async def test_gcp_connection(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Test GCP Bucket connection with individual environment variables
@@ -173,7 +182,7 @@ async def check_existing_scanned_species(
 @router.delete("/cleanup-all-images")
 async def cleanup_all_images(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Delete ALL files inside the scanned-species folder in GCP Bucket
@@ -246,71 +255,95 @@ async def cleanup_all_images(
 
 # ===== REGULAR ROUTES =====
 
+# Lean columns for scan history listings - one joined row per sighting
+SCAN_HISTORY_COLUMNS = (
+    ScannedSpecies.id,
+    ScannedSpecies.user_id,
+    ScannedSpecies.species_id,
+    ScannedSpecies.location,
+    ScannedSpecies.image_url,
+    ScannedSpecies.verified,
+    ScannedSpecies.date_spotted,
+    Species.common_name,
+    Species.scientific_name,
+    Species.endangered_status
+)
+
+def scan_history_item(row) -> Dict[str, Any]:
+    """Scan history entry with species details for frontend, from a SCAN_HISTORY_COLUMNS row"""
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "species_id": row.species_id,
+        "location": row.location,
+        "image_url": row.image_url,  # Just the filename, the frontend constructs the URL
+        "verified": row.verified,
+        "created_at": row.date_spotted.isoformat() if row.date_spotted else None,
+        # Species details for frontend display
+        "common_name": row.common_name or "Unknown Species",
+        "scientific_name": row.scientific_name,
+        "endangered_status": row.endangered_status
+    }
+
 @router.get("/", response_model=Dict[str, Any])
 async def get_scanned_species(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    animal_class_id: Optional[str] = None,
+    endangered_status: Optional[str] = None,
+    verified: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    """Get all scanned species records for the current user with enhanced data for frontend"""
+    """
+    Scanned species for the current user, newest first, with species details for frontend
+
+    One joined query, one page of limit rows (DEFAULT_PAGE_SIZE by default,
+    at most MAX_PAGE_SIZE): the response's next_cursor is sent back as
+    cursor for the following page (null on the last page).
+    Optional filters: animal_class_id, endangered_status, verified.
+    """
+    page_limit = page_size(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
+    
     try:
-        scanned_species = db.query(ScannedSpecies).filter(
-            ScannedSpecies.user_id == current_user.id
-        ).all()
+        query = (
+            select(*SCAN_HISTORY_COLUMNS)
+            .outerjoin(Species, Species.id == ScannedSpecies.species_id)
+            .where(ScannedSpecies.user_id == current_user.id)
+        )
         
-        # Enhanced response with species details
-        enhanced_species_data = []
+        if animal_class_id:
+            query = query.where(Species.animal_class_id == animal_class_id)
+        if endangered_status:
+            query = query.where(Species.endangered_status == endangered_status)
+        if verified is not None:
+            query = query.where(ScannedSpecies.verified == verified)
+        if after:
+            # Seek past the last row of the previous page (served by ix_scanned_species_user_date)
+            query = query.where(seek_condition(
+                db.bind.dialect.name, ScannedSpecies.date_spotted, ScannedSpecies.id, after
+            ))
         
-        for scanned_item in scanned_species:
-            # Get basic scanned species data
-            species_response = ScannedSpeciesResponse.model_validate(scanned_item)
-            species_dict = species_response.model_dump()
-            
-            # Get species details if species_id exists
-            species_details = None
-            if scanned_item.species_id:
-                species = db.query(Species).filter(Species.id == scanned_item.species_id).first()
-                if species:
-                    species_details = {
-                        "common_name": species.common_name,
-                        "scientific_name": species.scientific_name,
-                        "endangered_status": species.endangered_status,
-                        "description": species.description,
-                        "habitat": species.habitat
-                    }
-            
-            # ✅ FIX: Return just the filename, let frontend construct the URL
-            image_url = scanned_item.image_url  # Just return the filename as-is
-            logger.info(f"🖼 Returning image filename: {image_url}")
-            
-            # Enhanced data structure for frontend
-            enhanced_data = {
-                "id": str(scanned_item.id),
-                "user_id": str(scanned_item.user_id),
-                "species_id": str(scanned_item.species_id) if scanned_item.species_id else None,
-                "location": scanned_item.location,
-                "image_url": image_url,  # ✅ This should now be just the filename
-                "verified": scanned_item.verified,
-                "created_at": scanned_item.date_spotted.isoformat() if scanned_item.date_spotted else None,
-                # Species details for frontend display
-                "common_name": species_details["common_name"] if species_details else "Unknown Species",
-                "scientific_name": species_details["scientific_name"] if species_details else None,
-                "endangered_status": species_details["endangered_status"] if species_details else None,
-                # Raw data for debugging (optional)
-                "raw_data": species_dict
-            }
-            
-            enhanced_species_data.append(enhanced_data)
+        query = query.order_by(ScannedSpecies.date_spotted.desc(), ScannedSpecies.id.desc()).limit(page_limit + 1)
         
-        # Sort by creation date (newest first)
-        enhanced_species_data.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+        rows = (await db.execute(query)).all()
         
-        return {
+        next_cursor = None
+        if len(rows) > page_limit:
+            rows = rows[:page_limit]
+            next_cursor = encode_cursor(rows[-1].date_spotted, rows[-1].id)
+        
+        enhanced_species_data = [scan_history_item(row) for row in rows]
+        
+        return FastJSONResponse({
             "status": "success",
             "data": enhanced_species_data,
             "count": len(enhanced_species_data),
+            "next_cursor": next_cursor,
             "user_id": str(current_user.id),
             "retrieved_at": datetime.now().isoformat()
-        }
+        })
         
     except Exception as e:
         logger.error(f"Error retrieving scanned species: {str(e)}")
@@ -320,11 +353,115 @@ async def get_scanned_species(
             "retrieved_at": datetime.now().isoformat()
         }
 
+@router.get("/sync", response_model=Dict[str, Any])
+async def sync_scanned_species(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """
+    Delta sync of the current user's scan history for offline clients
+
+    Without a cursor every sighting is returned (the initial sync). After that,
+    send back next_cursor to get only sightings created or updated since, plus
+    the ids of sightings deleted since. Keep calling while has_more is true,
+    and store next_cursor even when nothing changed. full_sync is true when
+    the response starts over from the first sighting - the client should then
+    drop local sightings that the following pages do not return.
+    """
+    page_limit = page_size(limit) or MAX_PAGE_SIZE
+    changed_after, deleted_after = [None, None], [None, None]
+    if cursor:
+        values = decode_cursor(cursor, 4)
+        changed_after, deleted_after = values[:2], values[2:]
+    # Cursors from before sync_version carried timestamps; those clients start over
+    full_sync = not cursor or any(isinstance(version, str) for version in (changed_after[0], deleted_after[0]))
+    if full_sync:
+        changed_after, deleted_after = [None, None], [None, None]
+    
+    try:
+        # Only versions every transaction has finished with - see next_sync_version
+        settled = db.bind.dialect.name == "postgresql"
+        
+        changes_query = (
+            select(*SCAN_HISTORY_COLUMNS, ScannedSpecies.updated_at, ScannedSpecies.sync_version)
+            .outerjoin(Species, Species.id == ScannedSpecies.species_id)
+            .where(ScannedSpecies.user_id == current_user.id)
+        )
+        if settled:
+            changes_query = changes_query.where(ScannedSpecies.sync_version < sync_horizon())
+        if changed_after[0] is not None:
+            changes_query = changes_query.where(
+                tuple_(ScannedSpecies.sync_version, ScannedSpecies.id) > tuple_(*changed_after)
+            )
+        changes_query = changes_query.order_by(
+            ScannedSpecies.sync_version, ScannedSpecies.id
+        ).limit(page_limit + 1)
+        
+        deletions_query = select(
+            ScannedSpeciesTombstone.scanned_species_id,
+            ScannedSpeciesTombstone.sync_version
+        ).where(ScannedSpeciesTombstone.user_id == current_user.id)
+        if settled:
+            deletions_query = deletions_query.where(ScannedSpeciesTombstone.sync_version < sync_horizon())
+        if full_sync:
+            # A fresh client has nothing to delete; only advance its cursor
+            deletions_query = deletions_query.order_by(
+                ScannedSpeciesTombstone.sync_version.desc(),
+                ScannedSpeciesTombstone.scanned_species_id.desc()
+            ).limit(1)
+        else:
+            if deleted_after[0] is not None:
+                deletions_query = deletions_query.where(
+                    tuple_(ScannedSpeciesTombstone.sync_version, ScannedSpeciesTombstone.scanned_species_id)
+                    > tuple_(*deleted_after)
+                )
+            deletions_query = deletions_query.order_by(
+                ScannedSpeciesTombstone.sync_version, ScannedSpeciesTombstone.scanned_species_id
+            ).limit(page_limit + 1)
+        
+        changes = (await db.execute(changes_query)).all()
+        deletions = (await db.execute(deletions_query)).all()
+        
+        has_more = len(changes) > page_limit or len(deletions) > page_limit
+        changes, deletions = changes[:page_limit], deletions[:page_limit]
+        
+        if changes:
+            changed_after = [changes[-1].sync_version, changes[-1].id]
+        if deletions:
+            deleted_after = [deletions[-1].sync_version, deletions[-1].scanned_species_id]
+        
+        changed_items = []
+        for row in changes:
+            item = scan_history_item(row)
+            item["updated_at"] = row.updated_at.isoformat() if row.updated_at else None
+            changed_items.append(item)
+        
+        return FastJSONResponse({
+            "status": "success",
+            "changes": changed_items,
+            "deleted": [] if full_sync else [row.scanned_species_id for row in deletions],
+            "next_cursor": encode_cursor(*changed_after, *deleted_after),
+            "has_more": has_more,
+            "full_sync": full_sync,
+            "user_id": str(current_user.id),
+            "synced_at": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error syncing scanned species: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e),
+            "synced_at": datetime.now().isoformat()
+        }
+
 @router.post("/test-gcp-storage")
 async def test_gcp_storage_direct(
     image: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Test GCP storage and see exactly what gets stored in database"""
     try:
@@ -379,7 +516,7 @@ async def test_gcp_storage_direct(
 async def create_scanned_species(
     scanned_data: ScannedSpeciesCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Create a new scanned species record"""
     try:
@@ -466,11 +603,101 @@ async def get_scan_capabilities():
             "retrieved_at": datetime.now().isoformat()
         }
 
+# Simplified reward tiers - POINTS (permanent) and CURRENCY (spendable)
+SCAN_REWARD_TIERS = {
+    "concern": {"points": 80, "currency": 40},      # Endangered species
+    "not concern": {"points": 20, "currency": 10}   # Common species
+}
+
+async def record_scan(db: Session, user: User, species_data: dict, location_string: str,
+                      uploaded_filename: Optional[str], animal_class_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write one successful scan as a single transaction: species upsert,
+    sighting, points ledger entry and atomic balance update, committed
+    once - a failure anywhere leaves none of it behind.
+    uploaded_filename is the GCP image, or None to use the Unsplash fallback.
+    animal_class_id is classify_new_species' answer for a new species.
+    """
+    # Get or create species in the database (not committed yet)
+    species_id = await get_or_create_species(species_data, db, animal_class_id)
+    species = db.get(Species, species_id)
+    if not species:
+        raise HTTPException(status_code=500, detail="Species not found after creation")
+
+    # CALCULATE REWARDS BASED ON SIMPLIFIED STATUS (ANTI-EXPLOIT)
+    endangered_status = species.endangered_status.lower() if species.endangered_status else "not concern"
+    # Get rewards - if status is unknown, default to "not concern"
+    rewards = SCAN_REWARD_TIERS.get(endangered_status, SCAN_REWARD_TIERS["not concern"])
+
+    # CHECK FOR EXISTING RECORD BEFORE CREATING NEW ONE (queried before anything is pending)
+    existing_scanned_species = await check_existing_scanned_species(
+        str(user.id), species_id, location_string, db
+    )
+    image_filename = uploaded_filename or get_default_image(species.common_name)
+
+    if existing_scanned_species:
+        logger.info(f"Using existing scanned species record: {existing_scanned_species.id}")
+        scanned_species_id = str(existing_scanned_species.id)
+    else:
+        db_scanned_species = ScannedSpecies(
+            **ScannedSpeciesCreate(
+                species_id=species_id,
+                location=location_string,
+                image_url=image_filename,  # Store either GCP filename or Unsplash URL
+                verified=False
+            ).model_dump(),
+            id=generate_uuid(),
+            user_id=user.id
+        )
+        db.add(db_scanned_species)
+        scanned_species_id = db_scanned_species.id
+
+    # AWARD BOTH POINTS AND CURRENCY - last, so the user's row is locked only until the commit
+    balance = apply_balance_change(
+        db, user,
+        transaction_type="species_scan",
+        description=f"Scanned {species.common_name} - {endangered_status.title()}",
+        points=rewards["points"],      # Permanent achievement points
+        currency=rewards["currency"]   # Spendable coins
+    )
+
+    # Read everything the response needs now - committing expires the ORM
+    # objects and reading them afterwards would cost a refresh round trip each
+    scan = {
+        "species_id": species_id,
+        "species_data": {
+            "common_name": species.common_name,
+            "scientific_name": species.scientific_name,
+            "description": species.description,
+            "habitat": species.habitat,
+            "threats": species.threats,
+            "conservation": species.conservation,
+            "endangered_status": species.endangered_status,
+            "success": True,
+            "api_response": species.api_response
+        },
+        "rewards": {
+            "points_earned": rewards["points"],
+            "currency_earned": rewards["currency"],
+            "total_points": balance["points"],
+            "total_currency": balance["currency"],
+            "endangered_status": endangered_status
+        },
+        "scanned_species_id": scanned_species_id,
+        "is_new_record": existing_scanned_species is None,
+        "image_filename": image_filename
+    }
+
+    # One flush and one commit for the whole scan
+    db.commit()
+    logger.info(f"🎯 User {user.id} earned {rewards['points']} points and {rewards['currency']} currency for scanning {endangered_status} species")
+    return scan
+
 @router.post("/scan-with-location")
 async def scan_species_with_enhanced_location(
     image: UploadFile = File(..., description="Animal image to identify"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_record)
 ) -> Dict[str, Any]:
     """
     Enhanced scan endpoint that awards both POINTS and CURRENCY
@@ -520,109 +747,25 @@ async def scan_species_with_enhanced_location(
         
         # Enhanced response formatted for database tables
         if result.get("status") == "success":
-            # Get or create species in the database
-            species_id = await get_or_create_species(
-                result.get("data", {}), 
-                db
-            )
-            
-            # Get the complete species data for response
-            from models.species import Species
-            species = db.query(Species).filter(Species.id == species_id).first()
-            if not species:
-                raise HTTPException(status_code=500, detail="Species not found after creation")
-            
-            # CALCULATE REWARDS BASED ON SIMPLIFIED STATUS (ANTI-EXPLOIT)
-            endangered_status = species.endangered_status.lower() if species.endangered_status else "not concern"
-
-            # Simplified reward tiers - POINTS (permanent) and CURRENCY (spendable)
-            reward_tiers = {
-                "concern": {"points": 80, "currency": 40},      # Endangered species
-                "not concern": {"points": 20, "currency": 10}   # Common species
-            }
-
-            # Get rewards - if status is unknown, default to "not concern"
-            rewards = reward_tiers.get(endangered_status, reward_tiers["not concern"])
-            
-            # AWARD BOTH POINTS AND CURRENCY
-            current_user.points += rewards["points"]      # Permanent achievement points
-            current_user.currency += rewards["currency"]  # Spendable coins
-            
-            # Create transaction record for POINTS (achievement tracking)
-            from models.points_transactions import PointsTransaction
-            points_transaction = PointsTransaction(
-                user_id=current_user.id,
-                transaction_type="species_scan",
-                points=rewards["points"],
-                description=f"Scanned {species.common_name} - {endangered_status.title()}"
-            )
-            
-            db.add(points_transaction)
-            
-            logger.info(f"🎯 User {current_user.id} earned {rewards['points']} points and {rewards['currency']} currency for scanning {endangered_status} species")
-            
             # Create scanned species record
             scanner_location = result.get("location", {})
             location_string = f"{scanner_location.get('city', 'Unknown')}, {scanner_location.get('country', 'Unknown')}"
-            
-            # CHECK FOR EXISTING RECORD BEFORE CREATING NEW ONE
-            existing_scanned_species = await check_existing_scanned_species(
-                str(current_user.id), 
-                species_id, 
-                location_string, 
-                db
-            )
-            
-            scanned_species_id = None
-            is_new_record = False
-
-            # TRY TO UPLOAD TO GCP, FALLBACK TO UNSPLASH
-            image_filename = None
-            gcp_upload_successful = False
 
+            # Upload before the transaction opens, so no locks are held across the network call
+            uploaded_filename = None
             try:
-                # Upload and get filename
-                image_filename = await upload_image_to_gcp(image_data, image.filename)
-                gcp_upload_successful = True
-                logger.info(f"✅ Successfully uploaded image to GCP. Filename: {image_filename}")
-                    
+                uploaded_filename = await upload_image_to_gcp(image_data, image.filename)
+                logger.info(f"✅ Successfully uploaded image to GCP. Filename: {uploaded_filename}")
             except Exception as gcp_error:
                 logger.warning(f"❌ GCP upload failed, using Unsplash fallback: {str(gcp_error)}")
-                # Fallback to Unsplash API image
-                image_filename = get_default_image(species.common_name)  # Store the Unsplash URL directly
-                gcp_upload_successful = False
-                logger.info(f"🔄 Using fallback image: {image_filename}")
-    
-            if existing_scanned_species:
-                # Update existing record instead of creating new one
-                scanned_species_id = str(existing_scanned_species.id)
-                logger.info(f"Using existing scanned species record: {scanned_species_id}")
-                message = "Species already scanned in this location - using existing record"
-                is_new_record = False
-            else:
-                # Create new scanned species record
-                scanned_species_data = ScannedSpeciesCreate(
-                    species_id=species_id,
-                    location=location_string,
-                    image_url=image_filename,  # Store either GCP filename or Unsplash URL
-                    verified=False
-                )
-                
-                db_scanned_species = ScannedSpecies(
-                    **scanned_species_data.model_dump(),
-                    user_id=current_user.id
-                )
-                
-                db.add(db_scanned_species)
-                db.commit()
-                db.refresh(db_scanned_species)
-                scanned_species_id = str(db_scanned_species.id)
-                is_new_record = True
-                message = "Species scanned and saved successfully"
-            
-            # Commit all changes (user points/currency updates and transactions)
-            db.commit()
-            
+
+            # Classify a new species now too - the Gemini call must not run inside the transaction
+            species_data = result.get("data", {})
+            animal_class_id = await classify_new_species(species_data)
+
+            scan = await record_scan(db, current_user, species_data, location_string, uploaded_filename, animal_class_id)
+            rewards = scan["rewards"]
+
             # Return the complete formatted response for frontend
             return {
                 "status": "success",
@@ -632,29 +775,13 @@ async def scan_species_with_enhanced_location(
                 "file_size": len(image_data),
                 "image_format": result.get("data", {}).get("image_format"),
                 "location": result.get("location", {}),
-                "species_data": {
-                    "common_name": species.common_name,
-                    "scientific_name": species.scientific_name,
-                    "description": species.description,
-                    "habitat": species.habitat,
-                    "threats": species.threats,
-                    "conservation": species.conservation,
-                    "endangered_status": species.endangered_status,
-                    "success": True,
-                    "api_response": species.api_response
-                },
-                "rewards": {
-                    "points_earned": rewards["points"],
-                    "currency_earned": rewards["currency"],
-                    "total_points": current_user.points,
-                    "total_currency": current_user.currency,
-                    "endangered_status": endangered_status
-                },
-                "scanned_species_id": scanned_species_id,
-                "species_id": species_id,
-                "is_new_record": is_new_record,
-                "image_url": image_filename, 
-                "message": f"Species scanned successfully! +{rewards['points']} 🏆 points, +{rewards['currency']} 🪙 coins"
+                "species_data": scan["species_data"],
+                "rewards": rewards,
+                "scanned_species_id": scan["scanned_species_id"],
+                "species_id": scan["species_id"],
+                "is_new_record": scan["is_new_record"],
+                "image_url": scan["image_filename"], 
+                "message": f"Species scanned successfully! +{rewards['points_earned']} 🏆 points, +{rewards['currency_earned']} 🪙 coins"
             }
         else:
             return {
@@ -700,7 +827,7 @@ async def upload_image_to_gcp_and_get_filename(image_data: bytes, filename: str)
 async def classify_species_endpoint(  
     classification_request: dict,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Classify species into categories based on species name using AI
@@ -744,7 +871,7 @@ async def classify_species_endpoint(
 async def test_image_upload(
     image: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Test image upload to GCP"""
     try:
@@ -773,7 +900,7 @@ async def test_image_upload(
 async def get_scanned_species_by_id(
     scanned_species_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get a specific scanned species record by ID"""
     try:
@@ -824,7 +951,7 @@ async def update_scanned_species(
     scanned_species_id: str,
     scanned_data: ScannedSpeciesCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Update a scanned species record"""
     try:
@@ -893,7 +1020,7 @@ async def update_scanned_species(
 async def delete_scanned_species(
     scanned_species_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Delete a scanned species record"""
     try:
@@ -918,6 +1045,11 @@ async def delete_scanned_species(
                 "deleted_at": datetime.now().isoformat()
             }
         
+        # Tombstone in the same transaction so syncing clients see the delete
+        db.add(ScannedSpeciesTombstone(
+            scanned_species_id=scanned_species.id,
+            user_id=scanned_species.user_id
+        ))
         db.delete(scanned_species)
         db.commit()
         
@@ -940,19 +1072,16 @@ async def delete_scanned_species(
 @router.get("/species/{species_id}", response_model=Dict[str, Any])
 async def get_species_by_id(
     species_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user_async)
 ):
+    """Species details from the catalog snapshot (use /api/wildlife/species/batch for several)"""
     try:
-        from models.species import Species
-        species = db.query(Species).filter(Species.id == species_id).first()
+        catalog = await get_catalog_async()
+        species_response = catalog.species_by_id.get(species_id)
         
-        if not species:
+        if not species_response:
             return {"status": "error", "error": "Species not found"}
         
-        # Convert to Pydantic model
-        species_response = SpeciesResponse.model_validate(species)
-        
         return {
             "status": "success",
             "data": species_response,  # ← Now using Pydantic model
@@ -970,105 +1099,124 @@ async def get_species_by_id(
 
 # ===== HELPER FUNCTIONS =====
         
-async def get_or_create_species(species_data: dict, db: Session) -> str:
+def insert_species_if_absent(db: Session, values: dict) -> Optional[str]:
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING id - the new species id, or
+    None when a species with the same key (or scientific name) already exists
+    """
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(Species).values(**values).on_conflict_do_nothing().returning(Species.id)
+    species_id = db.execute(statement).scalar()
+
+    if species_id is not None:
+        # A Core insert bypasses the flush events that keep the catalog snapshot
+        # and the search index in step; both follow once the caller commits
+        mark_catalog_changed(db)
+        record_search_changes(db, SPECIES, [(species_id, {field: values.get(field) for field in SPECIES.fields})])
+    return species_id
+
+async def get_or_create_species(species_data: dict, db: Session, animal_class_id: Optional[str] = None) -> str:
     """
     Get existing species or create new one in the database
     Returns the species ID
+    Species are matched on species_key (the normalized scientific name) or an
+    exact normalized common name. Concurrent first sightings of one species
+    all insert with ON CONFLICT DO NOTHING, and the losers read the winner's row.
+    A new species is not committed here - it is part of the caller's transaction.
+    animal_class_id comes from classify_new_species, run before the transaction
+    opened; a species the catalog didn't know about then gets the keyword
+    fallback, never a Gemini call with the transaction open.
     """
     try:
-        from models.species import Species
-        from models.animal_class import AnimalClass
-        
         scientific_name = species_data.get("scientific_name")
         common_name = species_data.get("common_name")
-        
-        # First, check if species already exists by scientific name (most accurate)
-        existing_species = db.query(Species).filter(
-            Species.scientific_name == scientific_name
-        ).first()
-        
-        if existing_species:
+        key = species_key(scientific_name)
+
+        # First, check by normalized scientific name (most accurate) - a unique index lookup
+        existing_id = db.scalar(select(Species.id).where(Species.species_key == key))
+        if existing_id:
             logger.info(f"Species already exists: {scientific_name} ({common_name})")
-            return str(existing_species.id)
-        
-        # Also check by common name to avoid duplicates
-        existing_by_common_name = db.query(Species).filter(
-            Species.common_name.ilike(f"%{common_name}%")
-        ).first()
-        
+            return str(existing_id)
+
+        # Also check by common name to avoid duplicates - an exact match from the catalog snapshot
+        catalog = await get_catalog_async()
+        existing_by_common_name = next(iter(
+            catalog.species_by_common_name.get(normalize(common_name), ())
+        ), None)
         if existing_by_common_name:
-            logger.info(f"Species with similar common name exists: {common_name} -> {existing_by_common_name.scientific_name}")
+            logger.info(f"Species with the same common name exists: {common_name} -> {existing_by_common_name.scientific_name}")
             return str(existing_by_common_name.id)
-        
-        # ✅ FIXED: Use AI classification to get correct animal_class_id
-        animal_class_id = await get_animal_class_id_using_ai(common_name, db)
-        
-        # Create new species only if it doesn't exist
-        new_species = Species(
-            animal_class_id=animal_class_id,  # ✅ Now uses correct animal class from AI
-            common_name=common_name,
-            scientific_name=scientific_name,
-            description=species_data.get("description"),
-            habitat=species_data.get("habitat"),
-            threats=species_data.get("threats"),
-            conservation=species_data.get("conservation"),
-            endangered_status=species_data.get("endangered_status"),
-            api_response=species_data.get("api_response")
-        )
-        
-        db.add(new_species)
-        db.commit()
-        db.refresh(new_species)
-        
+
+        if animal_class_id is None:
+            animal_class_id = await get_animal_class_id_fallback(common_name, catalog)
+
+        species_id = insert_species_if_absent(db, {
+            "animal_class_id": animal_class_id,  # ✅ Classified by AI before the transaction
+            "common_name": common_name,
+            "scientific_name": scientific_name,
+            "species_key": key,
+            "description": species_data.get("description"),
+            "habitat": species_data.get("habitat"),
+            "threats": species_data.get("threats"),
+            "conservation": species_data.get("conservation"),
+            "endangered_status": species_data.get("endangered_status"),
+            "api_response": species_data.get("api_response")
+        })
+
+        if species_id is None:
+            # Another request created it first; its row is committed by now
+            species_id = db.scalar(select(Species.id).where(
+                or_(Species.species_key == key, Species.scientific_name == scientific_name)
+            ))
+            logger.info(f"Species created concurrently: {scientific_name} ({common_name})")
+            return str(species_id)
+
         logger.info(f"✅ Created new species: {scientific_name} ({common_name}) with animal_class_id: {animal_class_id}")
-        return str(new_species.id)
-        
+        return str(species_id)
+
     except Exception as e:
         logger.error(f"Error in get_or_create_species: {e}")
-        # If there's an error, try to find any existing species as fallback
-        try:
-            scientific_name = species_data.get("scientific_name")
-            existing_species = db.query(Species).filter(
-                Species.scientific_name == scientific_name
-            ).first()
-            if existing_species:
-                return str(existing_species.id)
-            
-            # Fallback to common name search
-            common_name = species_data.get("common_name")
-            existing_by_common_name = db.query(Species).filter(
-                Species.common_name.ilike(f"%{common_name}%")
-            ).first()
-            if existing_by_common_name:
-                return str(existing_by_common_name.id)
-        except:
-            pass
-        
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to process species: {str(e)}"
         )
 
+async def classify_new_species(species_data: dict) -> Optional[str]:
+    """
+    animal_class_id for a species the catalog doesn't know yet, or None if it
+    is known. Called before the scan's transaction opens, so the Gemini round
+    trip never runs while the transaction holds locks.
+    """
+    scientific_name = species_data.get("scientific_name") or ""
+    common_name = species_data.get("common_name") or ""
+    catalog = await get_catalog_async()
+    if scientific_name.lower() in catalog.species_by_scientific_name:
+        return None
+    if catalog.species_by_common_name.get(normalize(common_name)):
+        return None
+    return await get_animal_class_id_using_ai(common_name)
+
 # ✅ NEW FUNCTION: Use AI classification to get correct animal_class_id
-async def get_animal_class_id_using_ai(common_name: str, db: Session) -> str:
+async def get_animal_class_id_using_ai(common_name: str) -> str:
     """
     Use AI classification to determine the correct animal_class_id
     """
-    from models.animal_class import AnimalClass
+    catalog = await get_catalog_async()
     
     try:
-        # Use the existing classify_species_by_name function
-        classification_result = classify_species_by_name(common_name)
+        # Gemini is a blocking network call - keep it off the event loop
+        classification_result = await run_in_threadpool(classify_species_ai, common_name)
         
         if classification_result.get("status") == "success":
             ai_category = classification_result["classification"].get("category")
             if ai_category:
                 logger.info(f"🤖 AI classification for '{common_name}': {ai_category}")
                 
-                # Find the animal class in database
-                animal_class = db.query(AnimalClass).filter(
-                    AnimalClass.class_name.ilike(ai_category)
-                ).first()
+                # Find the animal class in the catalog
+                animal_class = catalog.classes_by_name.get(ai_category.lower())
                 
                 if animal_class:
                     logger.info(f"✅ Found animal class: {animal_class.class_name} (ID: {animal_class.id})")
@@ -1078,19 +1226,17 @@ async def get_animal_class_id_using_ai(common_name: str, db: Session) -> str:
         
         # Fallback if AI classification fails
         logger.warning(f"🔄 AI classification failed for '{common_name}', using fallback")
-        return await get_animal_class_id_fallback(common_name, db)
+        return await get_animal_class_id_fallback(common_name, catalog)
         
     except Exception as e:
         logger.error(f"❌ AI classification error for '{common_name}': {str(e)}")
-        return await get_animal_class_id_fallback(common_name, db)
+        return await get_animal_class_id_fallback(common_name, catalog)
 
 # ✅ FALLBACK FUNCTION: Use keyword matching when AI fails
-async def get_animal_class_id_fallback(common_name: str, db: Session) -> str:
+async def get_animal_class_id_fallback(common_name: str, catalog: CatalogSnapshot) -> str:
     """
     Fallback method using keyword matching
     """
-    from models.animal_class import AnimalClass
-    
     common_name_lower = common_name.lower()
     
     # Bird patterns - INCLUDING SHOEBILL
@@ -1128,46 +1274,42 @@ async def get_animal_class_id_fallback(common_name: str, db: Session) -> str:
     
     logger.info(f"🔄 Fallback classification for '{common_name}': {category}")
     
-    # Find the animal class in database
-    animal_class = db.query(AnimalClass).filter(
-        AnimalClass.class_name.ilike(category)
-    ).first()
+    # Find the animal class in the catalog
+    animal_class = catalog.classes_by_name.get(category.lower())
     
     if animal_class:
         return str(animal_class.id)
     
     # Ultimate fallback: Use Birds as default (since Shoebill is a bird)
-    birds_class = db.query(AnimalClass).filter(AnimalClass.class_name == "Birds").first()
+    birds_class = catalog.classes_by_name.get("birds")
     if birds_class:
         logger.warning(f"⚠️ Using default animal class: Birds")
         return str(birds_class.id)
     
     # Last resort: First animal class in database
-    first_class = db.query(AnimalClass).first()
-    if first_class:
+    if catalog.animal_classes:
+        first_class = catalog.animal_classes[0]
         logger.error(f"🚨 Using first available animal class: {first_class.class_name}")
         return str(first_class.id)
     
     raise Exception("No animal classes found in database")
 
-async def get_animal_class_id_for_species(species_data: dict, db: Session) -> str:
+async def get_animal_class_id_for_species(species_data: dict) -> str:
     """
     Get animal_class_id based on species data - USE THE NEW AI FUNCTION
     """
     common_name = species_data.get("common_name", "")
-    return await get_animal_class_id_using_ai(common_name, db)
+    return await get_animal_class_id_using_ai(common_name)
 
 @router.get("/animal-class/{animal_class_id}")
 async def get_animal_class_by_id(
     animal_class_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    """Get animal class by ID"""
+    """Get animal class by ID (use /api/wildlife/animal-classes/batch for several)"""
     try:
-        from models.animal_class import AnimalClass
-        
-        animal_class = db.query(AnimalClass).filter(AnimalClass.id == animal_class_id).first()
+        catalog = await get_catalog_async()
+        animal_class = catalog.classes_by_id.get(animal_class_id)
         
         if not animal_class:
             return {
@@ -1329,7 +1471,7 @@ async def upload_image_to_gcp(image_data: bytes, filename: str) -> str:
 @router.delete("/cleanup-all-images")
 async def cleanup_all_images(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Delete ALL files inside the scanned-species folder in GCP Bucket
@@ -1448,7 +1590,7 @@ async def public_test_connection():
 @router.get("/test-connection")
 async def test_connection(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Test endpoint to verify authenticated connection"""
     from datetime import datetime
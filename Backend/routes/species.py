@@ -1,188 +1,292 @@
 # routes/species.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from database import get_db
-from models.animal_class import AnimalClass, AnimalClassResponse
-from models.species import Species, SpeciesResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+from database import get_db, get_async_db
+from models.animal_class import AnimalClass, AnimalClassResponse, AnimalClassBatchResponse
+from models.species import Species, SpeciesResponse, SpeciesBatchResponse
+from models.scanned_species import ScannedSpecies
+from routes.auth import get_current_user_async
+from principals import Principal
+from catalog import (
+    get_catalog_async, catalog_response, invalidate_catalog, AnimalClassWithSpecies, WITHOUT_API_RESPONSE,
+    SPECIES_LIST_ADAPTER, ANIMAL_CLASS_LIST_ADAPTER, CLASSES_WITH_SPECIES_ADAPTER
+)
+from search import search_species, invalidate_search_index, SPECIES
+from batch import batch_ids, split_found
 
 router = APIRouter(prefix="/api/wildlife", tags=["Wildlife Catalog"])
 
+# Catalog reads are answered from the in-process snapshot (catalog.py) with an
+# ETag, so clients revalidating an unchanged catalog get a 304
+
+async def load_catalog():
+    try:
+        return await get_catalog_async()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error while loading the wildlife catalog: {str(e)}"
+        )
+
+def species_exclude(include_api_response: bool):
+    return None if include_api_response else WITHOUT_API_RESPONSE
+
+def class_named(catalog, class_name: str) -> AnimalClassResponse:
+    """Animal class by case-insensitive name, or a 404 listing the available ones"""
+    animal_class = catalog.classes_by_name.get(class_name.lower())
+    if not animal_class:
+        available_classes = [c.class_name for c in catalog.animal_classes]
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Animal class '{class_name}' not found. Available classifications: {', '.join(available_classes)}"
+        )
+    return animal_class
+
+def class_species_response(request: Request, catalog, animal_class_id: str, include_api_response: bool) -> Response:
+    return catalog_response(
+        request, catalog, f"class-{animal_class_id}-species-{int(include_api_response)}",
+        lambda catalog: SPECIES_LIST_ADAPTER.dump_json(
+            list(catalog.species_by_class.get(animal_class_id, ())),
+            exclude=species_exclude(include_api_response)
+        )
+    )
+
 # =============================================================================
 # ANIMAL CLASSIFICATION ENDPOINTS
 # =============================================================================
 
 @router.get("/animal-classes", response_model=List[AnimalClassResponse])
-async def get_all_animal_classes(db: Session = Depends(get_db)):
+async def get_all_animal_classes(request: Request):
     """
     Retrieve complete list of animal classifications
     Returns all taxonomic classes (Mammals, Birds, Reptiles, etc.)
     """
-    try:
-        animal_classes = db.query(AnimalClass).all()
-        return animal_classes
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Database error while fetching animal classes: {str(e)}"
-        )
+    return catalog_response(
+        request, await load_catalog(), "classes",
+        lambda catalog: ANIMAL_CLASS_LIST_ADAPTER.dump_json(list(catalog.animal_classes))
+    )
 
 @router.get("/animal-classes/by-name/{class_name}", response_model=AnimalClassResponse)
-async def get_animal_class_by_name(class_name: str, db: Session = Depends(get_db)):
+async def get_animal_class_by_name(class_name: str):
     """
     Find animal class by exact name match
     Case-insensitive search for taxonomic classes like 'Mammals', 'Birds', 'Reptiles'
     """
-    animal_class = db.query(AnimalClass).filter(
-        AnimalClass.class_name.ilike(class_name)
-    ).first()
+    catalog = await load_catalog()
+    animal_class = catalog.classes_by_name.get(class_name.lower())
     if not animal_class:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
+            status_code=status.HTTP_404_NOT_FOUND,
             detail="Animal classification not found"
         )
     return animal_class
 
+@router.get("/animal-classes/batch", response_model=AnimalClassBatchResponse)
+async def get_animal_classes_batch(ids: List[str] = Query(...)):
+    """
+    Several animal classes by id in one request, keyed by id
+    Pass ids repeated or comma-separated (up to 100); unknown ids are listed in missing
+    """
+    catalog = await load_catalog()
+    data, missing = split_found(batch_ids(ids), catalog.classes_by_id)
+    return {"data": data, "missing": missing}
+
+@router.get("/animal-classes/{animal_class_id}/species", response_model=List[SpeciesResponse])
+async def get_species_by_class(animal_class_id: str, request: Request, include_api_response: bool = False):
+    """
+    All species in one animal class
+    The raw api_response payload is left out unless include_api_response=true
+    """
+    catalog = await load_catalog()
+    if animal_class_id not in catalog.classes_by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Animal classification not found"
+        )
+    return class_species_response(request, catalog, animal_class_id, include_api_response)
+
 # =============================================================================
 # SPECIES ENDPOINTS
 # =============================================================================
 
 @router.get("/species", response_model=List[SpeciesResponse])
-async def get_all_species(db: Session = Depends(get_db)):
+async def get_all_species(request: Request, include_api_response: bool = False):
     """
     Retrieve complete wildlife species catalog
     Returns all species with common names, scientific names, and conservation status
+    The raw api_response payload is left out unless include_api_response=true
     """
-    try:
-        species = db.query(Species).all()
-        return species
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Database error while fetching species catalog: {str(e)}"
+    return catalog_response(
+        request, await load_catalog(), f"species-{int(include_api_response)}",
+        lambda catalog: SPECIES_LIST_ADAPTER.dump_json(
+            list(catalog.species), exclude=species_exclude(include_api_response)
         )
+    )
 
 @router.get("/species/search/{name}", response_model=List[SpeciesResponse])
-async def search_species_by_name(name: str, db: Session = Depends(get_db)):
+async def search_species_by_name(
+    name: str,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
     """
     Search species by common or scientific name
     Flexible search across common names (e.g., 'Tiger') and scientific names (e.g., 'Panthera tigris')
+    Ranked exact > prefix > substring > fuzzy (tolerates typos like 'Pantera'), paginated with limit/offset
     """
     try:
-        species = db.query(Species).filter(
-            (Species.common_name.ilike(f"%{name}%")) | 
-            (Species.scientific_name.ilike(f"%{name}%"))
-        ).all()
-        return species
+        return search_species(db, name, limit=limit, offset=offset)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Search operation failed: {str(e)}"
         )
 
+@router.get("/species/by-name/{name}", response_model=List[SpeciesResponse])
+async def get_species_by_name(name: str):
+    """
+    Exact lookup by scientific name or common name (case and accent insensitive)
+    Use /species/search/{name} for partial and fuzzy matches
+    """
+    catalog = await load_catalog()
+    return catalog.species_named(name)
+
+@router.get("/species/batch", response_model=SpeciesBatchResponse)
+async def get_species_batch(ids: List[str] = Query(...), include_api_response: bool = False):
+    """
+    Several species by id in one request, keyed by id
+    Pass ids repeated or comma-separated (up to 100); unknown ids are listed in missing
+    The raw api_response payload is left out unless include_api_response=true
+    """
+    catalog = await load_catalog()
+    data, missing = split_found(batch_ids(ids), catalog.species_by_id)
+    exclude = None if include_api_response else {"data": {"__all__": {"api_response"}}}
+    return Response(
+        content=SpeciesBatchResponse(data=data, missing=missing).model_dump_json(exclude=exclude),
+        media_type="application/json"
+    )
+
+RANDOM_SPECIES_MAX = 50
+
+async def random_species_response(count: int, animal_class_id: Optional[str], seed: Optional[int],
+                            exclude: Iterable[str] = ()) -> Response:
+    catalog = await load_catalog()
+    if animal_class_id is not None and animal_class_id not in catalog.classes_by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Animal classification not found"
+        )
+    species = catalog.sample_species(count, animal_class_id=animal_class_id, seed=seed, exclude=exclude)
+    return Response(
+        content=SPECIES_LIST_ADAPTER.dump_json(species, exclude=WITHOUT_API_RESPONSE),
+        media_type="application/json",
+        # A seeded draw is reproducible for as long as this version is current
+        headers={"X-Catalog-Version": catalog.version}
+    )
+
+@router.get("/species/random", response_model=List[SpeciesResponse])
+async def get_random_species(
+    count: int = Query(1, ge=1, le=RANDOM_SPECIES_MAX),
+    animal_class_id: Optional[str] = None,
+    seed: Optional[int] = None
+):
+    """
+    Species drawn uniformly at random, optionally from one animal class
+    Pass seed for a reproducible draw (the same while X-Catalog-Version is unchanged)
+    """
+    return await random_species_response(count, animal_class_id, seed)
+
+@router.get("/species/random/undiscovered", response_model=List[SpeciesResponse])
+async def get_random_undiscovered_species(
+    count: int = Query(1, ge=1, le=RANDOM_SPECIES_MAX),
+    animal_class_id: Optional[str] = None,
+    seed: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """
+    Random species the current user has not scanned yet - for discovery challenges
+    Fewer than count are returned when the user has discovered nearly everything
+    """
+    discovered = (await db.execute(
+        select(ScannedSpecies.species_id)
+        .where(ScannedSpecies.user_id == current_user.id, ScannedSpecies.species_id.isnot(None))
+        .distinct()
+    )).scalars().all()
+    return await random_species_response(count, animal_class_id, seed, exclude=discovered)
+
+@router.get("/species/{species_id}", response_model=SpeciesResponse)
+async def get_species_detail(species_id: str, request: Request):
+    """
+    One species with its full details, including the raw api_response
+    """
+    catalog = await load_catalog()
+    if species_id not in catalog.species_by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Species not found"
+        )
+    return catalog_response(
+        request, catalog, f"species-{species_id}",
+        lambda catalog: catalog.species_by_id[species_id].model_dump_json().encode()
+    )
+
 # =============================================================================
 # EDUCATIONAL MODULE ENDPOINTS
 # =============================================================================
 
-@router.get("/animal-classes-with-species")
-async def get_animal_classes_with_species(db: Session = Depends(get_db)):
+@router.get("/animal-classes-with-species", response_model=List[AnimalClassWithSpecies])
+async def get_animal_classes_with_species(request: Request, include_api_response: bool = False):
     """
     Comprehensive taxonomy hierarchy for educational content
     Returns all animal classes with their associated species - perfect for learning modules and discovery quests
+    The raw api_response payload is left out unless include_api_response=true
     """
-    try:
-        animal_classes = db.query(AnimalClass).all()
-        result = []
-        
-        for animal_class in animal_classes:
-            species_list = db.query(Species).filter(
-                Species.animal_class_id == animal_class.id
-            ).all()
-            
-            class_data = AnimalClassResponse.from_orm(animal_class)
-            species_data = [SpeciesResponse.from_orm(species) for species in species_list]
-            
-            result.append({
-                "animal_class": class_data,
-                "species": species_data,
-                "species_count": len(species_list)
-            })
-        
-        return result
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to load educational content: {str(e)}"
-        )
+    def build(catalog):
+        result = [
+            {
+                "animal_class": animal_class,
+                "species": list(catalog.species_by_class.get(animal_class.id, ())),
+                "species_count": len(catalog.species_by_class.get(animal_class.id, ()))
+            }
+            for animal_class in catalog.animal_classes
+        ]
+        exclude = None if include_api_response else {"__all__": {"species": WITHOUT_API_RESPONSE}}
+        return CLASSES_WITH_SPECIES_ADAPTER.dump_json(result, exclude=exclude)
+
+    return catalog_response(request, await load_catalog(), f"classes-with-species-{int(include_api_response)}", build)
 
 @router.get("/species-by-class/{class_name}", response_model=List[SpeciesResponse])
-async def get_species_by_animal_class(class_name: str, db: Session = Depends(get_db)):
+async def get_species_by_animal_class(class_name: str, request: Request, include_api_response: bool = False):
     """
     Filter species by animal classification
     Essential for AI identification feature - narrows down species by class (Mammals, Birds, etc.)
+    The raw api_response payload is left out unless include_api_response=true
     """
-    animal_class = db.query(AnimalClass).filter(
-        AnimalClass.class_name.ilike(class_name)
-    ).first()
-    
-    if not animal_class:
-        all_classes = db.query(AnimalClass.class_name).all()
-        available_classes = [ac[0] for ac in all_classes]
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Animal class '{class_name}' not found. Available classifications: {', '.join(available_classes)}"
-        )
-    
-    try:
-        species = db.query(Species).filter(Species.animal_class_id == animal_class.id).all()
-        return species
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to retrieve species for {class_name}: {str(e)}"
-        )
+    catalog = await load_catalog()
+    animal_class = class_named(catalog, class_name)
+    return class_species_response(request, catalog, animal_class.id, include_api_response)
 
 # =============================================================================
 # GAMIFICATION & LEARNING ENDPOINTS
 # =============================================================================
 
 @router.get("/random-species", response_model=List[SpeciesResponse])
-async def get_random_species(
-    count: int = 5,
-    class_name: Optional[str] = None,
-    db: Session = Depends(get_db)
+async def get_random_species_by_class_name(
+    count: int = Query(5, ge=1, le=RANDOM_SPECIES_MAX),
+    class_name: Optional[str] = None
 ):
     """
     Dynamic species selection for quizzes and challenges
     Returns random species - optionally filtered by class - for interactive learning games
     """
-    try:
-        from sqlalchemy import func
-        
-        query = db.query(Species)
-        
-        if class_name:
-            animal_class = db.query(AnimalClass).filter(
-                AnimalClass.class_name.ilike(class_name)
-            ).first()
-            
-            if not animal_class:
-                all_classes = db.query(AnimalClass.class_name).all()
-                available_classes = [ac[0] for ac in all_classes]
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Animal class '{class_name}' not found. Available: {', '.join(available_classes)}"
-                )
-            
-            query = query.filter(Species.animal_class_id == animal_class.id)
-        
-        random_species = query.order_by(func.random()).limit(count).all()
-        return random_species
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate quiz content: {str(e)}"
-        )
+    animal_class_id = class_named(await load_catalog(), class_name).id if class_name else None
+    return await random_species_response(count, animal_class_id, None)
 
 # =============================================================================
 # DATABASE MANAGEMENT
@@ -202,10 +306,15 @@ async def api_seed_database(db: Session = Depends(get_db)):
         db.query(Species).delete()
         db.query(AnimalClass).delete()
         db.commit()
+        # Bulk deletes bypass the ORM events that keep these in step
+        invalidate_search_index(SPECIES)
+        invalidate_catalog()
         
         print("🌱 Seeding database with sample wildlife data...")
         from reset_database import seed_database_via_api
         result = seed_database_via_api(db)
+        invalidate_search_index(SPECIES)
+        invalidate_catalog()
         
         result["message"] = "Database successfully reset and populated with sample wildlife data"
         return result
@@ -215,4 +324,4 @@ async def api_seed_database(db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database seeding failed: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.responses import Response
 from typing import List, Optional
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,8 +12,10 @@ load_dotenv()
 # Create router instead of FastAPI app
 router = APIRouter(prefix="/upload", tags=["upload"])
 
-# Initialize Dropbox
-dbx = dropbox.Dropbox(os.getenv("DROPBOX_TOKEN"))
+# Dropbox client, created on the first request that needs it
+@lru_cache(maxsize=1)
+def get_dropbox():
+    return dropbox.Dropbox(os.getenv("DROPBOX_TOKEN"))
 
 @router.get("/")
 async def read_root():
@@ -21,7 +24,7 @@ async def read_root():
 @router.get("/dropbox")
 async def get_image_folder():
     try:
-        for entry in dbx.files_list_folder('').entries:
+        for entry in get_dropbox().files_list_folder('').entries:
             return entry.name
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dropbox error: {str(e)}")
@@ -39,7 +42,7 @@ async def upload_animal_picture(file: UploadFile = File(...)):
         dropbox_path = f"/animals/{file.filename}"
 
         # Upload file
-        dbx.files_upload(
+        get_dropbox().files_upload(
             file_content,
             dropbox_path,
             mode=dropbox.files.WriteMode("overwrite")
@@ -66,7 +69,7 @@ async def get_animal_picture(filename: str):
         dropbox_path = f"/animals/{filename}"
         
         # Download the file directly (includes metadata)
-        metadata, response = dbx.files_download(dropbox_path)
+        metadata, response = get_dropbox().files_download(dropbox_path)
         
         # Get file content
         file_content = response.content
@@ -115,7 +118,7 @@ async def list_animal_pictures():
     List all animal pictures in Dropbox
     """
     try:
-        result = dbx.files_list_folder("/animals")
+        result = get_dropbox().files_list_folder("/animals")
         images = []
         
         for entry in result.entries:
@@ -142,7 +145,7 @@ async def delete_animal_picture(filename: str):
     """
     try:
         dropbox_path = f"/animals/{filename}"
-        dbx.files_delete_v2(dropbox_path)
+        get_dropbox().files_delete_v2(dropbox_path)
         
         return {
             "message": "File deleted successfully",
@@ -178,7 +181,7 @@ async def upload_scanned_species_picture(file: UploadFile = File(...)):
         dropbox_path = f"/scanned-species/{unique_filename}"
 
         # Upload file to Dropbox
-        dbx.files_upload(
+        get_dropbox().files_upload(
             file_content,
             dropbox_path,
             mode=dropbox.files.WriteMode("overwrite")
@@ -186,7 +189,7 @@ async def upload_scanned_species_picture(file: UploadFile = File(...)):
 
         # Create shared link
         try:
-            shared_link_metadata = dbx.sharing_create_shared_link_with_settings(dropbox_path)
+            shared_link_metadata = get_dropbox().sharing_create_shared_link_with_settings(dropbox_path)
             image_url = shared_link_metadata.url
             
             # Convert to direct download link
@@ -200,7 +203,7 @@ async def upload_scanned_species_picture(file: UploadFile = File(...)):
         except dropbox.exceptions.ApiError as e:
             # If shared link already exists, get existing link
             if e.error.is_shared_link_already_exists():
-                shared_links = dbx.sharing_list_shared_links(dropbox_path)
+                shared_links = get_dropbox().sharing_list_shared_links(dropbox_path)
                 if shared_links.links:
                     image_url = shared_links.links[0].url
                     if "?dl=0" in image_url:
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from fastapi.responses import Response, RedirectResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_  
-from database import get_db
-from models.user import User, UserUpdate, PasswordChange, UserResponse, DeleteAccountResponse
-from routes.auth import verify_password, hash_password, get_current_user 
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from database import get_db, get_async_db
+from models.user import User, UserUpdate, PasswordChange, UserResponse, UserBatchResponse, DeleteAccountResponse
+from routes.auth import verify_password, hash_password, get_current_user, get_current_user_async
+from principals import Principal
+from batch import batch_ids, split_found
+from leaderboard import (
+    top_players, player_rank, top_players_in_window, player_window_rank, window_start, friends_leaderboard
+)
+from pagination import page_size
+from search import search_users as search_user_index
 import os
-from datetime import datetime
-from google.cloud import storage
-from google.oauth2 import service_account
+from typing import List, Optional
+from datetime import date, datetime
 import logging
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["users"])
@@ -40,6 +47,21 @@ async def get_user_profile(user_id: str, db: Session = Depends(get_db)):
         is_active=user.is_active
     )
 
+@router.get("/profiles/batch", response_model=UserBatchResponse)
+async def get_user_profiles_batch(
+    ids: List[str] = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
+):
+    """
+    Several user profiles in one request and one query, keyed by user id
+    Pass ids repeated or comma-separated (up to 100); unknown ids are listed in missing
+    """
+    requested = batch_ids(ids)
+    users = (await db.execute(select(User).where(User.id.in_(requested)))).scalars().all()
+    data, missing = split_found(requested, {user.id: user for user in users})
+    return {"data": data, "missing": missing}
+
 @router.put("/profile/{user_id}", response_model=UserResponse)
 async def update_user_profile(user_id: str, user_update: UserUpdate, db: Session = Depends(get_db)):
     user = find_user_by_id(db, user_id)
@@ -116,15 +138,12 @@ async def get_all_users(db: Session = Depends(get_db)):
 @router.get("/search/", response_model=list[UserResponse])
 async def search_users(
     search: str,
+    limit: int = 20,
+    offset: int = 0,
     db: Session = Depends(get_db)
 ):
-    users = db.query(User).filter(
-        or_(
-            User.first_name.ilike(f"%{search}%"),
-            User.last_name.ilike(f"%{search}%"),
-            User.email.ilike(f"%{search}%")
-        )
-    ).all()
+    # Ranked by name/email match quality, see search.py
+    users = search_user_index(db, search, limit=limit, offset=offset)
 
     if not users:
         raise HTTPException(
@@ -134,50 +153,66 @@ async def search_users(
 
     return users
 
-@router.get("/rankings")
-def get_user_rankings(db: Session = Depends(get_db)):
-    users = (
-        db.query(User)
-        .order_by(User.points.desc(), User.created_at.asc())
-        .all()
-    )
+LEADERBOARD_PAGE_SIZE = 100
+LEADERBOARD_PERIOD = Query(None, pattern="^(week|month)$", description="week or month; lifetime when omitted")
+LEADERBOARD_WINDOW = Query(None, description="Any day in the window to show; the current one when omitted")
 
-    results = []
-    rank = 1
-    for u in users:
-        results.append({
-            "rank": rank,
-            "id": u.id,
-            "first_name": u.first_name,
-            "last_name": u.last_name,
-            "points": u.points,
-            "currency": u.currency,
-        })
-        rank += 1
+@router.get("/rankings")
+async def get_user_rankings(
+    response: Response,
+    limit: int = LEADERBOARD_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    period: Optional[str] = LEADERBOARD_PERIOD,
+    period_start: Optional[date] = LEADERBOARD_WINDOW,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Leaderboard by points, best first. Lifetime points (ties to the earliest
+    member) by default; with period=week|month the points earned in that
+    window (ties to whoever got there first).
+    Returns up to limit players (default 100); the X-Next-Cursor response
+    header is sent back as cursor for the following page.
+    """
+    if period:
+        players, next_cursor = await top_players_in_window(
+            db, period, window_start(period, period_start), page_size(limit), cursor
+        )
+    else:
+        players, next_cursor = await top_players(db, page_size(limit), cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return players
 
-    return results
+@router.get("/rankings/friends/{user_id}")
+async def get_friend_rankings(
+    user_id: str,
+    period: Optional[str] = LEADERBOARD_PERIOD,
+    period_start: Optional[date] = LEADERBOARD_WINDOW,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    The user ranked among their accepted friends, best first - lifetime
+    points by default, or the points earned in a week/month window
+    """
+    board = await friends_leaderboard(db, user_id, period, window_start(period, period_start) if period else None)
 
-@router.get("/rankings/{user_id}")
-def get_user_rank(db: Session = Depends(get_db), user_id: str = None):
-    users = (
-        db.query(User)
-        .order_by(User.currency.desc(), User.created_at.asc())
-        .all()
-    )
+    if board is None:
+        raise HTTPException(status_code=404, detail="User not found in rankings")
 
-    ranked_users = []
-    rank = 1
-    for u in users:
-        ranked_users.append({
-            "rank": rank,
-            "id": u.id,
-            "first_name": u.first_name,
-            "last_name": u.last_name,
-            "currency": u.currency,
-        })
-        rank += 1
+    return board
 
-    user_rank = next((u for u in ranked_users if str(u["id"]) == str(user_id)), None)
+@router.get("/rankings/{user_id}")
+async def get_user_rank(
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = None,
+    period: Optional[str] = LEADERBOARD_PERIOD,
+    period_start: Optional[date] = LEADERBOARD_WINDOW
+):
+    """A user's place on the points leaderboard - rank is null for a window they scored nothing in"""
+    if period:
+        user_rank = await player_window_rank(db, user_id, period, window_start(period, period_start))
+    else:
+        user_rank = await player_rank(db, user_id)
 
     if not user_rank:
         raise HTTPException(status_code=404, detail="User not found in rankings")
@@ -189,7 +224,7 @@ async def upload_profile_picture(
     user_id: str,
     image: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Upload profile picture to GCP Bucket and save filename to user record"""
     try:
@@ -283,6 +318,8 @@ async def upload_profile_image_to_gcp(image_data: bytes, filename: str, user_id:
             raise Exception(f"Missing GCP environment variables: {', '.join(missing_vars)}")
         
         # Initialize GCP Storage client
+        from google.cloud import storage
+        from google.oauth2 import service_account
         credentials = service_account.Credentials.from_service_account_info(credentials_info)
         storage_client = storage.Client(credentials=credentials, project=credentials_info["project_id"])
         
@@ -339,6 +376,8 @@ async def get_profile_picture(filename: str):
         bucket_name = os.getenv("GCP_BUCKET_NAME")
         
         # Initialize GCP client
+        from google.cloud import storage
+        from google.oauth2 import service_account
         credentials = service_account.Credentials.from_service_account_info(credentials_info)
         storage_client = storage.Client(credentials=credentials, project=credentials_info["project_id"])
         
@@ -388,7 +427,7 @@ async def get_profile_picture(filename: str):
 async def delete_profile_picture(
     user_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Delete user's profile picture from GCP and database"""
     try:
@@ -438,6 +477,8 @@ async def delete_profile_image_from_gcp(filename: str):
         
         bucket_name = os.getenv("GCP_BUCKET_NAME")
         
+        from google.cloud import storage
+        from google.oauth2 import service_account
         credentials = service_account.Credentials.from_service_account_info(credentials_info)
         storage_client = storage.Client(credentials=credentials, project=credentials_info["project_id"])
         
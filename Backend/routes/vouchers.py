@@ -1,11 +1,15 @@
 # routes/vouchers.py
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Voucher, UserVoucher, PointsTransaction, User
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Voucher, UserVoucher, User
 from models.vouchers import VoucherCreate, VoucherResponse
 from models.user_vouchers import UserVoucherCreate, UserVoucherResponse, UserVoucherWithDetailsResponse
-from routes.auth import get_current_user
+from routes.auth import get_current_user_async, get_current_user_record_async
+from principals import Principal
+from ledger import apply_balance_change_async
 import uuid
 from datetime import datetime, date
 
@@ -14,26 +18,30 @@ router = APIRouter(prefix="/api/vouchers", tags=["vouchers"])
 # Get all available vouchers
 @router.get("/available", response_model=list[VoucherResponse])
 async def get_available_vouchers(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     # Add debug prints
     today = date.today()
     print(f"🔍 DEBUG - Today's date: {today}")
-    print(f"🔍 DEBUG - Current user: {current_user.email}")
+    print(f"🔍 DEBUG - Current user: {current_user.id}")
     
     # Get all vouchers first to see what's in the database
-    all_vouchers = db.query(Voucher).filter(Voucher.is_active == True).all()
+    result = await db.execute(select(Voucher).where(Voucher.is_active == True))
+    all_vouchers = result.scalars().all()
     print(f"🔍 DEBUG - Total active vouchers: {len(all_vouchers)}")
     
     for voucher in all_vouchers:
         print(f"🔍 DEBUG - Voucher: {voucher.title}, Expiry: {voucher.expiry_date}, Active: {voucher.is_active}")
     
     # Then get filtered vouchers
-    vouchers = db.query(Voucher).filter(
-        Voucher.is_active == True,
-        Voucher.expiry_date > today
-    ).order_by(Voucher.points_required.asc()).all()  # Keep points_required column name
+    result = await db.execute(
+        select(Voucher).where(
+            Voucher.is_active == True,
+            Voucher.expiry_date > today
+        ).order_by(Voucher.points_required.asc())  # Keep points_required column name
+    )
+    vouchers = result.scalars().all()
     
     print(f"🔍 DEBUG - Available vouchers after filter: {len(vouchers)}")
     
@@ -42,14 +50,21 @@ async def get_available_vouchers(
 # Get user's redeemed vouchers - UPDATED: Use join to get voucher details
 @router.get("/my-vouchers", response_model=list[UserVoucherWithDetailsResponse])
 async def get_my_vouchers(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    user_vouchers = db.query(UserVoucher).filter(
-        UserVoucher.user_id == current_user.id,
-        UserVoucher.expires_at > date.today(),
-        UserVoucher.is_used == False
-    ).order_by(UserVoucher.redeemed_at.desc()).all()
+    # Load the voucher of each row in the same query (no per-row lazy load)
+    query_result = await db.execute(
+        select(UserVoucher)
+        .options(joinedload(UserVoucher.voucher))
+        .where(
+            UserVoucher.user_id == current_user.id,
+            UserVoucher.expires_at > date.today(),
+            UserVoucher.is_used == False
+        )
+        .order_by(UserVoucher.redeemed_at.desc())
+    )
+    user_vouchers = query_result.scalars().all()
     
     # Manually populate voucher details to avoid circular imports
     result = []
@@ -75,8 +90,8 @@ async def get_my_vouchers(
 @router.post("/redeem")
 async def redeem_voucher(
     voucher_data: UserVoucherCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_record_async)
 ):
     # Start a transaction
     try:
@@ -85,11 +100,14 @@ async def redeem_voucher(
             raise HTTPException(status_code=400, detail="You don't have any currency to redeem")
         
         # Get the voucher
-        voucher = db.query(Voucher).filter(
-            Voucher.id == voucher_data.voucher_id,
-            Voucher.is_active == True,
-            Voucher.expiry_date > date.today()
-        ).first()
+        result = await db.execute(
+            select(Voucher).where(
+                Voucher.id == voucher_data.voucher_id,
+                Voucher.is_active == True,
+                Voucher.expiry_date > date.today()
+            )
+        )
+        voucher = result.scalars().first()
         
         if not voucher:
             raise HTTPException(status_code=404, detail="Voucher not found or expired")
@@ -106,55 +124,56 @@ async def redeem_voucher(
         
         # Create user voucher
         user_voucher = UserVoucher(
+            id=str(uuid.uuid4()),  # assigned now so the ledger entry can reference it
             user_id=current_user.id,
             voucher_id=voucher.id,
             redemption_code=redemption_code,
             expires_at=voucher.expiry_date
         )
         
-        # Deduct currency from user
-        current_user.currency -= voucher.points_required  # Keep points_required column name
-        
-        # Create currency transaction record (using PointsTransaction model)
-        currency_transaction = PointsTransaction(
-            user_id=current_user.id,
+        # Deduct currency from user with a ledger entry - refused atomically if
+        # a concurrent redemption already spent it
+        balance = await apply_balance_change_async(
+            db, current_user,
             transaction_type="redeem",
-            points=-voucher.points_required,  # Keep points field name
             description=f"Redeemed: {voucher.title}",
-            reference_id=user_voucher.id
+            currency=-voucher.points_required,  # Keep points_required column name
+            reference_id=user_voucher.id,
+            require_funds=True
         )
         
         # Save all changes
         db.add(user_voucher)
-        db.add(currency_transaction)
-        db.commit()
-        db.refresh(user_voucher)
+        await db.commit()
         
         return {
             "success": True,
             "message": f"Successfully redeemed {voucher.title}!",
             "redemption_code": redemption_code,
-            "new_currency": current_user.currency
+            "new_currency": balance["currency"]
         }
         
     except HTTPException:
-        db.rollback()
+        await db.rollback()
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to redeem voucher: {str(e)}")
 
 # Mark voucher as used
 @router.post("/use/{redemption_code}")
 async def use_voucher(
     redemption_code: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    user_voucher = db.query(UserVoucher).filter(
-        UserVoucher.redemption_code == redemption_code,
-        UserVoucher.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(UserVoucher).where(
+            UserVoucher.redemption_code == redemption_code,
+            UserVoucher.user_id == current_user.id
+        )
+    )
+    user_voucher = result.scalars().first()
     
     if not user_voucher:
         raise HTTPException(status_code=404, detail="Voucher not found")
@@ -167,14 +186,14 @@ async def use_voucher(
     
     user_voucher.is_used = True
     user_voucher.used_at = datetime.now()
-    db.commit()
+    await db.commit()
     
     return {"success": True, "message": "Voucher marked as used"}
 
 # Get user currency
 @router.get("/currency")
 async def get_user_currency(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_record_async)
 ):
     return {"currency": current_user.currency}
 
@@ -182,21 +201,22 @@ async def get_user_currency(
 @router.post("/", response_model=VoucherResponse)
 async def create_voucher(
     voucher_data: VoucherCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
     # In a real app, you'd check if user is admin
     voucher = Voucher(**voucher_data.dict())
     db.add(voucher)
-    db.commit()
-    db.refresh(voucher)
+    await db.commit()
+    await db.refresh(voucher)
     return voucher
 
 # Admin: Get all vouchers (including inactive)
 @router.get("/")
 async def get_all_vouchers(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async)
 ):
-    vouchers = db.query(Voucher).order_by(Voucher.created_at.desc()).all()
+    result = await db.execute(select(Voucher).order_by(Voucher.created_at.desc()))
+    vouchers = result.scalars().all()
     return vouchers
\ No newline at end of file
@@ -0,0 +1,77 @@
+# =============================================================================
+# FILE: scripts/benchmark_compression.py
+# DESCRIPTION: Payload bytes and time-to-last-byte on slow links, per encoding
+# =============================================================================
+#
+# Builds the species catalog and scan history bodies for synthetic rows and
+# compresses them the way CompressionMiddleware (per request) and
+# precompressed_response (cached) do. Time-to-last-byte is modelled as
+#   round trip + compression time + bytes / link bandwidth
+# for a few mobile link profiles; cached variants cost no compression time.
+#
+# Usage:
+#   python scripts/benchmark_compression.py --rows 1000
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compression
+from responses import FastJSONResponse, adapter_json
+from catalog import SPECIES_LIST_ADAPTER
+from routes.scanned_species import scan_history_item
+from benchmark_serialization import build_species, summary_rows, history_rows
+from relationships import setup_relationships
+
+# (name, bandwidth in kbit/s, round trip in ms)
+LINKS = [
+    ("2G/EDGE", 200, 600),
+    ("slow 3G", 400, 400),
+    ("3G", 1600, 150),
+]
+
+def encodings(body: bytes):
+    """(label, encoded bytes, compression ms) per encoding"""
+    variants = [("identity", body, 0.0)]
+    for encoding in compression.supported_encodings():
+        start = time.perf_counter()
+        encoded = compression.compress(body, encoding)
+        variants.append((f"{encoding} (per request)", encoded, (time.perf_counter() - start) * 1000))
+        level = (compression.PRECOMPRESSED_BROTLI_QUALITY if encoding == "br"
+                 else compression.PRECOMPRESSED_GZIP_LEVEL)
+        variants.append((f"{encoding} (cached)", compression.compress(body, encoding, level), 0.0))
+    return variants
+
+def main(args):
+    setup_relationships()
+    payloads = [
+        ("species catalog", adapter_json(
+            SPECIES_LIST_ADAPTER, summary_rows(build_species(args.rows)),
+            exclude={"__all__": {"api_response"}}
+        )),
+        ("scan history", FastJSONResponse({
+            "status": "success", "data": [scan_history_item(row) for row in history_rows(args.rows)]
+        }).body),
+    ]
+
+    if compression.brotli is None:
+        print("brotli is not installed - only gzip is measured")
+
+    for name, body in payloads:
+        print("\n" + "=" * 78)
+        print(f"{name} ({args.rows} rows)")
+        print(f"{'encoding':<22}{'KB':>8}{'ratio':>7}{'cpu ms':>8}" + "".join(f"{link:>11}" for link, _, _ in LINKS))
+        for label, encoded, cpu_ms in encodings(body):
+            ttlb = [rtt + cpu_ms + len(encoded) * 8 / kbps for _, kbps, rtt in LINKS]
+            print(f"{label:<22}{len(encoded) / 1024:8.0f}{len(body) / len(encoded):7.1f}{cpu_ms:8.1f}"
+                  + "".join(f"{ms / 1000:10.2f}s" for ms in ttlb))
+    print("=" * 78)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response compression on slow links")
+    parser.add_argument("--rows", type=int, default=1000)
+    main(parser.parse_args())
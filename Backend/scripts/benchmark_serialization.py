@@ -0,0 +1,156 @@
+# =============================================================================
+# FILE: scripts/benchmark_serialization.py
+# DESCRIPTION: Response serialization time per 1k rows, before vs after
+# =============================================================================
+#
+# Serializes synthetic rows the way each hot endpoint used to and the way it
+# does now. No database is involved, so only serialization is measured:
+#   - species catalog: FastAPI's response_model path over ORM objects (with the
+#     api_response blob) vs the precompiled adapter over summary columns
+#   - classes with species: from_orm + jsonable_encoder + json.dumps vs adapter
+#   - scan history: Dict[str, Any] response_model (with the raw_data copy)
+#     vs FastJSONResponse
+#
+# Usage:
+#   python scripts/benchmark_serialization.py --rows 1000 --repeat 20
+
+import sys
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from relationships import setup_relationships
+from models.animal_class import AnimalClass, AnimalClassResponse
+from models.species import Species, SpeciesResponse
+from responses import FastJSONResponse, orjson
+from catalog import SPECIES_LIST_ADAPTER, CLASSES_WITH_SPECIES_ADAPTER
+from routes.scanned_species import scan_history_item
+
+SPECIES_SUMMARY_COLUMNS = [column for column in Species.__table__.c if column.name != "api_response"]
+
+class Row:
+    """Stand-in for a SQLAlchemy Row of selected columns"""
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+def build_species(count: int) -> List[Species]:
+    now = datetime.now(timezone.utc)
+    return [
+        Species(
+            id=f"species-{n}", animal_class_id=f"class-{n % 10}",
+            common_name=f"Species {n}", scientific_name=f"Genus species{n}",
+            description="Lives in lowland dipterocarp forest. " * 12,
+            habitat="Primary and secondary forest. " * 6,
+            threats="Habitat loss and poaching. " * 6,
+            conservation="Protected under the Wildlife Conservation Act. " * 4,
+            endangered_status="Vulnerable",
+            api_response={"raw": "Model output " * 120, "confidence": 0.93, "tags": ["a", "b"]},
+            created_at=now
+        )
+        for n in range(count)
+    ]
+
+def summary_rows(species: List[Species]) -> List[Row]:
+    names = [column.name for column in SPECIES_SUMMARY_COLUMNS]
+    return [Row(**{name: getattr(item, name) for name in names}) for item in species]
+
+def history_rows(count: int) -> List[Row]:
+    now = datetime.now(timezone.utc)
+    return [
+        Row(id=f"scan-{n}", user_id="user-1", species_id=f"species-{n}", location="Taman Negara, Pahang",
+            image_url=f"scan_{n}.jpg", verified=n % 3 == 0, date_spotted=now,
+            common_name=f"Species {n}", scientific_name=f"Genus species{n}", endangered_status="Vulnerable")
+        for n in range(count)
+    ]
+
+def timed(function, repeat: int):
+    body = function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000, len(body)
+
+def main(args):
+    setup_relationships()
+    scale = 1000 / args.rows
+    species = build_species(args.rows)
+    summaries = summary_rows(species)
+    classes = [AnimalClass(id=f"class-{n}", class_name=f"Class {n}", created_at=species[0].created_at)
+               for n in range(10)]
+    history = history_rows(args.rows)
+
+    # What FastAPI does for a response_model route: validate, then dump to JSON bytes
+    fastapi_species = TypeAdapter(List[SpeciesResponse])
+    fastapi_dict = TypeAdapter(Dict[str, Any])
+
+    def species_before():
+        return fastapi_species.dump_json(fastapi_species.validate_python(species, from_attributes=True))
+
+    def species_after():
+        return SPECIES_LIST_ADAPTER.dump_json(
+            SPECIES_LIST_ADAPTER.validate_python(summaries, from_attributes=True),
+            exclude={"__all__": {"api_response"}}
+        )
+
+    def classes_before():
+        result = []
+        for animal_class in classes:
+            species_list = [item for item in species if item.animal_class_id == animal_class.id]
+            result.append({
+                "animal_class": AnimalClassResponse.model_validate(animal_class),
+                "species": [SpeciesResponse.model_validate(item) for item in species_list],
+                "species_count": len(species_list)
+            })
+        return json.dumps(jsonable_encoder(result)).encode()
+
+    def classes_after():
+        by_class = {}
+        for row in summaries:
+            by_class.setdefault(row.animal_class_id, []).append(row)
+        result = [{"animal_class": animal_class, "species": by_class.get(animal_class.id, []),
+                   "species_count": len(by_class.get(animal_class.id, []))} for animal_class in classes]
+        return CLASSES_WITH_SPECIES_ADAPTER.dump_json(
+            CLASSES_WITH_SPECIES_ADAPTER.validate_python(result, from_attributes=True),
+            exclude={"__all__": {"species": {"__all__": {"api_response"}}}}
+        )
+
+    def history_before():
+        data = []
+        for row in history:
+            item = scan_history_item(row)
+            item["raw_data"] = {"location": row.location, "image_url": row.image_url, "verified": row.verified,
+                                "id": row.id, "user_id": row.user_id, "species_id": row.species_id,
+                                "date_spotted": row.date_spotted}
+            data.append(item)
+        return fastapi_dict.dump_json(fastapi_dict.validate_python({"status": "success", "data": data}))
+
+    def history_after():
+        data = [scan_history_item(row) for row in history]
+        return FastJSONResponse({"status": "success", "data": data}).body
+
+    print("\n" + "=" * 72)
+    print(f"Rows: {args.rows}  Repeat: {args.repeat}  orjson: {'yes' if orjson else 'no (json fallback)'}")
+    print(f"{'endpoint':<24}{'before ms/1k':>14}{'after ms/1k':>13}{'before KB':>11}{'after KB':>10}")
+    for name, before, after in [
+        ("species catalog", species_before, species_after),
+        ("classes with species", classes_before, classes_after),
+        ("scan history", history_before, history_after),
+    ]:
+        before_ms, before_bytes = timed(before, args.repeat)
+        after_ms, after_bytes = timed(after, args.repeat)
+        print(f"{name:<24}{before_ms * scale:14.2f}{after_ms * scale:13.2f}"
+              f"{before_bytes / 1024:11.0f}{after_bytes / 1024:10.0f}")
+    print("=" * 72)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response serialization per 1k rows")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,111 @@
+# =============================================================================
+# FILE: scripts/benchmark_suggestions.py
+# DESCRIPTION: Per-request latency of friend suggestions on a synthetic social graph
+# =============================================================================
+#
+# Fills a SocialIndex in memory (no database) with --users users, a skewed
+# friend graph (most users have a few dozen friends, a few have hundreds) and
+# Zipf-distributed sightings over --species species, then times suggest() for
+# random users. The ranking of a sample is checked against a brute-force
+# computation of the same scores.
+#
+# Usage:
+#   python scripts/benchmark_suggestions.py --users 100000 --requests 2000
+
+import sys
+import os
+import time
+import random
+import argparse
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggestions import SocialIndex, SUGGESTION_SPECIES_MAX_USERS
+
+def synthetic_graph(users: int, species: int, seed: int):
+    rng = random.Random(seed)
+    ids = [f"user-{n}" for n in range(users)]
+    friendships = {}
+    for n, user_id in enumerate(ids):
+        degree = rng.choice((5, 10, 20, 40, 40, 60, 300))
+        for _ in range(degree // 2):
+            other = ids[rng.randrange(users)]
+            if other != user_id and (other, user_id) not in friendships:
+                friendships[(user_id, other)] = rng.choice(("accepted", "accepted", "accepted", "pending", "rejected"))
+
+    # Zipf-like: a handful of species seen by everyone, a long tail of rare ones
+    weights = [1 / (rank + 1) for rank in range(species)]
+    sightings = Counter()
+    for user_id in ids:
+        for species_id in rng.choices(range(species), weights=weights, k=rng.randint(1, 40)):
+            sightings[(user_id, f"species-{species_id}")] += 1
+
+    return (
+        ids,
+        [(a, b, status) for (a, b), status in friendships.items()],
+        [(user_id, species_id, count) for (user_id, species_id), count in sightings.items()]
+    )
+
+def brute_force(friendships, sightings, user_id: str, limit: int):
+    """The same scores computed the slow way, for checking the index"""
+    friends, linked, species = {}, {}, {}
+    for a, b, status in friendships:
+        linked.setdefault(a, set()).add(b)
+        linked.setdefault(b, set()).add(a)
+        if status == "accepted":
+            friends.setdefault(a, set()).add(b)
+            friends.setdefault(b, set()).add(a)
+    for owner, species_id, _ in sightings:
+        species.setdefault(owner, set()).add(species_id)
+    popularity = Counter(species_id for _, species_id, _ in sightings)
+
+    mine = species.get(user_id, set())
+    ranked = []
+    for candidate in set(species) | set(friends):
+        if candidate == user_id or candidate in linked.get(user_id, set()):
+            continue
+        mutual = len(friends.get(user_id, set()) & friends.get(candidate, set()))
+        common = mine & species.get(candidate, set())
+        overlap = len(common) if mutual else sum(popularity[s] <= SUGGESTION_SPECIES_MAX_USERS for s in common)
+        if mutual or overlap:
+            ranked.append((-mutual, -overlap, candidate))
+    ranked.sort()
+    return [(candidate, -mutual, -overlap) for mutual, overlap, candidate in ranked[:limit]]
+
+def main(args):
+    started = time.perf_counter()
+    ids, friendships, sightings = synthetic_graph(args.users, args.species, args.seed)
+    index = SocialIndex()
+    index.load(friendships, sightings)
+    print(f"{args.users} users, {len(friendships)} friendships, {len(sightings)} user species "
+          f"(built in {time.perf_counter() - started:.1f}s)")
+
+    rng = random.Random(args.seed + 1)
+    timings = []
+    for _ in range(args.requests):
+        user_id = ids[rng.randrange(len(ids))]
+        start = time.perf_counter()
+        index.suggest(user_id, args.limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]
+    print(f"suggest(): p50 {pick(0.5):.2f} ms, p95 {pick(0.95):.2f} ms, p99 {pick(0.99):.2f} ms, "
+          f"max {timings[-1]:.2f} ms")
+
+    mismatches = 0
+    for user_id in rng.sample(ids, args.check):
+        mismatches += index.suggest(user_id, args.limit) != brute_force(friendships, sightings, user_id, args.limit)
+    print(f"ranking check: {args.check - mismatches} of {args.check} users match the brute-force ranking")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark friend suggestions")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--species", type=int, default=3_000)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--check", type=int, default=3, help="users checked against brute force")
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
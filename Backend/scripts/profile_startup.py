@@ -0,0 +1,113 @@
+# =============================================================================
+# FILE: scripts/profile_startup.py
+# DESCRIPTION: Cold-start profile - import-time report and startup benchmark
+# =============================================================================
+#
+# Every measurement runs in a fresh interpreter, like a new Cloud Run instance:
+#   - import:        `import main` wall time
+#   - first request: import + app startup (lifespan, i.e. migrations) + GET /health
+# plus a `python -X importtime` breakdown of the slowest top-level imports.
+# Exits non-zero when a median exceeds its target.
+#
+# Usage:
+#   DATABASE_URL=sqlite:////tmp/semai.db python scripts/profile_startup.py --runs 5
+#
+# Targets and the last recorded numbers are in scripts/STARTUP_PROFILE.md.
+
+import sys
+import os
+import re
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median targets in milliseconds
+TARGET_IMPORT_MS = 1000
+TARGET_FIRST_REQUEST_MS = 1500
+
+# Modules that must not be imported by `import main` - each is loaded on first use
+LAZY_MODULES = [
+    "google.generativeai",
+    "langchain_google_genai",
+    "langchain_core",
+    "dropbox",
+    "google.cloud.storage",
+    "google.cloud.sql.connector",
+    "pillow_heif",
+]
+
+def run_python(code: str, extra_args=None) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "profile-startup")
+    return subprocess.run(
+        [sys.executable, "-W", "ignore", *(extra_args or []), "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+def measure_startup() -> dict:
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "imported = time.perf_counter()\n"
+        f"loaded = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+        "from fastapi.testclient import TestClient\n"
+        "with TestClient(main.app) as client:\n"
+        "    client.get('/health')\n"
+        "served = time.perf_counter()\n"
+        "print('STARTUP ' + json.dumps({'import_ms': (imported - start) * 1000,"
+        " 'first_request_ms': (served - start) * 1000, 'eager_modules': loaded}))\n"
+    )
+    output = run_python(code).stdout
+    line = next(l for l in output.splitlines() if l.startswith("STARTUP "))
+    return json.loads(line[len("STARTUP "):])
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_report(limit: int):
+    """Slowest modules by cumulative import time, from python -X importtime"""
+    stderr = run_python("import main", ["-X", "importtime"]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            depth = len(match.group(3)) // 2
+            rows.append((int(match.group(2)) / 1000, depth, match.group(4)))
+    # Depth 0-2 keeps the report readable: main, its imports, and theirs
+    rows = [row for row in rows if row[1] <= 2]
+    return sorted(rows, reverse=True)[:limit]
+
+def main(args) -> int:
+    print("Warming bytecode cache...")
+    measure_startup()
+
+    runs = [measure_startup() for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    first_request_ms = statistics.median(run["first_request_ms"] for run in runs)
+    eager = sorted({module for run in runs for module in run["eager_modules"]})
+
+    print("\n" + "=" * 60)
+    print(f"IMPORT-TIME REPORT (cumulative, top {args.top})")
+    print("=" * 60)
+    for cumulative_ms, depth, module in import_report(args.top):
+        print(f"{cumulative_ms:9.1f} ms  {'  ' * depth}{module}")
+
+    print("\n" + "=" * 60)
+    print(f"STARTUP BENCHMARK (median of {args.runs} fresh interpreters)")
+    print("=" * 60)
+    import_ok = import_ms <= TARGET_IMPORT_MS
+    request_ok = first_request_ms <= TARGET_FIRST_REQUEST_MS
+    print(f"{'✅' if import_ok else '❌'} import main:   {import_ms:7.0f} ms  (target {TARGET_IMPORT_MS} ms)")
+    print(f"{'✅' if request_ok else '❌'} first request: {first_request_ms:7.0f} ms  (target {TARGET_FIRST_REQUEST_MS} ms)")
+    print(f"{'✅' if not eager else '❌'} lazy SDKs loaded at import: {', '.join(eager) or 'none'}")
+
+    return 0 if import_ok and request_ok and not eager else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile API cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,366 @@
+# =============================================================================
+# FILE: search.py
+# DESCRIPTION: Ranked species and user search
+# =============================================================================
+#
+# Two interchangeable backends:
+#   - PostgreSQL with pg_trgm: ILIKE and the word-similarity "<%" operator,
+#     both served by the GIN indexes from migration 0004
+#   - Anywhere else (SQLite, PostgreSQL without the extension): an in-process
+#     n-gram inverted index, so lookups touch posting lists instead of scanning
+#
+# Both rank the same way: exact match, then prefix, then substring, then fuzzy
+# (word similarity above SEARCH_SIMILARITY_THRESHOLD), then by word similarity.
+# Word similarity (pg_trgm's word_similarity) compares the query with the best
+# matching part of a field, so 'pantera' finds 'Panthera tigris jacksoni'.
+
+import os
+import re
+import math
+import time
+import logging
+import threading
+import unicodedata
+from collections import defaultdict, Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select, or_, case, func, text, inspect, Boolean
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+
+from models.species import Species
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Same default as pg_trgm.word_similarity_threshold, so both backends agree
+SEARCH_SIMILARITY_THRESHOLD = float(os.environ.get("SEARCH_SIMILARITY_THRESHOLD", "0.6"))
+# The in-process index follows local writes as they commit; the periodic rebuild
+# picks up writes made by other instances and bulk deletes
+SEARCH_INDEX_TTL = float(os.environ.get("SEARCH_INDEX_TTL", "300"))
+SEARCH_MAX_LIMIT = 100
+
+# =============================================================================
+# TEXT NORMALIZATION
+# =============================================================================
+
+_WORD = re.compile(r"[^\W_]+")
+_WHITESPACE = re.compile(r"\s+")
+_LIKE_SPECIAL = re.compile(r"([\\%_])")
+
+def normalize(value: Optional[str]) -> str:
+    """Lowercase, strip accents and collapse whitespace"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WHITESPACE.sub(" ", stripped.lower()).strip()
+
+def trigrams(value: str) -> Set[str]:
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space"""
+    grams = set()
+    for word in _WORD.findall(value):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def word_similarity(query_grams: Set[str], field_grams: Set[str]) -> float:
+    """Share of the query's trigrams found in the field (pg_trgm word_similarity, approximately)"""
+    if not query_grams:
+        return 0.0
+    return len(query_grams & field_grams) / len(query_grams)
+
+def substrings(value: str) -> Set[str]:
+    """Every substring of length 1-3 - enough to answer any containment query"""
+    return {value[i:i + n] for n in (1, 2, 3) for i in range(len(value) - n + 1)}
+
+def escape_like(value: str) -> str:
+    return _LIKE_SPECIAL.sub(r"\\\1", value)
+
+# =============================================================================
+# SEARCH TARGETS
+# =============================================================================
+
+class SearchTarget:
+    """A model and the text columns it is searched by"""
+    def __init__(self, name: str, model, fields: List[str]):
+        self.name = name
+        self.model = model
+        self.fields = fields
+
+SPECIES = SearchTarget("species", Species, ["common_name", "scientific_name"])
+USERS = SearchTarget("users", User, ["first_name", "last_name", "email"])
+
+# =============================================================================
+# IN-PROCESS N-GRAM INDEX
+# =============================================================================
+
+class NgramIndex:
+    """
+    Inverted index over the target's fields. Trigram postings find fuzzy
+    candidates; 1-3 character substring postings find containment candidates.
+    """
+    def __init__(self, target: SearchTarget):
+        self.target = target
+        self.built_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._documents: Dict[str, Dict[str, Tuple[str, Set[str]]]] = {}
+        self._trigram_postings: Dict[str, Set[str]] = defaultdict(set)
+        self._substring_postings: Dict[str, Set[str]] = defaultdict(set)
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.built_at is not None and time.time() - self.built_at < SEARCH_INDEX_TTL
+
+    def rebuild(self, db: Session) -> None:
+        model = self.target.model
+        columns = [getattr(model, field) for field in self.target.fields]
+        rows = db.execute(select(model.id, *columns)).all()
+
+        with self._lock:
+            self._documents.clear()
+            self._trigram_postings.clear()
+            self._substring_postings.clear()
+            for row in rows:
+                self._add(row[0], dict(zip(self.target.fields, row[1:])))
+            self.built_at = time.time()
+
+        logger.info(f"Built {self.target.name} search index: {len(rows)} documents")
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.built_at = None
+
+    def upsert(self, doc_id: str, values: Dict[str, Optional[str]]) -> None:
+        with self._lock:
+            if self.built_at is None:
+                return
+            self._remove(doc_id)
+            self._add(doc_id, values)
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            if self.built_at is not None:
+                self._remove(doc_id)
+
+    def _add(self, doc_id: str, values: Dict[str, Optional[str]]) -> None:
+        fields = {}
+        for field, value in values.items():
+            normalized = normalize(value)
+            grams = trigrams(normalized)
+            fields[field] = (normalized, grams)
+            for gram in grams:
+                self._trigram_postings[gram].add(doc_id)
+            for sub in substrings(normalized):
+                self._substring_postings[sub].add(doc_id)
+        self._documents[doc_id] = fields
+
+    def _remove(self, doc_id: str) -> None:
+        fields = self._documents.pop(doc_id, None)
+        if not fields:
+            return
+        for normalized, grams in fields.values():
+            for gram in grams:
+                self._trigram_postings[gram].discard(doc_id)
+            for sub in substrings(normalized):
+                self._substring_postings[sub].discard(doc_id)
+
+    def _containment_candidates(self, query: str) -> Set[str]:
+        if len(query) <= 3:
+            return set(self._substring_postings.get(query, ()))
+        postings = sorted(
+            (self._substring_postings.get(query[i:i + 3], set()) for i in range(len(query) - 2)),
+            key=len
+        )
+        return set.intersection(*postings) if postings[0] else set()
+
+    def _fuzzy_candidates(self, query_grams: Set[str]) -> Set[str]:
+        # A document sharing fewer than threshold * |query| trigrams cannot reach the threshold
+        needed = max(1, math.ceil(SEARCH_SIMILARITY_THRESHOLD * len(query_grams)))
+        counts = Counter()
+        for gram in query_grams:
+            counts.update(self._trigram_postings.get(gram, ()))
+        return {doc_id for doc_id, shared in counts.items() if shared >= needed}
+
+    def search(self, query: str, fields: List[str], fuzzy: bool) -> List[str]:
+        """Ids of matching documents in rank order"""
+        query = normalize(query)
+        if not query:
+            return []
+        query_grams = trigrams(query)
+
+        with self._lock:
+            candidates = self._containment_candidates(query)
+            if fuzzy:
+                candidates |= self._fuzzy_candidates(query_grams)
+
+            ranked = []
+            for doc_id in candidates:
+                document = self._documents.get(doc_id)
+                if document is None:
+                    continue
+                values = [document[field] for field in fields]
+                tier = 3
+                for normalized, _ in values:
+                    if normalized == query:
+                        tier = 0
+                    elif normalized.startswith(query):
+                        tier = min(tier, 1)
+                    elif query in normalized:
+                        tier = min(tier, 2)
+                score = max(word_similarity(query_grams, grams) for _, grams in values)
+                if tier == 3 and (not fuzzy or score < SEARCH_SIMILARITY_THRESHOLD):
+                    continue
+                ranked.append((tier, -score, doc_id))
+
+        ranked.sort()
+        return [doc_id for _, _, doc_id in ranked]
+
+_indexes = {target.name: NgramIndex(target) for target in (SPECIES, USERS)}
+
+def invalidate_search_index(target: Optional[SearchTarget] = None) -> None:
+    """Force a rebuild on next use - call after bulk writes that bypass the ORM"""
+    for index in ([_indexes[target.name]] if target else _indexes.values()):
+        index.invalidate()
+
+# The index follows committed writes only: a flush records the changed
+# documents in session.info, a commit applies them and a rollback drops them.
+# Core writes, which the flush never sees, call record_search_changes.
+
+def record_search_changes(session: Session, target: SearchTarget,
+                          changes: Iterable[Tuple[str, Optional[Dict[str, Optional[str]]]]]) -> None:
+    """
+    Queue (doc_id, values) index updates for the session's next commit -
+    values None removes the document
+    """
+    session.info.setdefault("search_changes", []).extend(
+        (target.name, doc_id, values) for doc_id, values in changes
+    )
+
+def _values_of(target: SearchTarget, obj) -> Dict[str, Optional[str]]:
+    return {field: getattr(obj, field) for field in target.fields}
+
+@event.listens_for(Session, "after_flush")
+def _note_search_writes(session, flush_context):
+    for target in (SPECIES, USERS):
+        changes = [(obj.id, _values_of(target, obj)) for obj in session.new if isinstance(obj, target.model)]
+        # Most user updates are points/currency - only re-index when a searched field changed
+        changes.extend(
+            (obj.id, _values_of(target, obj)) for obj in session.dirty
+            if isinstance(obj, target.model)
+            and any(inspect(obj).attrs[field].history.has_changes() for field in target.fields)
+        )
+        changes.extend((obj.id, None) for obj in session.deleted if isinstance(obj, target.model))
+        if changes:
+            record_search_changes(session, target, changes)
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    for name, doc_id, values in session.info.pop("search_changes", ()):
+        if values is None:
+            _indexes[name].remove(doc_id)
+        else:
+            _indexes[name].upsert(doc_id, values)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("search_changes", None)
+
+# =============================================================================
+# POSTGRESQL TRIGRAM BACKEND
+# =============================================================================
+
+class word_similar(FunctionElement):
+    """
+    pg_trgm "query <% field" - word similarity above
+    pg_trgm.word_similarity_threshold, served by the GIN trigram index
+    """
+    type = Boolean()
+    inherit_cache = True
+
+@compiles(word_similar)
+def _compile_word_similar(element, compiler, **kw):
+    query, field = list(element.clauses)
+    # "format" paramstyle drivers (pg8000) need the percent sign escaped
+    operator = "<%%" if compiler.dialect.paramstyle in ("format", "pyformat") else "<%"
+    return f"({compiler.process(query, **kw)} {operator} {compiler.process(field, **kw)})"
+
+_pg_trgm_available: Dict[str, bool] = {}
+
+def pg_trgm_available(db: Session) -> bool:
+    """Whether the trigram backend can be used on this session's database (checked once)"""
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _pg_trgm_available:
+        available = False
+        if bind.dialect.name == "postgresql":
+            available = db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first() is not None
+        _pg_trgm_available[key] = available
+        logger.info(f"Search backend: {'pg_trgm' if available else 'in-process n-gram index'}")
+    return _pg_trgm_available[key]
+
+def _trigram_search(db: Session, target: SearchTarget, query: str, fields: List[str],
+                    fuzzy: bool, limit: int, offset: int) -> List[str]:
+    model = target.model
+    columns = [getattr(model, field) for field in fields]
+    escaped = escape_like(query)
+
+    exact = or_(*[func.lower(column) == query.lower() for column in columns])
+    prefix = or_(*[column.ilike(f"{escaped}%", escape="\\") for column in columns])
+    contains = or_(*[column.ilike(f"%{escaped}%", escape="\\") for column in columns])
+    score = func.greatest(*[func.word_similarity(query, column) for column in columns])
+
+    conditions = [contains]
+    if fuzzy:
+        conditions.extend(word_similar(query, column) for column in columns)
+
+    stmt = (
+        select(model.id)
+        .where(or_(*conditions))
+        .order_by(case((exact, 0), (prefix, 1), (contains, 2), else_=3), score.desc(), model.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return list(db.execute(stmt).scalars())
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+def search_ids(db: Session, target: SearchTarget, query: str, limit: int = 20, offset: int = 0,
+               fields: Optional[List[str]] = None, fuzzy: bool = True) -> List[str]:
+    """
+    Ranked ids of target rows matching query. fields restricts the searched
+    columns; fuzzy=False keeps only exact/prefix/substring matches.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+    fields = fields or target.fields
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+
+    if pg_trgm_available(db):
+        return _trigram_search(db, target, query, fields, fuzzy, limit, offset)
+
+    index = _indexes[target.name]
+    if not index.is_fresh:
+        index.rebuild(db)
+    return index.search(query, fields, fuzzy)[offset:offset + limit]
+
+def _load_in_order(db: Session, model, ids: List[str]) -> list:
+    """Fetch rows by id, keeping the ranking order (ids deleted meanwhile drop out)"""
+    if not ids:
+        return []
+    rows = {row.id: row for row in db.execute(select(model).where(model.id.in_(ids))).scalars()}
+    return [rows[doc_id] for doc_id in ids if doc_id in rows]
+
+def search_species(db: Session, query: str, limit: int = 20, offset: int = 0,
+                   fields: Optional[List[str]] = None, fuzzy: bool = True) -> List[Species]:
+    return _load_in_order(db, Species, search_ids(db, SPECIES, query, limit, offset, fields, fuzzy))
+
+def search_users(db: Session, query: str, limit: int = 20, offset: int = 0) -> List[User]:
+    return _load_in_order(db, User, search_ids(db, USERS, query, limit, offset))
@@ -0,0 +1,134 @@
+# =============================================================================
+# FILE: slow_query_log.py
+# DESCRIPTION: Sampled slow-query recorder with EXPLAIN capture
+# =============================================================================
+
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are candidates for the log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "250"))
+# Fraction of slow statements that actually get recorded (0.0 - 1.0)
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+# How many recorded statements are kept in memory
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get("SLOW_QUERY_BUFFER_SIZE", "200"))
+# EXPLAIN (ANALYZE, BUFFERS) re-runs the query, so each statement shape is
+# explained at most once per interval
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL", "600"))
+
+_slow_queries = deque(maxlen=SLOW_QUERY_BUFFER_SIZE)
+_plans: Dict[str, Dict[str, Any]] = {}
+_plans_lock = threading.Lock()
+
+# Placeholders of every paramstyle in use (pg8000 %s, asyncpg $1, sqlite ?, :name)
+_PLACEHOLDER = re.compile(r"%s|\$\d+|\?|(?<!:):\w+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so executions that differ only in values
+    (including IN lists of different length) share one shape
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _VALUE_LIST.sub("(...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+def parameters_fingerprint(parameters) -> Optional[str]:
+    """Short stable hash of the bound values - groups repeats without storing the values"""
+    if not parameters:
+        return None
+    return hashlib.sha1(repr(parameters).encode()).hexdigest()[:12]
+
+def _explain(conn, statement: str, parameters) -> str:
+    """
+    Run EXPLAIN (ANALYZE, BUFFERS) on a separate cursor of the same connection.
+    The savepoint keeps a failing EXPLAIN from aborting the caller's transaction.
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"EXPLAIN failed: {str(e)}"
+    finally:
+        cursor.close()
+
+def _plan_for(conn, shape: str, statement: str, parameters) -> Optional[str]:
+    """Cached plan for a statement shape, captured again once the interval has passed"""
+    if not SLOW_QUERY_EXPLAIN or conn.dialect.name != "postgresql":
+        return None
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+
+    now = time.time()
+    with _plans_lock:
+        cached = _plans.get(shape)
+        if cached and now - cached["captured_at"] < SLOW_QUERY_EXPLAIN_INTERVAL:
+            return cached["plan"]
+        # Reserve the slot so concurrent offenders don't all EXPLAIN at once
+        _plans[shape] = {"plan": cached["plan"] if cached else None, "captured_at": now}
+
+    plan = _explain(conn, statement, parameters)
+    with _plans_lock:
+        _plans[shape] = {"plan": plan, "captured_at": now}
+    return plan
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - conn.info["slow_query_start_time"].pop()) * 1000
+
+    if duration_ms < SLOW_QUERY_MS or random.random() >= SLOW_QUERY_SAMPLE_RATE:
+        return
+
+    try:
+        shape = statement_shape(statement)
+        plan = None if executemany else _plan_for(conn, shape, statement, parameters)
+
+        _slow_queries.append({
+            "statement": shape,
+            "parameters_fingerprint": parameters_fingerprint(parameters),
+            "duration_ms": round(duration_ms, 2),
+            "executemany": executemany,
+            "plan": plan,
+            "recorded_at": datetime.now().isoformat()
+        })
+        logger.warning(f"🐢 Slow query ({duration_ms:.1f}ms): {shape[:200]}")
+    except Exception as e:
+        # Never let diagnostics break the request that triggered them
+        logger.error(f"Failed to record slow query: {str(e)}")
+
+def get_slow_queries(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Recorded slow queries, most recent first"""
+    entries = list(reversed(_slow_queries))
+    return entries[:limit] if limit else entries
+
+def clear_slow_queries() -> None:
+    _slow_queries.clear()
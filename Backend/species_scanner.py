@@ -1,7 +1,8 @@
 # species_scanner.py - FIXED VERSION
 import os
+import threading
+import importlib.util
 from dotenv import load_dotenv
-import google.generativeai as genai
 import base64
 import logging
 from PIL import Image, UnidentifiedImageError
@@ -11,15 +12,22 @@ from datetime import datetime
 import uuid
 from typing import Dict, Any  # ADD THIS IMPORT
 
-# Try to import HEIC support
-try:
-    import pillow_heif
-    pillow_heif.register_heif_opener()
-    HEIC_SUPPORT = True
-except ImportError:
-    HEIC_SUPPORT = False
+# HEIC support is detected without importing pillow_heif - the import and
+# opener registration happen on the first image that needs them
+HEIC_SUPPORT = importlib.util.find_spec("pillow_heif") is not None
+if not HEIC_SUPPORT:
     print("HEIC support not available. Install pillow-heif for HEIC file support.")
 
+pillow_heif = None
+
+def ensure_heif_support():
+    """Import pillow_heif and register its PIL opener once"""
+    global pillow_heif
+    if HEIC_SUPPORT and pillow_heif is None:
+        import pillow_heif as heif_module
+        heif_module.register_heif_opener()
+        pillow_heif = heif_module
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,26 +35,36 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-def configure_genai():
-    """Configure Google Generative AI with error handling"""
-    try:
-        if not GEMINI_API_KEY:
-            raise ValueError("Missing Gemini API key")
-        
-        genai.configure(api_key=GEMINI_API_KEY)
-        return True
-    except Exception as e:
-        logger.error(f"Failed to configure Gemini: {e}")
-        return False
+# google.generativeai takes about half a second to import, so it is loaded
+# and configured on the first scan/classification rather than at startup
+_genai = None
+_genai_failed = False
+_genai_lock = threading.Lock()
 
-# Configure Gemini
-genai_configured = configure_genai()
+def get_genai():
+    """Configured google.generativeai module, or None when Gemini is unavailable"""
+    global _genai, _genai_failed
+    with _genai_lock:
+        if _genai is None and not _genai_failed:
+            try:
+                if not GEMINI_API_KEY:
+                    raise ValueError("Missing Gemini API key")
+                
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+            except Exception as e:
+                logger.error(f"Failed to configure Gemini: {e}")
+                _genai_failed = True
+        return _genai
 
 def validate_and_process_image(image_data: bytes, filename: str = None):
     """
     Validate image and get basic information with HEIC support
     """
     try:
+        ensure_heif_support()
+        
         # Try to open with PIL
         image = Image.open(io.BytesIO(image_data))
         
@@ -112,6 +130,7 @@ def convert_heic_to_jpeg(image_data: bytes):
         if not HEIC_SUPPORT:
             return None, "HEIC support not available"
         
+        ensure_heif_support()
         heif_file = pillow_heif.open_heif(io.BytesIO(image_data))
         image = Image.frombytes(
             heif_file.mode,
@@ -153,7 +172,8 @@ def scan_species_from_image(image_data: bytes, location: str = None, filename: s
     """
     Identify animal species from uploaded image using Gemini
     """
-    if not genai_configured:
+    genai = get_genai()
+    if genai is None:
         return {
             "status": "error",
             "error": "API configuration error. Please check your Gemini API key."
@@ -344,7 +364,7 @@ def get_species_scan_capabilities() -> Dict[str, Any]:
         ],
         "max_file_size": "10MB",
         "heic_support": HEIC_SUPPORT,
-        "api_configured": genai_configured,
+        "api_configured": get_genai() is not None,
         "model": "gemini-2.0-flash"
     }
 
@@ -360,7 +380,8 @@ def classify_species_by_name(species_name: str) -> Dict[str, Any]:
     
     logger = logging.getLogger(__name__)
     
-    if not genai_configured:
+    genai = get_genai()
+    if genai is None:
         return {
             "status": "error",
             "error": "API configuration error. Please check your Gemini API key."
@@ -0,0 +1,258 @@
+# =============================================================================
+# FILE: suggestions.py
+# DESCRIPTION: Friend-of-friend suggestions from an in-process social index
+# =============================================================================
+#
+# SocialIndex holds, per user, the accepted friends, every user they already
+# have a friendship row with (any status, either direction) and the species
+# they have scanned, plus species -> users. It is built with two queries and
+# then kept current with committed ORM writes to Friendship and ScannedSpecies
+# (a rolled-back write never reaches it); Core writes call
+# record_social_changes(). The periodic rebuild (SUGGESTION_INDEX_TTL) picks
+# up writes from other instances.
+#
+# Suggestions for a user never leave memory and never go deeper than two
+# hops: friends of friends are counted as mutual friends, and people who
+# scanned the same species are counted as overlap. Species seen by more than
+# SUGGESTION_SPECIES_MAX_USERS users say little about shared interests and
+# would fan out to most of the user base, so they only count towards the
+# overlap of candidates already found. Candidates rank by mutual friends,
+# then shared species.
+
+import os
+import time
+import heapq
+import logging
+import threading
+from collections import defaultdict, Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select, func, inspect
+from sqlalchemy.orm import Session
+
+from models.friendships import Friendship
+from models.scanned_species import ScannedSpecies
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_INDEX_TTL = float(os.environ.get("SUGGESTION_INDEX_TTL", "300"))
+SUGGESTION_SPECIES_MAX_USERS = int(os.environ.get("SUGGESTION_SPECIES_MAX_USERS", "500"))
+SUGGESTIONS_MAX_LIMIT = 50
+
+class SocialIndex:
+    """Friendship adjacency and scanned species per user, for suggestions"""
+
+    def __init__(self):
+        self.built_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._friends: Dict[str, Set[str]] = defaultdict(set)
+        self._linked: Dict[str, Set[str]] = defaultdict(set)
+        # user -> species -> number of the user's scans of it
+        self._species: Dict[str, Counter] = defaultdict(Counter)
+        self._species_users: Dict[str, Set[str]] = defaultdict(set)
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.built_at is not None and time.time() - self.built_at < SUGGESTION_INDEX_TTL
+
+    def rebuild(self, db: Session) -> None:
+        friendships = db.execute(select(Friendship.user_id, Friendship.friend_id, Friendship.status)).all()
+        sightings = db.execute(
+            select(ScannedSpecies.user_id, ScannedSpecies.species_id, func.count())
+            .where(ScannedSpecies.species_id.isnot(None))
+            .group_by(ScannedSpecies.user_id, ScannedSpecies.species_id)
+        ).all()
+
+        self.load(friendships, sightings)
+        logger.info(f"Built suggestion index: {len(friendships)} friendships, {len(sightings)} user species")
+
+    def load(self, friendships: Iterable[Tuple[str, str, Optional[str]]],
+             sightings: Iterable[Tuple[str, str, int]]) -> None:
+        """Replace the contents with (user_id, friend_id, status) and (user_id, species_id, scans) rows"""
+        with self._lock:
+            self._friends.clear()
+            self._linked.clear()
+            self._species.clear()
+            self._species_users.clear()
+            for user_id, friend_id, status in friendships:
+                self._link(user_id, friend_id, status)
+            for user_id, species_id, count in sightings:
+                self._species[user_id][species_id] = count
+                self._species_users[species_id].add(user_id)
+            self.built_at = time.time()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.built_at = None
+
+    # Incremental updates - ignored until the index is first built
+
+    def link(self, user_id: str, friend_id: str, status: Optional[str]) -> None:
+        with self._lock:
+            if self.built_at is not None:
+                self._unlink(user_id, friend_id)
+                self._link(user_id, friend_id, status)
+
+    def unlink(self, user_id: str, friend_id: str) -> None:
+        with self._lock:
+            if self.built_at is not None:
+                self._unlink(user_id, friend_id)
+
+    def add_sighting(self, user_id: str, species_id: Optional[str]) -> None:
+        with self._lock:
+            if self.built_at is not None and species_id:
+                self._species[user_id][species_id] += 1
+                self._species_users[species_id].add(user_id)
+
+    def remove_sighting(self, user_id: str, species_id: Optional[str]) -> None:
+        with self._lock:
+            if self.built_at is None or not species_id:
+                return
+            seen = self._species[user_id]
+            seen[species_id] -= 1
+            if seen[species_id] <= 0:
+                del seen[species_id]
+                self._species_users[species_id].discard(user_id)
+
+    def _link(self, user_id: str, friend_id: str, status: Optional[str]) -> None:
+        self._linked[user_id].add(friend_id)
+        self._linked[friend_id].add(user_id)
+        if status == "accepted":
+            self._friends[user_id].add(friend_id)
+            self._friends[friend_id].add(user_id)
+
+    def _unlink(self, user_id: str, friend_id: str) -> None:
+        for a, b in ((user_id, friend_id), (friend_id, user_id)):
+            self._linked[a].discard(b)
+            self._friends[a].discard(b)
+
+    def suggest(self, user_id: str, limit: int) -> List[Tuple[str, int, int]]:
+        """(candidate id, mutual friends, shared species) for the best candidates, best first"""
+        with self._lock:
+            mutual: Counter = Counter()
+            for friend_id in self._friends.get(user_id, ()):
+                mutual.update(self._friends.get(friend_id, ()))
+
+            my_species = self._species.get(user_id, Counter())
+            shared: Counter = Counter()
+            common_species = []
+            for species_id in my_species:
+                users = self._species_users.get(species_id, ())
+                if len(users) <= SUGGESTION_SPECIES_MAX_USERS:
+                    shared.update(users)
+                else:
+                    common_species.append(users)
+
+            for excluded in (user_id, *self._linked.get(user_id, ())):
+                mutual.pop(excluded, None)
+                shared.pop(excluded, None)
+
+            # Only candidates that can still make the cut are scored in full:
+            # the best mutual-friend counts, topped up from species overlap
+            contenders = _best(mutual, limit)
+            if len(contenders) < limit:
+                contenders |= _best(Counter({c: n for c, n in shared.items() if c not in mutual}),
+                                    limit - len(contenders))
+
+            # Friends of friends also count common species towards their overlap
+            mutual_contenders = {c for c in contenders if c in mutual}
+            overlap = Counter({c: shared[c] for c in contenders})
+            for users in common_species:
+                overlap.update(users & mutual_contenders)
+
+            return [
+                (candidate, -mutual_count, -overlap_count)
+                for mutual_count, overlap_count, candidate in heapq.nsmallest(
+                    limit, ((-mutual[c], -overlap[c], c) for c in contenders)
+                )
+            ]
+
+def _best(counts: Counter, limit: int) -> Set[str]:
+    """Keys of counts with one of the limit highest values (all of any tie at the cutoff)"""
+    if limit <= 0 or not counts:
+        return set()
+    if len(counts) <= limit:
+        return set(counts)
+    cutoff = heapq.nlargest(limit, counts.values())[-1]
+    return {key for key, count in counts.items() if count >= cutoff}
+
+social_index = SocialIndex()
+
+def invalidate_suggestion_index() -> None:
+    """Force a rebuild on next use - call after bulk writes that bypass the ORM"""
+    social_index.invalidate()
+
+def record_social_changes(session: Session, changes: Iterable[Tuple]) -> None:
+    """
+    Apply (method, *args) changes to the index when session commits - for
+    Core writes to friendships or sightings, e.g. ("link", user_id, friend_id, status)
+    """
+    session.info.setdefault("social_changes", []).extend(changes)
+
+@event.listens_for(Session, "after_flush")
+def _note_social_writes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Friendship):
+            changes.append(("link", obj.user_id, obj.friend_id, obj.status))
+        elif isinstance(obj, ScannedSpecies):
+            changes.append(("add_sighting", obj.user_id, obj.species_id))
+    for obj in session.dirty:
+        if isinstance(obj, Friendship) and inspect(obj).attrs.status.history.has_changes():
+            changes.append(("link", obj.user_id, obj.friend_id, obj.status))
+        elif isinstance(obj, ScannedSpecies):
+            # A sighting moved to another species: the old one loses it, the new one gains it
+            history = inspect(obj).attrs.species_id.history
+            changes.extend(("remove_sighting", obj.user_id, species_id) for species_id in history.deleted)
+            changes.extend(("add_sighting", obj.user_id, species_id) for species_id in history.added)
+    for obj in session.deleted:
+        if isinstance(obj, Friendship):
+            changes.append(("unlink", obj.user_id, obj.friend_id))
+        elif isinstance(obj, ScannedSpecies):
+            changes.append(("remove_sighting", obj.user_id, obj.species_id))
+    if changes:
+        record_social_changes(session, changes)
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    # Only committed writes count, applied in the order they were flushed
+    for method, *args in session.info.pop("social_changes", ()):
+        getattr(social_index, method)(*args)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("social_changes", None)
+
+def suggest_friends(db: Session, user_id: str, limit: int = 20) -> List[dict]:
+    """Ranked suggestions for user_id with the candidates' public profile fields"""
+    limit = max(1, min(limit, SUGGESTIONS_MAX_LIMIT))
+    if not social_index.is_fresh:
+        social_index.rebuild(db)
+    # A little slack for candidates that turn out to be deactivated
+    ranked = social_index.suggest(user_id, limit * 2)
+    if not ranked:
+        return []
+
+    users = {
+        row.id: row
+        for row in db.execute(
+            select(User.id, User.first_name, User.last_name, User.points, User.profile_picture)
+            .where(User.id.in_([candidate for candidate, _, _ in ranked]), User.is_active.isnot(False))
+        )
+    }
+    suggestions = []
+    for candidate, mutual_friends, shared_species in ranked:
+        user = users.get(candidate)
+        if user is None:
+            continue
+        suggestions.append({
+            "user_id": user.id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "points": user.points,
+            "profile_picture": user.profile_picture,
+            "mutual_friends": mutual_friends,
+            "shared_species": shared_species,
+        })
+    return suggestions[:limit]
@@ -0,0 +1,114 @@
+# =============================================================================
+# FILE: tests/conftest.py
+# DESCRIPTION: Shared fixtures - the app on a throwaway SQLite database
+# =============================================================================
+#
+# The app is imported once per test session against a fresh SQLite file, so
+# the suite needs no database server. Tests that need PostgreSQL take their
+# own engine from TEST_POSTGRES_URL and are skipped without it.
+#
+# Usage (from Backend/):
+#   python -m pytest -q
+
+import os
+import sys
+import uuid
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="semai-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'semai.db')}"
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+SPECIES_PER_CLASS = 10
+
+class TestUser:
+    """A registered, logged-in user"""
+    __test__ = False
+
+    def __init__(self, id: str, email: str, token: str):
+        self.id = id
+        self.email = email
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    # Entering the client runs the startup migrations on the empty database
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def postgres_engine():
+    """
+    A PostgreSQL engine with every migration applied, from TEST_POSTGRES_URL.
+    Point it at a scratch database - the tests write to it.
+    """
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+
+    from sqlalchemy import create_engine
+    from database import url_with_driver, SYNC_DRIVERS
+    from migrations import run_migrations
+
+    engine = create_engine(url_with_driver(url, SYNC_DRIVERS))
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture(scope="session")
+def catalog(client):
+    """Two animal classes with SPECIES_PER_CLASS species each"""
+    from database import SessionLocal
+    from models.animal_class import AnimalClass
+    from models.species import Species
+
+    session = SessionLocal()
+    try:
+        species = []
+        for class_name in ("Birds", "Mammals"):
+            animal_class = AnimalClass(class_name=class_name)
+            session.add(animal_class)
+            session.flush()
+            for n in range(SPECIES_PER_CLASS):
+                species.append(Species(
+                    animal_class_id=animal_class.id,
+                    common_name=f"Test {class_name[:-1]} {n}",
+                    scientific_name=f"{class_name[:-1]} testus {n}",
+                    endangered_status="Concern" if n % 3 == 0 else "Not Concern",
+                ))
+        session.add_all(species)
+        session.commit()
+        return [s.id for s in species]
+    finally:
+        session.close()
+
+def register_user(client, first_name: str = "Test") -> TestUser:
+    """Register a fresh user through the API and log them in"""
+    email = f"user-{uuid.uuid4().hex[:12]}@example.com"
+    registered = client.post("/auth/register", json={
+        "email": email, "password": "secret-pw", "first_name": first_name, "last_name": "User"
+    })
+    assert registered.status_code == 201, registered.text
+    login = client.post("/auth/login", json={"email": email, "password": "secret-pw"})
+    assert login.status_code == 200, login.text
+    return TestUser(registered.json()["id"], email, login.json()["access_token"])
+
+@pytest.fixture
+def make_user(client):
+    """Factory registering a fresh user and logging them in"""
+    return lambda first_name="Test": register_user(client, first_name)
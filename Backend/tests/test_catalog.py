@@ -0,0 +1,29 @@
+# =============================================================================
+# FILE: tests/test_catalog.py
+# DESCRIPTION: Catalog snapshot rebuilds from async handlers
+# =============================================================================
+
+import asyncio
+import threading
+
+def test_async_rebuild_runs_once_off_the_event_loop(client, catalog, monkeypatch):
+    import catalog as catalog_module
+
+    build_threads = []
+    build_snapshot = catalog_module.build_snapshot
+
+    def recording_build(generation):
+        build_threads.append(threading.get_ident())
+        return build_snapshot(generation)
+
+    monkeypatch.setattr(catalog_module, "build_snapshot", recording_build)
+    catalog_module.invalidate_catalog()
+
+    async def readers():
+        snapshots = await asyncio.gather(*(catalog_module.get_catalog_async() for _ in range(5)))
+        return threading.get_ident(), snapshots
+
+    loop_thread, snapshots = asyncio.run(readers())
+    assert len(build_threads) == 1 and build_threads[0] != loop_thread
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert catalog[0] in snapshots[0].species_by_id
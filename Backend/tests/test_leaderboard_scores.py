@@ -0,0 +1,63 @@
+# =============================================================================
+# FILE: tests/test_leaderboard_scores.py
+# DESCRIPTION: Balance corrections count in the rollups, not on the leaderboards
+# =============================================================================
+#
+# v0008 books each user's pre-ledger balance as one opening_balance entry
+# dated the day it runs, and reconcile_balances(repair=True) books drift as a
+# reconciliation entry. Neither was earned that week or month, so neither may
+# put a user on the weekly or monthly board.
+
+from sqlalchemy import create_engine, select, text, update
+
+def test_opening_balances_stay_off_the_leaderboards(tmp_path):
+    from migrations import discover_migrations, run_migrations, schema_migrations
+    from models.points_transactions import PointsRollup, LeaderboardScore
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+    with engine.begin() as conn:
+        schema_migrations.create(conn)
+        # The schema as it was before the ledger, with balances but no entries
+        for version, name, module in discover_migrations():
+            if version >= 8:
+                break
+            module.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+        conn.execute(text(
+            "INSERT INTO users (id, email, password, first_name, last_name, points, currency) "
+            "VALUES ('drifted', 'drifted@example.com', 'x', 'Drifted', 'User', 500, 120)"
+        ))
+
+    try:
+        run_migrations(engine)
+        with engine.connect() as conn:
+            assert conn.execute(select(LeaderboardScore.__table__)).all() == []
+            rollups = conn.execute(
+                select(PointsRollup.__table__.c.points_change)
+                .where(PointsRollup.__table__.c.transaction_type == "opening_balance",
+                       PointsRollup.__table__.c.period == "all")
+            ).scalars().all()
+            assert rollups == [500]
+    finally:
+        engine.dispose()
+
+def test_reconciliation_stays_off_the_leaderboards(db, make_user):
+    from ledger import reconcile_balances
+    from models.user import User
+    from models.points_transactions import PointsRollup, LeaderboardScore
+
+    user_id = make_user().id
+    # Drift the cached balance away from the ledger
+    db.execute(update(User).where(User.id == user_id).values(points=300, currency=75))
+    db.commit()
+
+    drift = reconcile_balances(db, repair=True)
+    assert user_id in {entry["user_id"] for entry in drift}
+    assert reconcile_balances(db) == []
+
+    assert db.scalars(select(LeaderboardScore).where(LeaderboardScore.user_id == user_id)).all() == []
+    assert db.scalar(
+        select(PointsRollup.points_change)
+        .where(PointsRollup.user_id == user_id, PointsRollup.transaction_type == "reconciliation",
+               PointsRollup.period == "all")
+    ) == 300
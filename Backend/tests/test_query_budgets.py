@@ -0,0 +1,99 @@
+# =============================================================================
+# FILE: tests/test_query_budgets.py
+# DESCRIPTION: Per-endpoint SQL statement budgets for the hot endpoints
+# =============================================================================
+#
+# Each hot endpoint is called once to warm the in-process caches (catalog
+# snapshot, authenticated principal), then again under query_budget. A change
+# that adds statements to one of these requests - an N+1, a lost index
+# lookup, a cache that stopped caching - fails here. Raise a budget only
+# together with the change that needs it.
+
+import pytest
+
+from conftest import register_user
+from query_metrics import query_budget
+
+@pytest.fixture(scope="module")
+def player(client, catalog):
+    """A user with scan history, one friend and one incoming request"""
+    from database import SessionLocal
+    from models.scanned_species import ScannedSpecies
+    from models.friendships import Friendship
+
+    me, friend, requester = (register_user(client, name) for name in ("Player", "Friend", "Requester"))
+    session = SessionLocal()
+    try:
+        session.add_all(
+            ScannedSpecies(user_id=me.id, species_id=species_id, location="Kuala Lumpur, Malaysia", image_url="x.jpg")
+            for species_id in catalog[:12]
+        )
+        session.add(Friendship(user_id=me.id, friend_id=friend.id, status="accepted"))
+        session.add(Friendship(user_id=requester.id, friend_id=me.id, status="pending"))
+        session.commit()
+    finally:
+        session.close()
+    return me
+
+# (endpoint, request, budget)
+BUDGETS = [
+    # profile/balance row, then rank and discoveries; badges come from the catalog
+    ("dashboard", lambda client, me: client.get("/me/dashboard", headers=me.headers), 4),
+    # one index range scan for the page
+    ("rankings", lambda client, me: client.get("/users/rankings"), 1),
+    ("weekly rankings", lambda client, me: client.get("/users/rankings?period=week"), 1),
+    # the user's row, then COUNT(*) of players ahead
+    ("player rank", lambda client, me: client.get(f"/users/rankings/{me.id}"), 2),
+    # friend ids are cached; one primary-key read of the players
+    ("friends rankings", lambda client, me: client.get(f"/users/rankings/friends/{me.id}"), 1),
+    # one UNION ALL over both sides of the friendship
+    ("friends", lambda client, me: client.get(f"/friendships/friends/{me.id}"), 1),
+    # one page with both users joined; the total comes from the page
+    ("friend requests", lambda client, me: client.get(f"/friendships/requests/{me.id}"), 1),
+    # the user's discoveries; classes and totals come from the catalog
+    ("badges", lambda client, me: client.get("/api/badges/", headers=me.headers), 1),
+    # served from the catalog snapshot
+    ("species list", lambda client, me: client.get("/api/wildlife/species"), 0),
+    ("scan history", lambda client, me: client.get("/scanned-species/", headers=me.headers), 1),
+]
+
+@pytest.mark.parametrize("endpoint,call,budget", BUDGETS, ids=[endpoint for endpoint, _, _ in BUDGETS])
+def test_endpoint_query_budget(client, player, endpoint, call, budget):
+    assert call(client, player).status_code == 200
+    with query_budget(budget):
+        response = call(client, player)
+    assert response.status_code == 200, response.text
+
+def test_scan_query_budget(client, catalog, make_user, monkeypatch):
+    """
+    A repeat scan of a known species: the user's row, species key lookup,
+    species row, duplicate check, balance UPDATE ... RETURNING, then one
+    flush of the ledger entry, points rollup and week/month leaderboard
+    upserts
+    """
+    import routes.scanned_species as scanned_species
+
+    async def upload(image_data, filename):
+        return "uploaded.jpg"
+
+    monkeypatch.setattr(scanned_species, "scan_species_from_image", lambda **kwargs: {
+        "status": "success",
+        "location": {"city": "Kuala Lumpur", "country": "Malaysia"},
+        "data": {"scientific_name": "Bird testus 1", "common_name": "Test Bird 1"},
+    })
+    monkeypatch.setattr(scanned_species, "upload_image_to_gcp", upload)
+    me = make_user()
+
+    def scan():
+        response = client.post(
+            "/scanned-species/scan-with-location",
+            headers=me.headers,
+            files={"image": ("bird.jpg", b"not really a jpeg", "image/jpeg")},
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "success", response.json()
+        return response.json()
+
+    assert scan()["is_new_record"]
+    with query_budget(9):
+        assert not scan()["is_new_record"]
@@ -0,0 +1,90 @@
+# =============================================================================
+# FILE: tests/test_scan_sync.py
+# DESCRIPTION: Delta sync of scan history - commit-ordered sync_version cursor
+# =============================================================================
+
+import uuid
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session
+
+from pagination import encode_cursor
+
+def sync(client, user, cursor=None):
+    response = client.get("/scanned-species/sync", headers=user.headers, params={"cursor": cursor} if cursor else {})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "success", body
+    return body
+
+def test_sync_returns_changes_and_deletes_since_cursor(client, db, catalog, make_user):
+    from models.scanned_species import ScannedSpecies
+
+    user = make_user()
+    scans = [ScannedSpecies(user_id=user.id, species_id=species_id, location="Ipoh, Malaysia") for species_id in catalog[:3]]
+    db.add_all(scans)
+    db.commit()
+
+    first = sync(client, user)
+    assert first["full_sync"] is True
+    assert [item["id"] for item in first["changes"]] == [scan.id for scan in sorted(scans, key=lambda s: (s.sync_version, s.id))]
+
+    unchanged = sync(client, user, first["next_cursor"])
+    assert unchanged["changes"] == [] and unchanged["deleted"] == [] and unchanged["full_sync"] is False
+
+    scans[0].verified = True
+    db.commit()
+    assert client.delete(f"/scanned-species/{scans[1].id}", headers=user.headers).json()["status"] == "success"
+
+    delta = sync(client, user, unchanged["next_cursor"])
+    assert [item["id"] for item in delta["changes"]] == [scans[0].id]
+    assert delta["deleted"] == [scans[1].id]
+
+def test_timestamp_cursor_starts_a_full_sync(client, db, catalog, make_user):
+    from models.scanned_species import ScannedSpecies
+
+    user = make_user()
+    db.add(ScannedSpecies(user_id=user.id, species_id=catalog[0], location="Ipoh, Malaysia"))
+    db.commit()
+
+    legacy = encode_cursor("2025-01-01T00:00:00", "x", None, None)
+    body = sync(client, user, legacy)
+    assert body["full_sync"] is True and len(body["changes"]) == 1 and body["deleted"] == []
+
+def test_in_flight_transaction_holds_back_later_commits(postgres_engine):
+    """A change committed behind an older, still open transaction is not served until that one ends"""
+    from models.user import User
+    from models.scanned_species import ScannedSpecies, sync_horizon
+
+    user_id = f"synctest-{uuid.uuid4().hex[:8]}"
+    with postgres_engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(
+            id=user_id, email=f"{user_id}@example.com", password="x", first_name="Sync", last_name="Test"
+        ))
+
+    def served(session):
+        return set(session.execute(select(ScannedSpecies.id).where(
+            ScannedSpecies.user_id == user_id, ScannedSpecies.sync_version < sync_horizon()
+        )).scalars())
+
+    slow, fast, reader = (Session(postgres_engine) for _ in range(3))
+    try:
+        slow_scan = ScannedSpecies(user_id=user_id, location="slow")
+        slow.add(slow_scan)
+        slow.flush()  # takes the older transaction id, stays open
+
+        fast_scan = ScannedSpecies(user_id=user_id, location="fast")
+        fast.add(fast_scan)
+        fast.commit()
+
+        assert served(reader) == set()
+        reader.rollback()
+
+        slow.commit()
+        assert served(reader) == {slow_scan.id, fast_scan.id}
+    finally:
+        for session in (slow, fast, reader):
+            session.close()
+        with postgres_engine.begin() as conn:
+            conn.execute(delete(ScannedSpecies.__table__).where(ScannedSpecies.user_id == user_id))
+            conn.execute(delete(User.__table__).where(User.id == user_id))
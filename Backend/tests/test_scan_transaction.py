@@ -0,0 +1,120 @@
+# =============================================================================
+# FILE: tests/test_scan_transaction.py
+# DESCRIPTION: The scan-and-reward write path commits once, within budget
+# =============================================================================
+#
+# record_scan (the database half of POST /scanned-species/scan-with-location)
+# for a new sighting of a known species, a repeat sighting and a first
+# sighting of a new species: each must commit exactly once and stay within
+# its statement budget. A new species is classified before the transaction
+# opens, so Gemini is never called with writes pending.
+
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from query_metrics import query_budget
+
+@pytest.fixture
+def commits(client):
+    from database import engine
+
+    seen = []
+    listener = lambda conn: seen.append(conn)
+    event.listen(engine, "commit", listener)
+    yield seen
+    event.remove(engine, "commit", listener)
+
+@pytest.fixture
+def classifications(monkeypatch):
+    """Stub Gemini: every name is a bird; records the names it was asked about"""
+    import routes.scanned_species as scanned_species
+
+    calls = []
+
+    def classify(common_name):
+        calls.append(common_name)
+        return {"status": "success", "classification": {"category": "Birds"}}
+
+    monkeypatch.setattr(scanned_species, "classify_species_ai", classify)
+    return calls
+
+# (description, species data, statement budget)
+#   known species: key lookup, species row, duplicate check, the balance
+#   UPDATE ... RETURNING, then one flush of the ledger and sighting INSERTs
+#   plus the points_rollups and leaderboard_scores upserts, and after the
+#   commit the user's row for the log line
+#   new species adds the INSERT ... RETURNING; its class was resolved beforehand
+SCENARIOS = [
+    ("known species", lambda run: {"scientific_name": "Bird testus 2", "common_name": "Test Bird 2"}, 9),
+    ("repeat sighting", lambda run: {"scientific_name": "Bird testus 2", "common_name": "Test Bird 2"}, 8),
+    ("new species", lambda run: {
+        "scientific_name": f"Novus {run}", "common_name": f"Novel Bird {run}", "endangered_status": "Concern"}, 10),
+]
+
+def test_each_scan_commits_once(db, catalog, make_user, commits, classifications):
+    from catalog import get_catalog
+    from models.user import User
+    from routes.scanned_species import classify_new_species, record_scan
+
+    run = uuid.uuid4().hex[:8]
+    user = db.get(User, make_user().id)
+    birds = get_catalog().classes_by_name["birds"]
+
+    for description, species_data, budget in SCENARIOS:
+        animal_class_id = asyncio.run(classify_new_species(species_data(run)))
+        commits.clear()
+        with query_budget(budget):
+            scan = asyncio.run(record_scan(
+                db, user, species_data(run), f"Forest {run}", "scan.jpg", animal_class_id
+            ))
+        assert len(commits) == 1, description
+
+    # Only the new species needed classifying
+    assert classifications == [f"Novel Bird {run}"]
+    assert scan["rewards"]["points_earned"] == 80
+    assert get_catalog().species_by_scientific_name[f"novus {run}"].animal_class_id == birds.id
+
+def test_new_species_is_classified_before_the_transaction(client, catalog, make_user, commits, monkeypatch):
+    import routes.scanned_species as scanned_species
+
+    run = uuid.uuid4().hex[:8]
+    writes_before_classifying = []
+
+    def classify(common_name):
+        writes_before_classifying.append(sum(
+            n for statement, n in stats.statements.items()
+            if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+        ))
+        return {"status": "success", "classification": {"category": "Mammals"}}
+
+    async def upload(image_data, filename):
+        return "uploaded.jpg"
+
+    monkeypatch.setattr(scanned_species, "classify_species_ai", classify)
+    monkeypatch.setattr(scanned_species, "upload_image_to_gcp", upload)
+    monkeypatch.setattr(scanned_species, "scan_species_from_image", lambda **kwargs: {
+        "status": "success",
+        "location": {"city": "Kuala Lumpur", "country": "Malaysia"},
+        "data": {"scientific_name": f"Ignotus {run}", "common_name": f"Unknown Creature {run}"},
+    })
+    me = make_user()
+
+    commits.clear()
+    with query_budget(10_000) as stats:
+        response = client.post(
+            "/scanned-species/scan-with-location",
+            headers=me.headers,
+            files={"image": ("creature.jpg", b"not really a jpeg", "image/jpeg")},
+        )
+    assert response.status_code == 200
+    assert response.json()["status"] == "success", response.json()
+
+    assert writes_before_classifying == [0]
+    assert len(commits) == 1
+
+    from catalog import get_catalog
+    snapshot = get_catalog()
+    assert snapshot.species_by_scientific_name[f"ignotus {run}"].animal_class_id == snapshot.classes_by_name["mammals"].id
@@ -0,0 +1,57 @@
+# =============================================================================
+# FILE: tests/test_search_index.py
+# DESCRIPTION: The in-process search index follows committed writes only
+# =============================================================================
+
+from search import SPECIES, search_ids, record_search_changes, invalidate_search_index
+
+def test_rolled_back_insert_leaves_no_document(db, catalog):
+    from models.species import Species
+
+    search_ids(db, SPECIES, "Bird")  # builds the index
+    animal_class_id = db.get(Species, catalog[0]).animal_class_id
+
+    db.add(Species(animal_class_id=animal_class_id, common_name="Phantom Heron", scientific_name="Ardea phantasma"))
+    db.flush()
+    db.rollback()
+    assert search_ids(db, SPECIES, "Phantom Heron") == []
+
+    species = Species(animal_class_id=animal_class_id, common_name="Phantom Heron", scientific_name="Ardea phantasma")
+    db.add(species)
+    db.commit()
+    assert search_ids(db, SPECIES, "Phantom Heron") == [species.id]
+
+    db.delete(species)
+    db.commit()
+    assert search_ids(db, SPECIES, "Phantom Heron") == []
+
+def test_recorded_core_write_applies_on_commit(db, catalog):
+    search_ids(db, SPECIES, "Bird")
+    record_search_changes(db, SPECIES, [(catalog[0], {"common_name": "Renamed Kite", "scientific_name": "Milvus renamed"})])
+    db.rollback()
+    assert search_ids(db, SPECIES, "Renamed Kite") == []
+
+    record_search_changes(db, SPECIES, [(catalog[0], {"common_name": "Renamed Kite", "scientific_name": "Milvus renamed"})])
+    db.commit()
+    assert search_ids(db, SPECIES, "Renamed Kite") == [catalog[0]]
+    # The row itself was never renamed
+    invalidate_search_index(SPECIES)
+
+def test_core_species_insert_is_indexed_on_commit(db, catalog):
+    from models.species import Species, species_key
+    from routes.scanned_species import insert_species_if_absent
+
+    search_ids(db, SPECIES, "Bird")
+    animal_class_id = db.get(Species, catalog[0]).animal_class_id
+    values = {
+        "animal_class_id": animal_class_id, "common_name": "Core Hornbill",
+        "scientific_name": "Buceros corensis", "species_key": species_key("Buceros corensis"),
+    }
+
+    insert_species_if_absent(db, values)
+    db.rollback()
+    assert search_ids(db, SPECIES, "Core Hornbill") == []
+
+    species_id = insert_species_if_absent(db, values)
+    db.commit()
+    assert search_ids(db, SPECIES, "Core Hornbill") == [species_id]
@@ -0,0 +1,31 @@
+# =============================================================================
+# FILE: tests/test_social_index.py
+# DESCRIPTION: The suggestion index follows committed sighting writes
+# =============================================================================
+
+from sqlalchemy import select
+
+def test_moving_a_sighting_to_another_species(db, catalog, make_user):
+    from models.scanned_species import ScannedSpecies
+    from suggestions import social_index
+
+    old_species, new_species = catalog[3], catalog[4]
+    user_id = make_user().id
+    sighting = ScannedSpecies(user_id=user_id, species_id=old_species, location="Taman Negara, Malaysia")
+    db.add(sighting)
+    db.commit()
+    social_index.rebuild(db)
+    assert social_index._species[user_id] == {old_species: 1}
+
+    sighting = db.scalar(select(ScannedSpecies).where(ScannedSpecies.id == sighting.id))
+    sighting.species_id = new_species
+    db.flush()
+    db.rollback()
+    assert social_index._species[user_id] == {old_species: 1}
+
+    sighting = db.scalar(select(ScannedSpecies).where(ScannedSpecies.id == sighting.id))
+    sighting.species_id = new_species
+    db.commit()
+    assert social_index._species[user_id] == {new_species: 1}
+    assert user_id not in social_index._species_users[old_species]
+    assert user_id in social_index._species_users[new_species]